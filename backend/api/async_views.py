@@ -0,0 +1,111 @@
+"""
+Versões async das views públicas de leitura (itens, categorias, cidades).
+
+Sob ASGI uma view síncrona do DRF roda inteira numa thread do executor do
+asgiref; estas rodam no event loop e só vão para a thread nas queries do
+ORM. Respondem o mesmo JSON das views em api.views, que seguem sendo as
+usadas sob WSGI. As rotas usam estas quando ASYNC_READ_VIEWS=true.
+"""
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+from .catalog_cache import aget_snapshot, conditional_response
+from .models import Category, City, Item
+from .pagination import ItemCursorPagination
+from .serializers import CategorySerializer, CitySerializer, ItemSerializer
+from .views import filter_items, with_item_relations
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    # Mesmo encoder do JSONRenderer do DRF (UUID, datetime, Decimal)
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+def _authenticate(request):
+    """
+    Valida o JWT sem ir ao banco, como a autenticação do chat: roda no
+    próprio event loop. request.user vira um TokenUser (id do claim); token
+    inválido ou expirado dá 401 como nas views do DRF.
+    """
+    drf_request = Request(request, authenticators=[JWTStatelessUserAuthentication()])
+    return drf_request.user
+
+
+class AsyncReadView(View):
+    """
+    Base das views async: autentica pelo JWT (sem query) e converte
+    APIException/Http404 na mesma resposta do exception handler do DRF.
+    """
+
+    http_method_names = ["get"]
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            if "HTTP_AUTHORIZATION" in request.META:
+                request.user = _authenticate(request)
+            else:
+                request.user = AnonymousUser()
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404 as exc:
+            return json_response({"detail": str(exc)}, status=status.HTTP_404_NOT_FOUND)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+            response = json_response(detail, status=exc.status_code)
+            if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                response["WWW-Authenticate"] = 'Bearer realm="api"'
+            return response
+
+    def get_serializer_context(self, request):
+        return {"request": request, "view": self}
+
+
+class ReadItemsView(AsyncReadView):
+    name = "Read Items"
+    description = "Endpoint for reading all items."
+    pagination_class = ItemCursorPagination
+
+    async def get(self, request):
+        # Request do DRF só pelo query_params/build_absolute_uri da paginação
+        drf_request = Request(request)
+        queryset = with_item_relations(filter_items(Item.objects.all(), drf_request.query_params))
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, drf_request, view=self)
+        data = ItemSerializer(page, many=True, context=self.get_serializer_context(drf_request)).data
+        return json_response(paginator.get_paginated_response(data).data)
+
+
+class ReadItemView(AsyncReadView):
+    name = "Read Item"
+    description = "Endpoint for reading an item."
+
+    async def get(self, request, pk):
+        if not request.user.is_authenticated:
+            raise Http404(f"No {Item._meta.object_name} matches the given query.")
+        queryset = with_item_relations(Item.objects.filter(user_id=request.user.id))
+        item = await aget_object_or_404(queryset, pk=pk)
+        data = ItemSerializer(item, context=self.get_serializer_context(Request(request))).data
+        return json_response(data)
+
+
+class ListCategoriesView(AsyncReadView):
+    """Lista todas as categorias disponíveis"""
+
+    async def get(self, request):
+        snapshot = await aget_snapshot("categories", Category.objects.all(), CategorySerializer)
+        return conditional_response(request, snapshot, json_response)
+
+
+class ListCitiesView(AsyncReadView):
+    """Lista todas as cidades disponíveis"""
+
+    async def get(self, request):
+        snapshot = await aget_snapshot("cities", City.objects.all(), CitySerializer)
+        return conditional_response(request, snapshot, json_response)
@@ -0,0 +1,97 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+VERSION_PREFIX = "auth:user-version:"
+MAX_CACHED_USERS = 10000
+
+_users = {}
+_users_lock = threading.Lock()
+
+
+def _user_version(user_id):
+    # Versão guardada no cache do Django. O projeto usa o LocMem padrão,
+    # um por processo: a invalidação só vale para o worker que a fez
+    return cache.get(f"{VERSION_PREFIX}{user_id}", 0)
+
+
+def invalidate_cached_user(user_id):
+    """
+    Descarta o usuário em cache; chamar depois de trocar senha, desativar etc.
+    Só alcança este processo: os outros workers continuam aceitando o User
+    antigo por até AUTH_USER_CACHE_TTL segundos.
+    """
+    key = f"{VERSION_PREFIX}{user_id}"
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+    with _users_lock:
+        for cached_key in [k for k in _users if k[0] == str(user_id)]:
+            del _users[cached_key]
+
+
+def _evict(now):
+    # Chamado com o lock: remove os expirados e, se não bastar, os mais
+    # antigos (dict mantém a ordem de inserção)
+    for key in [k for k, (_, expires) in _users.items() if expires < now]:
+        del _users[key]
+    while len(_users) >= MAX_CACHED_USERS:
+        _users.pop(next(iter(_users)))
+
+
+def clear_user_cache():
+    with _users_lock:
+        _users.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que guarda o User resolvido em memória por
+    AUTH_USER_CACHE_TTL segundos, com chave (id do usuário, versão). As
+    leituras autenticadas deixam de buscar o User no banco a cada requisição.
+
+    Só métodos seguros (GET/HEAD/OPTIONS) usam o cache: numa escrita a view
+    pode salvar request.user inteiro, e um User de até TTL segundos atrás
+    regravaria colunas já alteradas por outro processo (senha, is_active).
+
+    O cache é por processo e invalidate_cached_user não chega aos demais
+    workers: um usuário desativado ainda lê por até TTL segundos neles.
+    Por isso o TTL padrão é curto.
+    """
+
+    use_cache = True
+
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        ttl = settings.AUTH_USER_CACHE_TTL
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if ttl <= 0 or user_id is None or not self.use_cache:
+            return super().get_user(validated_token)
+
+        key = (str(user_id), _user_version(user_id))
+        now = time.monotonic()
+        with _users_lock:
+            entry = _users.get(key)
+        if entry is None or entry[1] < now:
+            # Usuário inexistente ou inativo levanta AuthenticationFailed
+            # aqui e nunca entra no cache
+            user = super().get_user(validated_token)
+            with _users_lock:
+                if len(_users) >= MAX_CACHED_USERS:
+                    _evict(now)
+                _users[key] = (user, now + ttl)
+        else:
+            user = entry[0]
+        # Cópia por requisição: views podem alterar request.user
+        return copy.copy(user)
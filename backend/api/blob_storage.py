@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import os
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+
+from .models import ImageBlob
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = "items/blobs"
+
+BLOB_LOCK_SQL = "select pg_advisory_xact_lock(hashtextextended('imageblob:' || %s, 0))"
+
+
+def hash_file(file):
+    """Calcula o SHA-256 e o tamanho lendo o arquivo em blocos."""
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+def blob_name(digest, filename):
+    ext = os.path.splitext(filename or "")[1].lower()
+    return f"{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def acquire_blob(file, filename, storage):
+    """
+    Registra uma referência ao conteúdo de `file` e devolve o ImageBlob.
+    Se o conteúdo já existe, só incrementa ref_count e nada é regravado.
+    """
+    digest, size = hash_file(file)
+    with transaction.atomic():
+        # O upsert trava a linha do blob; um release concorrente do mesmo
+        # hash espera este commit (e vice-versa). O lock do hash ordena
+        # esta checagem do arquivo com a remoção feita depois de um release
+        with connection.cursor() as cur:
+            cur.execute(BLOB_LOCK_SQL, [digest])
+            cur.execute("""
+                insert into imageblob (sha256, name, size, ref_count, created_at)
+                values (%s, %s, %s, 1, now())
+                on conflict (sha256)
+                do update set ref_count = imageblob.ref_count + 1
+                returning name
+            """, [digest, blob_name(digest, filename), size])
+            name = cur.fetchone()[0]
+
+        # Grava o arquivo só quando ainda não existe (primeira referência
+        # ou arquivo perdido); duplicatas não tocam no storage
+        if not storage.exists(name):
+            saved = storage.save(name, file)
+            if saved != name:
+                raise RuntimeError(f"Storage gravou o blob em {saved!r}, esperado {name!r}")
+
+    return ImageBlob(sha256=digest, name=name, size=size)
+
+
+def release_blob(sha256, storage, extra_files=()):
+    """
+    Libera uma referência. Na última, remove o registro e, só depois do
+    commit, o arquivo e os derivados informados em `extra_files`
+    (variantes): se a transação for desfeita, a linha volta e os arquivos
+    continuam lá.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cur:
+            cur.execute("""
+                update imageblob set ref_count = ref_count - 1
+                 where sha256 = %s
+                returning ref_count, name
+            """, [sha256])
+            row = cur.fetchone()
+            if row is None or row[0] > 0:
+                return False
+            cur.execute("delete from imageblob where sha256 = %s", [sha256])
+
+    names = (row[1], *extra_files)
+    transaction.on_commit(lambda: _delete_blob_files(sha256, names, storage))
+    return True
+
+
+def _delete_blob_files(sha256, names, storage):
+    with transaction.atomic():
+        with connection.cursor() as cur:
+            # Mesmo lock do acquire_blob: um upload do mesmo conteúdo que
+            # recriou o blob depois do commit fica com o arquivo
+            cur.execute(BLOB_LOCK_SQL, [sha256])
+            cur.execute("select 1 from imageblob where sha256 = %s", [sha256])
+            if cur.fetchone():
+                return
+        for name in names:
+            try:
+                storage.delete(name)
+            except OSError:
+                logger.warning("Não foi possível remover o arquivo %s", name)
+
+
+def storage_report():
+    """
+    Resumo da deduplicação: bytes gravados, bytes que seriam gravados
+    sem deduplicação e a diferença economizada.
+    """
+    totals = ImageBlob.objects.aggregate(
+        stored=Sum("size"),
+        logical=Sum(F("size") * F("ref_count")),
+        references=Sum("ref_count"),
+    )
+    stored = totals["stored"] or 0
+    logical = totals["logical"] or 0
+    return {
+        "blobs": ImageBlob.objects.count(),
+        "references": totals["references"] or 0,
+        "stored_bytes": stored,
+        "logical_bytes": logical,
+        "saved_bytes": logical - stored,
+    }
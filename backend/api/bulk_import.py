@@ -0,0 +1,264 @@
+import csv
+import io
+import itertools
+import json
+import time
+
+from django.db import connection, transaction
+
+from .facets import rebuild_item_facets
+
+# Colunas aceitas por tipo; o resto do arquivo é ignorado
+COLUMNS = {
+    "categories": ("name", "slug"),
+    "cities": ("name", "state", "latitude", "longitude"),
+    "items": (
+        "id", "title", "description", "category", "city", "state",
+        "status", "listing_state", "owner",
+    ),
+}
+
+STAGING_DDL = {
+    "categories": "name text, slug text",
+    "cities": "name text, state text, latitude text, longitude text",
+    "items": (
+        "id text, title text, description text, category text, city text, state text, "
+        "status text, listing_state text, owner text"
+    ),
+}
+
+# Cada merge devolve (linhas gravadas, linhas descartadas). Dentro do lote a
+# última ocorrência de uma chave vence (distinct on ... order by line desc)
+MERGE_SQL = {
+    # Atualiza o nome por slug; um nome já usado por outro slug (no banco ou
+    # numa linha posterior do lote) é descartado
+    "categories": """
+        with by_slug as (
+            select distinct on (slug) line, btrim(name) as name, btrim(slug) as slug
+              from {staging}
+             where nullif(btrim(slug), '') is not null and nullif(btrim(name), '') is not null
+             order by slug, line desc
+        ), src as (
+            select distinct on (name) name, slug
+              from by_slug
+             order by name, line desc
+        ), merged as (
+            insert into category (id, name, slug)
+            select gen_random_uuid(), s.name, s.slug
+              from src s
+             where not exists (
+                select 1 from category c where c.name = s.name and c.slug <> s.slug
+             )
+            on conflict (slug) do update set name = excluded.name
+            returning 1
+        )
+        select (select count(*) from merged), (select count(*) from {staging}) - (select count(*) from merged)
+    """,
+    # city não tem chave única: casa por nome (sem caixa/espaços) e UF.
+    # Cidades novas são inseridas; as existentes só recebem as coordenadas,
+    # quando a linha traz latitude e longitude válidas
+    "cities": """
+        with parsed as (
+            select line, btrim(name) as name, nullif(upper(btrim(state)), '') as state,
+                   case when btrim(latitude) ~ '^-?[0-9]+(\\.[0-9]+)?$' then btrim(latitude)::float8 end as latitude,
+                   case when btrim(longitude) ~ '^-?[0-9]+(\\.[0-9]+)?$' then btrim(longitude)::float8 end as longitude
+              from {staging}
+             where nullif(btrim(name), '') is not null
+        ), src as (
+            select distinct on (lower(name), coalesce(state, ''))
+                   name, state,
+                   case when latitude between -90 and 90 and longitude between -180 and 180
+                        then latitude end as latitude,
+                   case when latitude between -90 and 90 and longitude between -180 and 180
+                        then longitude end as longitude
+              from parsed
+             order by lower(name), coalesce(state, ''), line desc
+        ), located as (
+            update city c set latitude = s.latitude, longitude = s.longitude
+              from src s
+             where s.latitude is not null
+               and lower(c.name) = lower(s.name)
+               and coalesce(upper(c.state), '') = coalesce(s.state, '')
+               and (c.latitude, c.longitude) is distinct from (s.latitude, s.longitude)
+            returning 1
+        ), merged as (
+            insert into city (id, name, state, latitude, longitude)
+            select gen_random_uuid(), s.name, s.state, s.latitude, s.longitude
+              from src s
+             where not exists (
+                select 1 from city c
+                 where lower(c.name) = lower(s.name)
+                   and coalesce(upper(c.state), '') = coalesce(s.state, '')
+             )
+            returning 1
+        ), written as (
+            select (select count(*) from merged) + (select count(*) from located) as total
+        )
+        select (select total from written), (select count(*) from {staging}) - (select total from written)
+    """,
+    # Resolve categoria (slug), cidade (nome + UF) e dono (username ou
+    # e-mail); linhas sem categoria, dono ou status válido são descartadas.
+    # Com `id` o item existente é atualizado
+    "items": """
+        with src as (
+            select distinct on (coalesce(s.id, s.line::text))
+                   coalesce(s.id::uuid, gen_random_uuid()) as id,
+                   btrim(s.title) as title, s.description,
+                   cat.id as category_id, city.id as city_id, u.id as user_id,
+                   lower(btrim(s.status)) as status,
+                   coalesce(nullif(lower(btrim(s.listing_state)), ''), 'active') as listing_state
+              from {staging} s
+              join category cat on cat.slug = btrim(s.category)
+              join auth_user u on u.username = coalesce(nullif(btrim(s.owner), ''), %(owner)s)
+                               or u.email = coalesce(nullif(btrim(s.owner), ''), %(owner)s)
+              left join lateral (
+                select c.id from city c
+                 where lower(c.name) = lower(btrim(s.city))
+                   and coalesce(upper(c.state), '') = coalesce(upper(btrim(s.state)), '')
+                 limit 1
+              ) city on true
+             where nullif(btrim(s.title), '') is not null
+               and lower(btrim(s.status)) in ('new', 'used')
+               and coalesce(nullif(lower(btrim(s.listing_state)), ''), 'active') in ('active', 'inactive')
+               and (s.id is null or s.id ~* '^[0-9a-f]{{8}}-[0-9a-f]{{4}}-[0-9a-f]{{4}}-[0-9a-f]{{4}}-[0-9a-f]{{12}}$')
+             order by coalesce(s.id, s.line::text), s.line desc, u.id
+        ), merged as (
+            insert into item (id, user_id, title, description, category_id, city_id,
+                              status, listing_state, created_at, updated_at)
+            select id, user_id, title, description, category_id, city_id,
+                   status, listing_state, now(), now()
+              from src
+            on conflict (id) do update set
+                title = excluded.title, description = excluded.description,
+                category_id = excluded.category_id, city_id = excluded.city_id,
+                status = excluded.status, listing_state = excluded.listing_state,
+                updated_at = now()
+             where item.user_id = excluded.user_id
+            returning 1
+        )
+        select (select count(*) from merged), (select count(*) from {staging}) - (select count(*) from merged)
+    """,
+}
+
+
+class BulkImportError(Exception):
+    pass
+
+
+def read_records(fh, fmt):
+    """Gera dicionários linha a linha, sem carregar o arquivo na memória."""
+    if fmt == "csv":
+        yield from csv.DictReader(fh)
+        return
+    for number, line in enumerate(fh, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise BulkImportError(f"Linha {number}: JSON inválido ({e})")
+        if not isinstance(record, dict):
+            raise BulkImportError(f"Linha {number}: esperado um objeto JSON")
+        yield record
+
+
+class CopyStream(io.RawIOBase):
+    """
+    Arquivo somente leitura que serializa os registros em CSV sob demanda,
+    para o COPY ler em blocos sem montar o lote inteiro em memória.
+    """
+
+    def __init__(self, rows, columns):
+        self._rows = rows
+        self._columns = columns
+        self._buffer = b""
+        self._text = io.StringIO()
+        self._writer = csv.writer(self._text)
+        self.count = 0
+        self.error = None
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                line, record = next(self._rows)
+            except StopIteration:
+                break
+            except BulkImportError as e:
+                # O psycopg2 troca a exceção por QueryCanceled; guarda a original
+                self.error = e
+                raise
+            values = [line]
+            for column in self._columns:
+                value = record.get(column)
+                values.append(None if value in (None, "") else str(value))
+            self._writer.writerow(values)
+            self._buffer += self._text.getvalue().encode()
+            self._text.seek(0)
+            self._text.truncate()
+            self.count += 1
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def import_file(kind, fh, fmt, batch_size=50000, owner=None, progress=None):
+    """
+    Importa `fh` para a tabela de `kind` (categories, cities ou items):
+    cada lote de até `batch_size` registros vai por COPY para uma tabela
+    temporária e é mesclado com um único INSERT ... SELECT. Os registros
+    vão do arquivo direto para o COPY, então a memória não cresce com o
+    tamanho do arquivo. Devolve (lidas, gravadas, descartadas);
+    descartadas inclui linhas inválidas, repetidas no lote ou em conflito.
+    """
+    if kind not in COLUMNS:
+        raise BulkImportError(f"Tipo desconhecido: {kind}")
+    columns = COLUMNS[kind]
+    staging = f"import_{kind}"
+    read = written = skipped = 0
+    started = time.monotonic()
+
+    records = enumerate(read_records(fh, fmt), start=1)
+    while True:
+        # islice consome o arquivo só enquanto o COPY lê o stream
+        stream = CopyStream(itertools.islice(records, batch_size), columns)
+        with transaction.atomic(), connection.cursor() as cur:
+            cur.execute(
+                f"create temp table if not exists {staging} "
+                f"(line bigint, {STAGING_DDL[kind]}) on commit delete rows"
+            )
+            cur.execute(f"truncate {staging}")
+            try:
+                cur.copy_expert(
+                    f"copy {staging} (line, {', '.join(columns)}) from stdin with (format csv)",
+                    stream,
+                )
+            except Exception:
+                # copy_expert não passa pelo wrapper de erros do Django
+                if stream.error:
+                    raise stream.error from None
+                raise
+            if not stream.count:
+                break
+            cur.execute(MERGE_SQL[kind].format(staging=staging), {"owner": owner})
+            batch_written, batch_skipped = cur.fetchone()
+
+        read += stream.count
+        written += batch_written
+        skipped += batch_skipped
+        if progress:
+            elapsed = max(time.monotonic() - started, 1e-9)
+            progress(read, written, skipped, read / elapsed)
+        if stream.count < batch_size:
+            break
+
+    # O merge não passa pelos signals: reconcilia os contadores. Os caches
+    # de categorias/cidades ficam em memória de cada worker, fora do alcance
+    # deste processo; expiram em CATALOG_CACHE_TIMEOUT (o comando avisa)
+    if written and kind == "items":
+        rebuild_item_facets()
+    return read, written, skipped
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+CACHE_PREFIX = "catalog:"
+
+
+class CatalogSnapshot:
+    """Lista serializada de uma tabela do catálogo com seu carimbo de versão."""
+
+    def __init__(self, data, etag, last_modified):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+def build_snapshot(data):
+    # O ETag é derivado do conteúdo: dois processos que montarem a mesma
+    # lista devolvem o mesmo ETag, então o 304 não depende de qual
+    # worker atendeu a requisição anterior
+    payload = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    etag = quote_etag(hashlib.sha1(payload.encode()).hexdigest())
+    return CatalogSnapshot(data, etag, int(time.time()))
+
+
+def get_snapshot(name, queryset, serializer_class):
+    """
+    Devolve o snapshot em cache da tabela `name`, montando-o a partir de
+    `queryset` quando não houver (primeiro acesso ou após invalidação).
+    """
+    key = CACHE_PREFIX + name
+    snapshot = cache.get(key)
+    if snapshot is None:
+        data = serializer_class(queryset, many=True).data
+        snapshot = build_snapshot([dict(row) for row in data])
+        cache.set(key, snapshot, getattr(settings, "CATALOG_CACHE_TIMEOUT", 300))
+    return snapshot
+
+
+async def aget_snapshot(name, queryset, serializer_class):
+    """get_snapshot para views async: lê a tabela pelo ORM assíncrono."""
+    key = CACHE_PREFIX + name
+    snapshot = await cache.aget(key)
+    if snapshot is None:
+        rows = [row async for row in queryset]
+        data = serializer_class(rows, many=True).data
+        snapshot = build_snapshot([dict(row) for row in data])
+        await cache.aset(key, snapshot, getattr(settings, "CATALOG_CACHE_TIMEOUT", 300))
+    return snapshot
+
+
+def invalidate_snapshot(name):
+    cache.delete(CACHE_PREFIX + name)
+
+
+def conditional_response(request, snapshot, response_class=Response):
+    """
+    Responde 304 quando If-None-Match / If-Modified-Since batem com o
+    snapshot; caso contrário devolve a lista com ETag e Last-Modified.
+    """
+    response = get_conditional_response(
+        request, etag=snapshot.etag, last_modified=snapshot.last_modified
+    )
+    if response is None:
+        response = response_class(snapshot.data)
+    response["ETag"] = snapshot.etag
+    response["Last-Modified"] = http_date(snapshot.last_modified)
+    # O cliente pode guardar a resposta, mas deve revalidar a cada uso
+    patch_cache_control(response, no_cache=True)
+    return response
@@ -0,0 +1,123 @@
+import fcntl
+import os
+import re
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import PhotoUpload
+
+# Tamanho de cada leitura do corpo da requisição ao gravar um pedaço
+READ_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+class ChunkError(Exception):
+    pass
+
+
+class ChunkConflict(ChunkError):
+    """Pedaço que não pode ser aplicado agora (offset ou upload mudaram): 409."""
+
+
+def partial_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f"{upload.id}.part")
+
+
+def parse_content_range(header, size):
+    """
+    Lê um cabeçalho "Content-Range: bytes início-fim/total" de um upload
+    de `size` bytes. Retorna (início, tamanho do pedaço) ou levanta
+    ChunkError; o total, quando informado, tem de ser igual a `size`.
+    """
+    match = CONTENT_RANGE_RE.match(header.strip())
+    if not match:
+        raise ChunkError("Content-Range inválido.")
+    start, end = int(match.group(1)), int(match.group(2))
+    if end < start:
+        raise ChunkError("Content-Range inválido.")
+    if match.group(3) != "*" and int(match.group(3)) != size:
+        raise ChunkError("O total do Content-Range difere do tamanho declarado do arquivo.")
+    return start, end - start + 1
+
+
+def write_chunk(upload, stream, start, length):
+    """
+    Grava o pedaço que começa em `start` e confirma o novo offset no banco.
+
+    O corpo é lido da rede sem transação nem lock de linha: quem serializa
+    PUTs do mesmo upload é um flock no arquivo parcial, e um segundo PUT
+    simultâneo recebe ChunkConflict em vez de esperar. Com o lock em mãos o
+    offset é relido do banco e, no fim, gravado por um UPDATE condicionado
+    ao valor lido. Atualiza `upload.received` e retorna o novo total.
+    """
+    if length <= 0:
+        raise ChunkError("Pedaço vazio.")
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "ab") as target:
+        try:
+            fcntl.flock(target, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise ChunkConflict("Outro pedaço deste upload está sendo enviado.")
+        # O flock é liberado ao fechar o arquivo
+        current = (
+            PhotoUpload.objects.filter(pk=upload.pk)
+            .values_list("received", "status")
+            .first()
+        )
+        if current is None:
+            raise ChunkConflict("Upload não encontrado.")
+        upload.received, upload.status = current
+        if upload.status != "pending":
+            raise ChunkConflict("Upload já concluído.")
+        if start != upload.received:
+            raise ChunkConflict("Offset fora de ordem.")
+        received = append_chunk(upload, target, stream, length)
+        # Em disco antes de confirmar: a conclusão lê o arquivo pelo offset
+        target.flush()
+        confirmed = PhotoUpload.objects.filter(
+            pk=upload.pk, received=upload.received, status="pending"
+        ).update(received=received, updated_at=timezone.now())
+        if not confirmed:
+            target.truncate(upload.received)
+            raise ChunkConflict("Upload alterado durante o envio.")
+    upload.received = received
+    return received
+
+
+def append_chunk(upload, target, stream, length):
+    """
+    Copia até `length` bytes de `stream` para o fim do arquivo parcial
+    `target`, em blocos de READ_SIZE, sem manter o pedaço inteiro em memória.
+    Se o pedaço vier incompleto ou passar do tamanho declarado, o arquivo
+    volta ao tamanho anterior e o upload pode ser retomado do mesmo ponto.
+    Retorna o novo total recebido.
+    """
+    if upload.received + length > upload.size:
+        raise ChunkError("O pedaço ultrapassa o tamanho declarado do arquivo.")
+
+    target.seek(0, os.SEEK_END)
+    if target.tell() != upload.received:
+        # Sobra de uma escrita interrompida: descarta o que não foi confirmado
+        target.truncate(upload.received)
+        target.seek(upload.received)
+    remaining = length
+    while remaining:
+        data = stream.read(min(READ_SIZE, remaining))
+        if not data:
+            break
+        target.write(data)
+        remaining -= len(data)
+    if remaining:
+        target.truncate(upload.received)
+        raise ChunkError("Pedaço incompleto; reenvie a partir do offset informado.")
+    return upload.received + length
+
+
+def discard_partial(upload):
+    try:
+        os.remove(partial_path(upload))
+    except FileNotFoundError:
+        pass
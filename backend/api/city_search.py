@@ -0,0 +1,103 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+# Siglas válidas: "Natal, RN", "Natal/RN" e "Natal - RN" filtram pela UF
+STATES = {
+    "AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+    "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO",
+}
+STATE_SUFFIX = re.compile(r"^(.*\S)\s*(?:,|/|\s-)\s*([A-Za-z]{2})$")
+
+CACHE_VERSION_KEY = "catalog:cities:autocomplete:version"
+
+# city_search_key(text) (migração 0017) é lower + unaccent, imutável para
+# poder ser indexada. O prefixo usa city_search_key_prefix_idx; o início de
+# palavra e a busca aproximada (<%, word_similarity) usam o GIN do pg_trgm
+SEARCH_SQL = """
+    select id, name, state
+      from city
+     where (city_search_key(name) like %(prefix)s
+            or city_search_key(name) like %(word)s
+            or %(term)s <%% city_search_key(name))
+       and (%(state)s::text is null or upper(state) = %(state)s)
+     order by city_search_key(name) like %(prefix)s desc,
+              word_similarity(%(term)s, city_search_key(name)) desc,
+              length(name), name
+     limit %(limit)s
+"""
+
+
+def normalize(text):
+    """Minúsculas, sem acentos e com espaços colapsados (igual ao city_search_key)."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def parse_query(query, state=None):
+    """Separa a UF digitada junto do nome; devolve (termo normalizado, UF)."""
+    query = query.strip()
+    match = STATE_SUFFIX.match(query)
+    if match and match.group(2).upper() in STATES:
+        query, state = match.group(1), state or match.group(2)
+    return normalize(query), (state.strip().upper() or None) if state else None
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _cache_version():
+    version = cache.get(CACHE_VERSION_KEY)
+    if version is None:
+        cache.add(CACHE_VERSION_KEY, 1, None)
+        version = cache.get(CACHE_VERSION_KEY, 1)
+    return version
+
+
+def invalidate_city_autocomplete():
+    """Descarta todos os prefixos em cache trocando a versão das chaves."""
+    try:
+        cache.incr(CACHE_VERSION_KEY)
+    except ValueError:
+        cache.add(CACHE_VERSION_KEY, 1, None)
+
+
+def search_cities(term, state=None, limit=10):
+    """
+    Cidades cujo nome começa com `term` (ou tem uma palavra que começa
+    com ele), depois as parecidas (pg_trgm), limitadas a `limit`.
+    `term` deve vir normalizado. Prefixos curtos, os mais repetidos e com
+    mais resultados, ficam em cache até a próxima escrita em City.
+    """
+    if not term:
+        return []
+    cacheable = len(term) <= settings.CITY_AUTOCOMPLETE_CACHE_PREFIX_LENGTH
+    if cacheable:
+        key = f"catalog:cities:autocomplete:{_cache_version()}:{state or ''}:{limit}:{term}"
+        results = cache.get(key)
+        if results is not None:
+            return results
+
+    escaped = _escape_like(term)
+    params = {
+        "term": term,
+        "prefix": f"{escaped}%",
+        "word": f"% {escaped}%",
+        "state": state,
+        "limit": limit,
+    }
+    with connection.cursor() as cur:
+        cur.execute(SEARCH_SQL, params)
+        results = [
+            {"id": str(city_id), "name": name, "state": city_state}
+            for city_id, name, city_state in cur.fetchall()
+        ]
+
+    if cacheable:
+        cache.set(key, results, settings.CATALOG_CACHE_TIMEOUT)
+    return results
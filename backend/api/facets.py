@@ -0,0 +1,123 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import Item, ItemFacetCount
+
+
+def apply_facet_delta(key, delta):
+    """
+    Soma `delta` ao contador da combinação `key`
+    (category_id, city_id, status, listing_state) com um único upsert.
+    """
+    apply_facet_deltas({key: delta})
+
+
+def apply_facet_deltas(deltas):
+    """
+    Aplica vários deltas (dict key -> delta) num só INSERT ... ON CONFLICT
+    sobre arrays desaninhados, útil após operações em lote. As chaves vão
+    ordenadas: escritas concorrentes travam as linhas na mesma ordem.
+    """
+    keys = sorted((
+        (str(category_id), str(city_id) if city_id else None, status, listing_state, delta)
+        for (category_id, city_id, status, listing_state), delta in deltas.items()
+        if delta
+    ), key=lambda key: (key[0], key[1] or "", key[2], key[3]))
+    if not keys:
+        return
+    columns = [list(column) for column in zip(*keys)]
+    with connection.cursor() as cur:
+        cur.execute("""
+            insert into item_facet_count (category_id, city_id, status, listing_state, count)
+            select * from unnest(%s::uuid[], %s::uuid[], %s::text[], %s::text[], %s::int[])
+            on conflict (category_id, city_id, status, listing_state)
+            do update set count = item_facet_count.count + excluded.count
+        """, columns)
+
+
+@transaction.atomic
+def rebuild_item_facets():
+    """
+    Recalcula todos os contadores a partir da tabela de itens.
+    Usado no backfill e para reconciliar depois de escritas em massa
+    que não disparam signals (queryset.update, bulk_create, COPY).
+    """
+    ItemFacetCount.objects.all().delete()
+    rows = (
+        Item.objects.order_by()
+        .values("category_id", "city_id", "status", "listing_state")
+        .annotate(total=Count("id"))
+    )
+    ItemFacetCount.objects.bulk_create(
+        ItemFacetCount(
+            category_id=row["category_id"],
+            city_id=row["city_id"],
+            status=row["status"],
+            listing_state=row["listing_state"],
+            count=row["total"],
+        )
+        for row in rows
+    )
+
+
+def item_facets(queryset):
+    """
+    Agrega um queryset de ItemFacetCount (já filtrado) em contagens por
+    categoria, cidade, status e estado do anúncio.
+    """
+    rows = queryset.filter(count__gt=0).select_related("category", "city")
+
+    totals = {
+        "category": defaultdict(int),
+        "city": defaultdict(int),
+        "status": defaultdict(int),
+        "listing_state": defaultdict(int),
+    }
+    categories, cities = {}, {}
+    total = 0
+    for row in rows:
+        total += row.count
+        totals["category"][row.category_id] += row.count
+        totals["city"][row.city_id] += row.count
+        totals["status"][row.status] += row.count
+        totals["listing_state"][row.listing_state] += row.count
+        categories[row.category_id] = row.category
+        cities[row.city_id] = row.city
+
+    status_labels = dict(Item.STATUS_CHOICES)
+    state_labels = dict(Item.LISTING_STATE_CHOICES)
+
+    def by_count(entries):
+        return sorted(entries, key=lambda e: -e["count"])
+
+    return {
+        "total": total,
+        "category": by_count(
+            {
+                "id": str(pk),
+                "name": categories[pk].name,
+                "slug": categories[pk].slug,
+                "count": n,
+            }
+            for pk, n in totals["category"].items()
+        ),
+        "city": by_count(
+            {
+                "id": str(pk) if pk else None,
+                "name": cities[pk].name if pk else None,
+                "state": cities[pk].state if pk else None,
+                "count": n,
+            }
+            for pk, n in totals["city"].items()
+        ),
+        "status": by_count(
+            {"value": value, "label": status_labels.get(value, value), "count": n}
+            for value, n in totals["status"].items()
+        ),
+        "listing_state": by_count(
+            {"value": value, "label": state_labels.get(value, value), "count": n}
+            for value, n in totals["listing_state"].items()
+        ),
+    }
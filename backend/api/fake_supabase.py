@@ -0,0 +1,126 @@
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from . import supabase_admin
+
+ADMIN_USERS_PATH = "/auth/v1/admin/users"
+
+
+class FakeSupabaseAdmin:
+    """
+    Admin API do Supabase Auth em memória, servida por HTTP local, para
+    testes e desenvolvimento sem um projeto Supabase:
+
+        with FakeSupabaseAdmin() as fake:
+            call_command("process_supabase_outbox", "--once")
+            fake.users  # {email: id}
+
+    `fail_next` faz as próximas N requisições responderem 503.
+    """
+
+    service_role_key = "fake-service-role-key"
+
+    def __init__(self):
+        self.users = {}
+        self.requests = []
+        # Endereços de origem distintos = conexões TCP abertas pelos clientes
+        self.peers = set()
+        self.fail_next = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._patches = []
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, como a Admin API de verdade
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._handle(self, "GET")
+
+            def do_POST(self):
+                fake._handle(self, "POST")
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._patches = [
+            mock.patch("api.supabase_admin.SUPABASE_URL", self.url),
+            mock.patch("api.supabase_admin.SUPABASE_SERVICE_ROLE_KEY", self.service_role_key),
+        ]
+        for patch in self._patches:
+            patch.start()
+        supabase_admin.reset_state()
+        return self
+
+    def stop(self):
+        for patch in reversed(self._patches):
+            patch.stop()
+        self._patches = []
+        supabase_admin.reset_state()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handle(self, handler, method):
+        parsed = urlparse(handler.path)
+        with self._lock:
+            self.requests.append((method, parsed.path))
+            self.peers.add(handler.client_address)
+            if method == "POST":
+                length = int(handler.headers.get("Content-Length") or 0)
+                body = handler.rfile.read(length)
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return self._reply(handler, 503, {"msg": "Service Unavailable"})
+
+        if parsed.path != ADMIN_USERS_PATH:
+            return self._reply(handler, 404, {"msg": "Not Found"})
+        if handler.headers.get("apikey") != self.service_role_key:
+            return self._reply(handler, 401, {"msg": "Invalid API key"})
+
+        if method == "GET":
+            query = parse_qs(parsed.query).get("email", [""])[0]
+            email = query[3:] if query.startswith("eq.") else query
+            with self._lock:
+                uid = self.users.get(email)
+            users = [{"id": uid, "email": email}] if uid else []
+            return self._reply(handler, 200, {"users": users})
+
+        payload = json.loads(body or b"{}")
+        email = payload.get("email")
+        with self._lock:
+            if not email or email in self.users:
+                return self._reply(handler, 422, {"msg": "Email address already registered"})
+            uid = str(uuid.uuid4())
+            self.users[email] = uid
+        return self._reply(handler, 200, {"id": uid, "email": email})
+
+    @staticmethod
+    def _reply(handler, status, body):
+        data = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
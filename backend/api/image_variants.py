@@ -0,0 +1,123 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .models import ItemPhoto
+
+logger = logging.getLogger(__name__)
+
+# nome -> (largura, altura, formato, recorta para o tamanho exato?)
+VARIANTS = {
+    "thumb": (320, 320, "JPEG", True),
+    "thumb_webp": (320, 320, "WEBP", True),
+    "medium_webp": (1024, 1024, "WEBP", False),
+}
+
+EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp"}
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "IMAGE_VARIANT_WORKERS", 2),
+            thread_name_prefix="image-variants",
+        )
+    return _executor
+
+
+def render_variant(image, width, height, fmt, crop):
+    """
+    Redimensiona uma cópia da imagem e devolve os bytes no formato pedido.
+    A imagem é regravada do zero, então nenhum metadado EXIF é copiado.
+    """
+    if crop:
+        resized = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    else:
+        resized = image.copy()
+        resized.thumbnail((width, height), Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    if fmt == "JPEG":
+        resized.convert("RGB").save(buffer, "JPEG", quality=82, optimize=True, progressive=True)
+    else:
+        resized.save(buffer, fmt, quality=80, method=4)
+    return buffer.getvalue()
+
+
+def variant_name(original_name, variant, fmt):
+    base, _ = os.path.splitext(original_name)
+    directory, filename = os.path.split(base)
+    return os.path.join(directory, "variants", f"{filename}_{variant}.{EXTENSIONS[fmt]}")
+
+
+def generate_variants(photo_id):
+    """
+    Gera as variantes de uma ItemPhoto e grava os caminhos em `variants`.
+    Roda fora do ciclo da requisição (ver schedule_variants).
+    """
+    try:
+        photo = ItemPhoto.objects.get(pk=photo_id)
+    except ItemPhoto.DoesNotExist:
+        return None
+    if not photo.image:
+        return None
+
+    with photo.image.open("rb") as source:
+        image = Image.open(source)
+        # Aplica a rotação do EXIF antes de descartá-lo
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        variants = {}
+        for variant, (width, height, fmt, crop) in VARIANTS.items():
+            name = variant_name(photo.image.name, variant, fmt)
+            # Fotos que compartilham o mesmo blob reaproveitam as variantes
+            if not default_storage.exists(name):
+                content = render_variant(image, width, height, fmt, crop)
+                name = default_storage.save(name, ContentFile(content))
+            variants[variant] = name
+
+    # update() para não sobrescrever outros campos alterados em paralelo
+    ItemPhoto.objects.filter(pk=photo_id).update(variants=variants)
+    return variants
+
+
+def _run(photo_id):
+    try:
+        generate_variants(photo_id)
+    except Exception:
+        logger.exception("Falha ao gerar variantes da foto %s", photo_id)
+    finally:
+        # Threads do pool abrem conexões próprias com o banco
+        close_old_connections()
+
+
+def schedule_variants(photo_id):
+    """
+    Agenda a geração das variantes para depois do commit da transação
+    atual, no pool de workers. Com IMAGE_VARIANTS_ASYNC=False roda na
+    mesma thread (útil em testes e em scripts).
+    """
+    if getattr(settings, "IMAGE_VARIANTS_ASYNC", True):
+        transaction.on_commit(lambda: _get_executor().submit(_run, photo_id))
+    else:
+        transaction.on_commit(lambda: generate_variants(photo_id))
+
+
+def delete_variants(photo):
+    for name in (photo.variants or {}).values():
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.warning("Não foi possível remover a variante %s", name)
@@ -0,0 +1,153 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .facets import apply_facet_deltas
+from .image_variants import schedule_variants
+from .models import Category, City, Item, ItemPhoto, PhotoUpload
+from .serializers import ItemBatchEntrySerializer
+
+ITEM_FIELDS = ("title", "description", "category_id", "city_id", "status", "listing_state")
+
+
+def _model_values(data):
+    values = {}
+    for field in ("title", "description", "status", "listing_state"):
+        if field in data:
+            values[field] = data[field]
+    if "category" in data:
+        values["category_id"] = data["category"]
+    if "city_id" in data:
+        values["city_id"] = data["city_id"]
+    return values
+
+
+def apply_item_batch(user, entries):
+    """
+    Cria e atualiza os itens de `entries` numa única transação, com
+    bulk_create/bulk_update e um número fixo de queries por lote.
+
+    Devolve (itens na ordem de entrada, erros). Se qualquer entrada for
+    inválida nada é gravado e `erros` lista {"index", "errors"} por entrada.
+    bulk_* não dispara signals: contadores de facetas e variantes das
+    fotos são atualizados aqui.
+    """
+    errors = []
+    valid = []
+    for index, entry in enumerate(entries):
+        serializer = ItemBatchEntrySerializer(data=entry)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({"index": index, "errors": serializer.errors})
+
+    category_ids = {d["category"] for _, d in valid if "category" in d}
+    city_ids = {d["city_id"] for _, d in valid if d.get("city_id")}
+    item_ids = {d["id"] for _, d in valid if "id" in d}
+    upload_ids = {u for _, d in valid for u in d.get("upload_ids", ())}
+
+    with transaction.atomic():
+        known_categories = set(
+            Category.objects.filter(id__in=category_ids).values_list("id", flat=True)
+        )
+        known_cities = set(City.objects.filter(id__in=city_ids).values_list("id", flat=True))
+        # Travados até o fim do lote: edições concorrentes dos mesmos itens esperam
+        existing = {
+            item.id: item
+            for item in Item.objects.select_for_update().filter(user=user, id__in=item_ids)
+        }
+        uploads = {
+            upload.id: upload
+            for upload in PhotoUpload.objects.select_for_update().select_related("blob").filter(
+                user=user, id__in=upload_ids, item__isnull=True,
+                status="complete", blob__isnull=False,
+            )
+        }
+        photo_counts = dict(
+            ItemPhoto.objects.filter(item_id__in=existing)
+            .values("item_id").annotate(total=Count("id")).values_list("item_id", "total")
+        )
+
+        seen_uploads = set()
+        for index, data in valid:
+            entry_errors = {}
+            if "category" in data and data["category"] not in known_categories:
+                entry_errors["category"] = "Categoria não encontrada."
+            if data.get("city_id") and data["city_id"] not in known_cities:
+                entry_errors["city_id"] = "Cidade não encontrada."
+            if "id" in data and data["id"] not in existing:
+                entry_errors["id"] = "Item não encontrado ou você não tem permissão."
+            entry_uploads = data.get("upload_ids", [])
+            bad_uploads = [
+                str(u) for u in entry_uploads if u not in uploads or u in seen_uploads
+            ]
+            seen_uploads.update(entry_uploads)
+            if bad_uploads:
+                entry_errors["upload_ids"] = (
+                    "Uploads não encontrados, incompletos ou já usados: " + ", ".join(bad_uploads)
+                )
+            current = photo_counts.get(data.get("id"), 0)
+            if current + len(entry_uploads) > Item.MAX_PHOTOS:
+                entry_errors["upload_ids"] = f"O item pode ter no máximo {Item.MAX_PHOTOS} fotos."
+            if entry_errors:
+                errors.append({"index": index, "errors": entry_errors})
+
+        if errors:
+            errors.sort(key=lambda e: e["index"])
+            return [], errors
+
+        now = timezone.now()
+        to_create, to_update, ordered = [], [], []
+        updated_fields = {"updated_at"}
+        deltas = defaultdict(int)
+        for _, data in valid:
+            values = _model_values(data)
+            if "id" in data:
+                item = existing[data["id"]]
+                old_key = item.facet_key
+                for field, value in values.items():
+                    setattr(item, field, value)
+                updated_fields.update(values)
+                # bulk_update não aplica auto_now
+                item.updated_at = now
+                if item.facet_key != old_key:
+                    deltas[old_key] -= 1
+                    deltas[item.facet_key] += 1
+                to_update.append(item)
+            else:
+                item = Item(user=user, **values)
+                to_create.append(item)
+            ordered.append((item, data.get("upload_ids", [])))
+
+        Item.objects.bulk_create(to_create)
+        for item in to_create:
+            deltas[item.facet_key] += 1
+        if to_update:
+            Item.objects.bulk_update(to_update, sorted(updated_fields))
+        apply_facet_deltas({key: delta for key, delta in deltas.items() if delta})
+
+        photos, attached = [], []
+        for item, entry_uploads in ordered:
+            position = photo_counts.get(item.id, 0)
+            for upload_id in entry_uploads:
+                upload = uploads[upload_id]
+                position += 1
+                # A referência ao blob guardada pelo upload passa para a foto
+                photo = ItemPhoto(
+                    item=item, image=upload.blob.name, blob_id=upload.blob_id, position=position
+                )
+                photos.append(photo)
+                upload.item = item
+                upload.photo = photo
+                upload.blob = None
+                upload.updated_at = now
+                attached.append(upload)
+        if photos:
+            ItemPhoto.objects.bulk_create(photos)
+            PhotoUpload.objects.bulk_update(attached, ["item", "photo", "blob", "updated_at"])
+            for photo in photos:
+                schedule_variants(photo.pk)
+
+    return [item for item, _ in ordered], []
@@ -0,0 +1,174 @@
+import asyncio
+import statistics
+import threading
+import time
+import types
+
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test.utils import override_settings
+from django.urls import path
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import async_views, views
+from api.models import Category, City, Item, ItemPhoto
+
+BENCH_USER = "bench_async"
+BENCH_SLUG = "bench-async"
+
+
+def build_urlconf(module):
+    """URLconf só com as quatro leituras, apontando para `module`."""
+    urlconf = types.ModuleType(f"bench_{module.__name__.replace('.', '_')}_urls")
+    urlconf.urlpatterns = [
+        path("items/", module.ReadItemsView.as_view(), name="get-items"),
+        path("items/<uuid:pk>/", module.ReadItemView.as_view(), name="item-detail"),
+        path("categories/", module.ListCategoriesView.as_view(), name="list-categories"),
+        path("cities/", module.ListCitiesView.as_view(), name="list-cities"),
+    ]
+    return urlconf
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara as views de leitura síncronas (DRF) com as async sob ASGI, "
+        "com muitos clientes lentos em paralelo. Roda o ASGIHandler do Django "
+        "no próprio processo, sem servidor; cria e remove a massa de teste."
+    )
+
+    def add_arguments(self, parser):
+        # Cada requisição em andamento segura uma conexão com o Postgres:
+        # mantenha abaixo do max_connections do servidor
+        parser.add_argument("--clients", type=int, default=80, help="clientes simultâneos")
+        parser.add_argument("--requests", type=int, default=10, help="requisições por cliente")
+        parser.add_argument(
+            "--client-delay-ms", type=float, default=50.0,
+            help="atraso do cliente ao enviar a requisição e ao ler cada parte da resposta",
+        )
+        parser.add_argument("--items", type=int, default=200)
+        parser.add_argument(
+            "--endpoint", choices=["items", "item", "categories", "cities", "all"], default="all"
+        )
+
+    def handle(self, *args, **options):
+        # Como num deploy ASGI: sem conexões persistentes por thread
+        connections.settings[connection.alias]["CONN_MAX_AGE"] = 0
+        user, category, city, item_id = self.seed(options)
+        token = str(RefreshToken.for_user(user).access_token)
+        endpoints = {
+            "items": ("/items/", b"page_size=20"),
+            "item": (f"/items/{item_id}/", b""),
+            "categories": ("/categories/", b""),
+            "cities": ("/cities/", b""),
+        }
+        if options["endpoint"] != "all":
+            endpoints = {options["endpoint"]: endpoints[options["endpoint"]]}
+        try:
+            for name, (url, query) in endpoints.items():
+                for label, module in (("sync", views), ("async", async_views)):
+                    with override_settings(ROOT_URLCONF=build_urlconf(module)):
+                        result = asyncio.run(self.run(url, query, token, options))
+                    self.report(name, label, result)
+        finally:
+            self.cleanup(user, category, city)
+
+    def seed(self, options):
+        user, _ = User.objects.get_or_create(username=BENCH_USER)
+        category, _ = Category.objects.get_or_create(slug=BENCH_SLUG, defaults={"name": "Bench async"})
+        city, _ = City.objects.get_or_create(name="Bench Async", state="BX")
+        items = Item.objects.bulk_create(
+            Item(user=user, title=f"Bench {n}", category=category, city=city, status="used")
+            for n in range(options["items"])
+        )
+        ItemPhoto.objects.bulk_create(
+            ItemPhoto(item=item, url=f"https://cdn.example.com/bench/{n}.jpg", position=1)
+            for n, item in enumerate(items)
+        )
+        return user, category, city, items[-1].id
+
+    async def run(self, url, query, token, options):
+        app = ASGIHandler()
+        delay = options["client_delay_ms"] / 1000
+        latencies, statuses = [], {}
+        peak_threads = threading.active_count()
+        done = asyncio.Event()
+
+        async def watch_threads():
+            nonlocal peak_threads
+            while not done.is_set():
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.005)
+
+        async def request():
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+                "method": "GET", "scheme": "http", "path": url, "raw_path": url.encode(),
+                "query_string": query, "root_path": "",
+                "headers": [(b"host", b"testserver"), (b"authorization", f"Bearer {token}".encode())],
+                "server": ("testserver", 80), "client": ("127.0.0.1", 50000),
+            }
+            sent_request = False
+            disconnected = asyncio.Event()
+            status = None
+
+            async def receive():
+                nonlocal sent_request
+                if not sent_request:
+                    # Cliente lento para enviar a requisição
+                    sent_request = True
+                    await asyncio.sleep(delay)
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                elif message["type"] == "http.response.body":
+                    # Cliente lento para ler a resposta
+                    await asyncio.sleep(delay)
+
+            started = time.perf_counter()
+            await app(scope, receive, send)
+            disconnected.set()
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        async def client():
+            for _ in range(options["requests"]):
+                await request()
+
+        watcher = asyncio.create_task(watch_threads())
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options["clients"])))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await watcher
+        return {
+            "rate": len(latencies) / elapsed,
+            "p50": statistics.median(latencies) * 1000,
+            "p95": statistics.quantiles(latencies, n=100)[94] * 1000,
+            "threads": peak_threads,
+            "statuses": statuses,
+        }
+
+    def report(self, name, label, result):
+        statuses = ", ".join(f"{code}: {count}" for code, count in sorted(result["statuses"].items()))
+        self.stdout.write(
+            f"{name:>10} {label:>5}: {result['rate']:7.0f} req/s  p50 {result['p50']:7.1f} ms  "
+            f"p95 {result['p95']:7.1f} ms  threads {result['threads']:3d}  ({statuses})"
+        )
+
+    def cleanup(self, user, category, city):
+        with connection.cursor() as cur:
+            cur.execute(
+                "delete from itemphoto where item_id in (select id from item where user_id = %s)",
+                [user.id],
+            )
+            cur.execute("delete from item where user_id = %s", [user.id])
+        city.delete()
+        category.delete()
+        user.delete()
@@ -0,0 +1,171 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from api.models import Category, City, Item
+from api.proximity import EARTH_RADIUS_KM, bounding_box, nearby_items
+
+BENCH_USER = "bench_nearby"
+BENCH_SLUG = "bench-nearby"
+
+# Recorte aproximado do território brasileiro
+LAT_RANGE = (-33.0, 4.0)
+LNG_RANGE = (-73.0, -35.0)
+
+SEED_ITEMS_SQL = """
+    insert into item (id, user_id, title, description, category_id, city_id,
+                      status, listing_state, created_at, updated_at)
+    select gen_random_uuid(), %(user_id)s, 'Item ' || n, null, %(category_id)s,
+           (%(city_ids)s::uuid[])[1 + floor(random() * %(city_count)s)::int],
+           case when random() < 0.5 then 'new' else 'used' end,
+           case when random() < 0.9 then 'active' else 'inactive' end,
+           now() - random() * interval '365 days', now()
+      from generate_series(%(start)s, %(stop)s) as n
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a latência da busca por proximidade (/items/nearby/) sobre uma "
+        "massa sintética, comparando a consulta por cidade (LATERAL) com um "
+        "ORDER BY distância sobre todos os itens do raio. Cria e remove os dados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=1_000_000)
+        parser.add_argument("--cities", type=int, default=5570, help="municípios sintéticos")
+        parser.add_argument("--queries", type=int, default=100)
+        parser.add_argument("--radius", type=float, default=100.0, help="raio em km")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--pages", type=int, default=5, help="páginas seguidas por consulta")
+        parser.add_argument("--keep", action="store_true", help="não remove a massa no fim")
+
+    def handle(self, *args, **options):
+        user, category, cities = self.seed(options)
+        try:
+            rng = random.Random(42)
+            origins = [rng.choice(cities) for _ in range(options["queries"])]
+            for label, run in (("lateral", self.run_lateral), ("order by", self.run_naive)):
+                first, later = [], []
+                for lat, lng in origins:
+                    timings = run(lat, lng, options)
+                    first.append(timings[0])
+                    later.extend(timings[1:])
+                self.report(label, first, later)
+        finally:
+            if not options["keep"]:
+                self.cleanup(user, category)
+
+    def seed(self, options):
+        user, _ = User.objects.get_or_create(username=BENCH_USER)
+        category, _ = Category.objects.get_or_create(slug=BENCH_SLUG, defaults={"name": "Bench proximidade"})
+        rng = random.Random(7)
+        existing = City.objects.filter(name__startswith="Bench Município ").count()
+        City.objects.bulk_create(
+            City(
+                name=f"Bench Município {n}", state="BX",
+                latitude=rng.uniform(*LAT_RANGE), longitude=rng.uniform(*LNG_RANGE),
+            )
+            for n in range(existing, options["cities"])
+        )
+        cities = list(
+            City.objects.filter(name__startswith="Bench Município ").values_list("id", "latitude", "longitude")
+        )
+        city_ids = [str(city_id) for city_id, _, _ in cities]
+
+        current = Item.objects.filter(user=user).count()
+        started = time.perf_counter()
+        step = 100_000
+        with connection.cursor() as cur:
+            for start in range(current + 1, options["items"] + 1, step):
+                stop = min(start + step - 1, options["items"])
+                cur.execute(SEED_ITEMS_SQL, {
+                    "user_id": user.id, "category_id": category.id, "city_ids": city_ids,
+                    "city_count": len(city_ids), "start": start, "stop": stop,
+                })
+                self.stdout.write(f"  {stop:,} itens")
+            cur.execute("analyze item")
+            cur.execute("analyze city")
+        if current < options["items"]:
+            self.stdout.write(
+                f"Massa: {options['items']:,} itens em {len(cities):,} cidades "
+                f"({time.perf_counter() - started:.0f}s)"
+            )
+        return user, category, [(lat, lng) for _, lat, lng in cities]
+
+    def run_lateral(self, lat, lng, options):
+        timings, after = [], None
+        for _ in range(options["pages"]):
+            started = time.perf_counter()
+            rows = nearby_items(lat, lng, options["radius"], options["page_size"] + 1, after)
+            timings.append(time.perf_counter() - started)
+            if len(rows) <= options["page_size"]:
+                break
+            after = rows[options["page_size"] - 1]
+        return timings
+
+    def run_naive(self, lat, lng, options):
+        """Referência: filtra as cidades do raio e ordena todos os itens delas."""
+        lat_min, lat_max, lng_min, lng_max = bounding_box(lat, lng, options["radius"])
+        distance = RawSQL(
+            "2 * %s * asin(least(1, sqrt(power(sin(radians(city.latitude - %s) / 2), 2)"
+            " + cos(radians(%s)) * cos(radians(city.latitude))"
+            " * power(sin(radians(city.longitude - %s) / 2), 2))))",
+            (EARTH_RADIUS_KM, lat, lat, lng),
+            output_field=FloatField(),
+        )
+        queryset = (
+            Item.objects.filter(
+                listing_state="active",
+                city__latitude__range=(lat_min, lat_max),
+                city__longitude__range=(lng_min, lng_max),
+            )
+            .annotate(distance=distance)
+            .filter(distance__lte=options["radius"])
+            .order_by("distance", "city_id", "-created_at", "-id")
+            .values_list("distance", "city_id", "created_at", "id")
+        )
+        timings, after = [], None
+        for _ in range(options["pages"]):
+            page = queryset
+            if after:
+                d, city_id, created_at, item_id = after
+                page = page.filter(
+                    Q(distance__gt=d)
+                    | Q(distance=d, city_id__gt=city_id)
+                    | Q(city_id=city_id, created_at__lt=created_at)
+                    | Q(city_id=city_id, created_at=created_at, id__lt=item_id)
+                )
+            started = time.perf_counter()
+            rows = list(page[: options["page_size"] + 1])
+            timings.append(time.perf_counter() - started)
+            if len(rows) <= options["page_size"]:
+                break
+            after = rows[options["page_size"] - 1]
+        return timings
+
+    def report(self, label, first, later):
+        def ms(values, q):
+            if not values:
+                return 0.0
+            return statistics.quantiles(values, n=100)[q - 1] * 1000 if len(values) > 1 else values[0] * 1000
+
+        self.stdout.write(
+            f"{label:>9}: 1ª página p50 {ms(first, 50):.1f} ms / p95 {ms(first, 95):.1f} ms; "
+            f"seguintes p50 {ms(later, 50):.1f} ms / p95 {ms(later, 95):.1f} ms"
+        )
+
+    def cleanup(self, user, category):
+        # DELETE direto: o collector do ORM carregaria um milhão de objetos e
+        # o signal de City reconstruiria as facetas a cada cidade removida
+        with connection.cursor() as cur:
+            cur.execute("delete from item where user_id = %s", [user.id])
+            cur.execute("delete from city where name like 'Bench Município %%'")
+        category.delete()
+        user.delete()
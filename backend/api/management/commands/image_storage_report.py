@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.blob_storage import storage_report
+
+
+class Command(BaseCommand):
+    help = "Mostra quanto espaço a deduplicação de imagens de itens economizou."
+
+    def handle(self, *args, **options):
+        report = storage_report()
+        logical = report["logical_bytes"]
+        ratio = (report["saved_bytes"] / logical * 100) if logical else 0
+        self.stdout.write(f"Blobs armazenados:   {report['blobs']}")
+        self.stdout.write(f"Fotos referenciando: {report['references']}")
+        self.stdout.write(f"Bytes gravados:      {report['stored_bytes']}")
+        self.stdout.write(f"Bytes sem dedup:     {logical}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Bytes economizados:  {report['saved_bytes']} ({ratio:.1f}%)")
+        )
@@ -0,0 +1,66 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk_import import COLUMNS, BulkImportError, import_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa categorias, cidades ou itens de um CSV/JSONL via COPY. "
+        "Categorias casam por slug, cidades por nome + UF e itens por id (se houver)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(COLUMNS))
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format", choices=["csv", "jsonl"],
+            help="Padrão: deduzido pela extensão do arquivo.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=50000,
+            help="Registros por lote de COPY + merge (limita a memória usada).",
+        )
+        parser.add_argument(
+            "--owner",
+            help="Username ou e-mail do dono dos itens sem a coluna 'owner'.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+        if not os.path.exists(path):
+            raise CommandError(f"Arquivo não encontrado: {path}")
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size deve ser positivo.")
+
+        def progress(read, written, skipped, rate):
+            self.stdout.write(
+                f"{options['kind']}: {read} lidas, {written} gravadas, "
+                f"{skipped} descartadas ({rate:,.0f} linhas/s)"
+            )
+
+        try:
+            with open(path, newline="", encoding="utf-8") as fh:
+                read, written, skipped = import_file(
+                    options["kind"], fh, fmt,
+                    batch_size=options["batch_size"],
+                    owner=options["owner"],
+                    progress=progress,
+                )
+        except BulkImportError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Importação concluída: {read} lidas, {written} gravadas, {skipped} descartadas."
+        ))
+        if written and options["kind"] != "items":
+            # O cache do catálogo é por processo: não dá para invalidar
+            # os workers daqui, só esperar o TTL
+            self.stdout.write(self.style.WARNING(
+                f"Os workers em execução podem servir a lista anterior de {options['kind']} "
+                f"(e o autocomplete de cidades) por até {settings.CATALOG_CACHE_TIMEOUT}s "
+                f"(CATALOG_CACHE_TIMEOUT); reinicie-os para ver a importação na hora."
+            ))
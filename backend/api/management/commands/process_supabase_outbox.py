@@ -0,0 +1,34 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.supabase_admin import admin_api_status
+from api.supabase_outbox import process_due_jobs
+
+
+class Command(BaseCommand):
+    help = "Processa o outbox de criação de usuários no Supabase Auth."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Processa um lote e sai.")
+        parser.add_argument("--batch", type=int, default=20, help="Jobs reservados por lote.")
+        parser.add_argument(
+            "--interval", type=float, default=2.0,
+            help="Segundos de espera quando não há jobs vencidos.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            done, failed = process_due_jobs(options["batch"])
+            if done or failed:
+                self.stdout.write(f"Sincronizados: {done}  Falhas: {failed}")
+                if options["verbosity"] >= 2:
+                    # Latência das chamadas, cache e estado do circuit breaker
+                    self.stdout.write(json.dumps(admin_api_status()))
+            if options["once"]:
+                return
+            close_old_connections()
+            if not (done or failed):
+                time.sleep(options["interval"])
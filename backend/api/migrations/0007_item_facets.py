@@ -0,0 +1,76 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_facet_counts(apps, schema_editor):
+    Item = apps.get_model('api', 'Item')
+    ItemFacetCount = apps.get_model('api', 'ItemFacetCount')
+    rows = (
+        Item.objects.order_by()
+        .values('category_id', 'city_id', 'status', 'listing_state')
+        .annotate(total=Count('id'))
+    )
+    ItemFacetCount.objects.bulk_create(
+        ItemFacetCount(
+            category_id=row['category_id'],
+            city_id=row['city_id'],
+            status=row['status'],
+            listing_state=row['listing_state'],
+            count=row['total'],
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_item_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('new', 'Novo'), ('used', 'Usado')], max_length=20)),
+                ('listing_state', models.CharField(choices=[('active', 'Ativo'), ('inactive', 'Inativo')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'item_facet_count',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('listing_state', 'active')), fields=['category', '-created_at', '-id'], name='item_active_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('listing_state', 'active')), fields=['city', '-created_at', '-id'], name='item_active_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['listing_state', 'status', '-created_at', '-id'], name='item_state_status_idx'),
+        ),
+        migrations.AddField(
+            model_name='itemfacetcount',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.category'),
+        ),
+        migrations.AddField(
+            model_name='itemfacetcount',
+            name='city',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.city'),
+        ),
+        migrations.AddConstraint(
+            model_name='itemfacetcount',
+            constraint=models.UniqueConstraint(fields=('category', 'city', 'status', 'listing_state'), name='item_facet_count_key', nulls_distinct=False),
+        ),
+        migrations.RunPython(backfill_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_item_facets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemphoto',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:05
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_notification_inbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notification_user_created_idx',
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='count',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        # Notificações existentes mantêm a posição na caixa de entrada
+        migrations.RunSQL(
+            "update notification set updated_at = created_at",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='notification_user_updated_idx'),
+        ),
+    ]
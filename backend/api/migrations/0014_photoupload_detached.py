@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 11:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_notification_coalesce'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photoupload',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='api.imageblob'),
+        ),
+        migrations.AlterField(
+            model_name='photoupload',
+            name='item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='api.item'),
+        ),
+    ]
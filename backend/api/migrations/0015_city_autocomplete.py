@@ -0,0 +1,69 @@
+from django.db import DatabaseError, migrations, transaction
+
+# Usado quando a extensão unaccent não está disponível; cobre o português
+ACCENTED = "áàâãäåéèêëíìîïóòôõöúùûüçñý"
+PLAIN = "aaaaaaeeeeiiiiooooouuuucny"
+
+
+def available_extensions(cursor):
+    cursor.execute(
+        "select name from pg_available_extensions where name in ('pg_trgm', 'unaccent')"
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def installed_extensions(cursor):
+    cursor.execute("select extname from pg_extension where extname in ('pg_trgm', 'unaccent')")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def create_city_search_key(apps, schema_editor):
+    """
+    Cria city_search_key(text) e os índices do autocomplete. pg_trgm e
+    unaccent são opcionais: sem permissão ou sem o pacote contrib a busca
+    cai para prefixo com acentos removidos por translate().
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        for extension in sorted(available_extensions(cursor)):
+            try:
+                with transaction.atomic(using=connection.alias):
+                    cursor.execute(f"create extension if not exists {extension}")
+            except DatabaseError:
+                # Sem privilégio para criar a extensão: segue sem ela
+                pass
+        installed = installed_extensions(cursor)
+
+        if "unaccent" in installed:
+            body = "select lower(public.unaccent('public.unaccent'::regdictionary, $1))"
+        else:
+            body = f"select translate(lower($1), '{ACCENTED}', '{PLAIN}')"
+        cursor.execute(
+            "create or replace function city_search_key(text) returns text "
+            f"language sql immutable strict parallel safe as $${body}$$"
+        )
+        cursor.execute(
+            "create index city_search_key_prefix_idx on city (city_search_key(name) text_pattern_ops)"
+        )
+        if "pg_trgm" in installed:
+            cursor.execute(
+                "create index city_search_key_trgm_idx on city using gin (city_search_key(name) gin_trgm_ops)"
+            )
+
+
+def drop_city_search_key(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("drop index if exists city_search_key_trgm_idx")
+        cursor.execute("drop index if exists city_search_key_prefix_idx")
+        cursor.execute("drop function if exists city_search_key(text)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_photoupload_detached'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_city_search_key, drop_city_search_key),
+    ]
@@ -0,0 +1,45 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations, models
+
+# A 0015 criava as extensões só quando possível e, sem elas, caía para
+# translate() e um índice só de prefixo. Agora pg_trgm e unaccent são
+# obrigatórias: a migração falha num banco sem o pacote contrib
+CITY_SEARCH_KEY_SQL = """
+    drop index if exists city_search_key_trgm_idx;
+    drop index if exists city_search_key_prefix_idx;
+    create or replace function city_search_key(text) returns text
+        language sql immutable strict parallel safe
+        as $$select lower(public.unaccent('public.unaccent'::regdictionary, $1))$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_city_coordinates'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.RunSQL(CITY_SEARCH_KEY_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='city',
+            index=models.Index(
+                django.contrib.postgres.indexes.OpClass(
+                    models.Func(models.F('name'), function='city_search_key', output_field=models.TextField()), name='text_pattern_ops'
+                ),
+                name='city_search_key_prefix_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='city',
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    models.Func(models.F('name'), function='city_search_key', output_field=models.TextField()), name='gin_trgm_ops'
+                ),
+                name='city_search_key_trgm_idx',
+            ),
+        ),
+    ]
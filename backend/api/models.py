@@ -1,7 +1,10 @@
 import uuid
 
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -16,13 +19,39 @@ class Category(models.Model):
         return self.name
 
 
+def city_search_key(expression):
+    """city_search_key(text) do banco (migração 0017): lower + unaccent, imutável."""
+    return models.Func(expression, function="city_search_key", output_field=models.TextField())
+
+
 class City(models.Model):
     class Meta:
         db_table = "city"
+        indexes = [
+            # Caixa delimitadora da busca por proximidade (sem PostGIS)
+            models.Index(
+                fields=["latitude", "longitude"],
+                condition=models.Q(latitude__isnull=False, longitude__isnull=False),
+                name="city_lat_lng_idx",
+            ),
+            # Autocomplete: prefixo do nome (LIKE 'termo%') e, pelo pg_trgm,
+            # início de palavra (LIKE '% termo%') e busca aproximada (<%)
+            models.Index(
+                OpClass(city_search_key(models.F("name")), name="text_pattern_ops"),
+                name="city_search_key_prefix_idx",
+            ),
+            GinIndex(
+                OpClass(city_search_key(models.F("name")), name="gin_trgm_ops"),
+                name="city_search_key_trgm_idx",
+            ),
+        ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.TextField(null=False)
     state = models.TextField(null=True, blank=True)
+    # Coordenadas do centro do município, em graus (WGS 84)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.name} ({self.state})" if self.state else self.name
@@ -31,6 +60,26 @@ class City(models.Model):
 class Item(models.Model):
     class Meta:
         db_table = "item"
+        indexes = [
+            # Sustenta a paginação por cursor do feed: ORDER BY created_at, id
+            models.Index(fields=["-created_at", "-id"], name="item_created_id_idx"),
+            GinIndex(fields=["search_vector"], name="item_search_vector_idx"),
+            # Filtros do catálogo: cada um mantém a ordem do feed
+            models.Index(
+                fields=["category", "-created_at", "-id"],
+                condition=models.Q(listing_state="active"),
+                name="item_active_category_idx",
+            ),
+            models.Index(
+                fields=["city", "-created_at", "-id"],
+                condition=models.Q(listing_state="active"),
+                name="item_active_city_idx",
+            ),
+            models.Index(
+                fields=["listing_state", "status", "-created_at", "-id"],
+                name="item_state_status_idx",
+            ),
+        ]
 
     STATUS_CHOICES = [("new", "Novo"), ("used", "Usado")]
     LISTING_STATE_CHOICES = [("active", "Ativo"), ("inactive", "Inativo")]
@@ -48,10 +97,79 @@ class Item(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Coluna gerada pelo Postgres para a busca textual (título pesa mais)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", weight="A", config="portuguese")
+            + SearchVector("description", weight="B", config="portuguese")
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    FACET_FIELDS = ("category_id", "city_id", "status", "listing_state")
+    MAX_PHOTOS = 6
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda a combinação de facetas lida do banco para que o signal de
+        # post_save saiba de qual contador decrementar numa atualização
+        loaded = dict(zip(field_names, values))
+        if all(f in loaded for f in cls.FACET_FIELDS):
+            instance._loaded_facet_key = tuple(loaded[f] for f in cls.FACET_FIELDS)
+        return instance
+
+    @property
+    def facet_key(self):
+        return tuple(getattr(self, f) for f in self.FACET_FIELDS)
+
+
+class ItemFacetCount(models.Model):
+    """
+    Quantidade de itens por combinação (categoria, cidade, status, estado).
+    Mantida de forma incremental pelos signals de Item, permite responder
+    às facetas do catálogo sem GROUP BY na tabela de itens.
+    """
+
+    class Meta:
+        db_table = "item_facet_count"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "city", "status", "listing_state"],
+                name="item_facet_count_key",
+                nulls_distinct=False,
+            ),
+        ]
+
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="+")
+    city = models.ForeignKey(
+        City, on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    status = models.CharField(max_length=20, choices=Item.STATUS_CHOICES)
+    listing_state = models.CharField(max_length=20, choices=Item.LISTING_STATE_CHOICES)
+    count = models.IntegerField(default=0)
+
+
+class ImageBlob(models.Model):
+    """
+    Arquivo de imagem armazenado pelo hash SHA-256 do conteúdo.
+    Fotos com o mesmo conteúdo apontam para o mesmo blob; o arquivo só é
+    removido quando a última referência (ref_count) é liberada.
+    """
+
+    class Meta:
+        db_table = "imageblob"
+
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.TextField()
+    size = models.BigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
 
 class ItemPhoto(models.Model):
     class Meta:
@@ -63,6 +181,12 @@ class ItemPhoto(models.Model):
     url = models.TextField(null=True, blank=True)  # Mantém para compatibilidade com URLs externas
     position = models.IntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Caminhos no storage das versões reduzidas (ver api.image_variants)
+    variants = models.JSONField(default=dict, blank=True)
+    # Conteúdo deduplicado (ver api.blob_storage); nulo em fotos antigas
+    blob = models.ForeignKey(
+        ImageBlob, on_delete=models.PROTECT, null=True, blank=True, related_name="photos"
+    )
     
     def get_url(self):
         """Retorna a URL da imagem (local ou externa)"""
@@ -70,6 +194,51 @@ class ItemPhoto(models.Model):
             return self.image.url
         return self.url or ''
 
+    def get_variant_urls(self):
+        """Retorna {variante: URL}; vazio enquanto as variantes não forem geradas"""
+        storage = self.image.storage
+        return {name: storage.url(path) for name, path in (self.variants or {}).items()}
+
+    def get_thumbnail_url(self):
+        """URL da miniatura, ou a original enquanto ela não existir"""
+        path = (self.variants or {}).get("thumb_webp")
+        if path:
+            return self.image.storage.url(path)
+        return self.get_url()
+
+
+class PhotoUpload(models.Model):
+    """
+    Upload de foto enviado em partes (iniciar, PUT dos pedaços, concluir).
+    Os bytes recebidos ficam num arquivo parcial em CHUNKED_UPLOAD_DIR até a
+    conclusão, quando viram uma ItemPhoto. Uploads sem item (para o lote de
+    itens) guardam na conclusão só uma referência ao blob em `blob`, que
+    passa para a ItemPhoto criada pelo ItemBatchView.
+    """
+
+    class Meta:
+        db_table = "photoupload"
+
+    STATUS_CHOICES = [("pending", "Pendente"), ("complete", "Concluído")]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="photo_uploads")
+    item = models.ForeignKey(
+        Item, on_delete=models.CASCADE, null=True, blank=True, related_name="uploads"
+    )
+    filename = models.TextField()
+    content_type = models.CharField(max_length=100, blank=True, default="")
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    photo = models.OneToOneField(
+        ItemPhoto, on_delete=models.SET_NULL, null=True, blank=True, related_name="upload"
+    )
+    blob = models.ForeignKey(
+        ImageBlob, on_delete=models.PROTECT, null=True, blank=True, related_name="+"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
 
 class UserProfile(models.Model):
     class Meta:
@@ -89,6 +258,16 @@ class UserProfile(models.Model):
 class Notification(models.Model):
     class Meta:
         db_table = "notification"
+        indexes = [
+            # Lista da caixa de entrada (keyset por updated_at, id)
+            models.Index(
+                fields=["user", "-updated_at", "-id"], name="notification_user_updated_idx"
+            ),
+            # Não lidas de um usuário (filtro is_read=false e mark-read)
+            models.Index(
+                fields=["user", "is_read", "created_at"], name="notification_user_read_idx"
+            ),
+        ]
     NOTIFICATION_TYPE = [
         ("profile", "Perfil"),
         ("item", "Item"),
@@ -102,4 +281,65 @@ class Notification(models.Model):
     reference_id = models.UUIDField(null=True, blank=True)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Notificações repetidas dentro da janela viram uma só linha
+    # (api.notifications.notify): count soma e updated_at avança
+    count = models.IntegerField(default=1)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado lido do banco, para o signal ajustar o contador de não lidas
+        loaded = dict(zip(field_names, values))
+        if "is_read" in loaded:
+            instance._loaded_is_read = loaded["is_read"]
+        return instance
+
+
+class NotificationCounter(models.Model):
+    """
+    Quantidade de notificações não lidas por usuário, mantida de forma
+    incremental (signals de Notification e api.notifications), para o
+    badge não precisar de COUNT(*) na tabela de notificações.
+    """
+
+    class Meta:
+        db_table = "notification_counter"
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="notification_counter"
+    )
+    unread = models.IntegerField(default=0)
+
+
+class SupabaseSyncJob(models.Model):
+    """
+    Outbox da criação do usuário no Supabase Auth. O cadastro só enfileira;
+    o worker (manage.py process_supabase_outbox) faz as chamadas HTTP,
+    com novas tentativas e backoff, e preenche UserProfile.supabase_user_id.
+    """
+
+    class Meta:
+        db_table = "supabase_sync_job"
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status="pending"),
+                name="supabase_sync_job_due_idx",
+            ),
+        ]
+
+    STATUS_CHOICES = [
+        ("pending", "Pendente"),
+        ("done", "Concluído"),
+        ("failed", "Falhou"),
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="supabase_sync_jobs")
+    email = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter
+
+
+def apply_unread_delta(user_id, delta):
+    """
+    Soma `delta` ao contador de não lidas do usuário e devolve o novo
+    valor. Incrementos fazem upsert; decrementos só atualizam, para não
+    recriar o contador de um usuário que está sendo removido.
+    """
+    with connection.cursor() as cur:
+        if delta > 0:
+            cur.execute("""
+                insert into notification_counter (user_id, unread)
+                values (%s, %s)
+                on conflict (user_id)
+                do update set unread = notification_counter.unread + excluded.unread
+                returning unread
+            """, [user_id, delta])
+        else:
+            cur.execute("""
+                update notification_counter set unread = greatest(unread + %s, 0)
+                 where user_id = %s
+                returning unread
+            """, [delta, user_id])
+        row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def unread_count(user_id):
+    """Não lidas do usuário, lidas do contador (uma linha pela PK)."""
+    value = (
+        NotificationCounter.objects.filter(user_id=user_id)
+        .values_list("unread", flat=True)
+        .first()
+    )
+    return value or 0
+
+
+@transaction.atomic
+def mark_notifications_read(user_id, ids=None):
+    """
+    Marca como lidas as notificações `ids` do usuário (todas, se None) com
+    um único UPDATE e desconta do contador só as que estavam não lidas.
+    Devolve (marcadas, não lidas restantes).
+    """
+    queryset = Notification.objects.filter(user_id=user_id, is_read=False)
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    marked = queryset.update(is_read=True)
+    if not marked:
+        return 0, unread_count(user_id)
+    return marked, apply_unread_delta(user_id, -marked)
+
+
+# Chamadas concorrentes de notify com a mesma chave (usuário, tipo,
+# referência) fazem fila neste lock até o commit. Não dá para usar um índice
+# único: fora da janela a mesma chave ganha uma segunda linha não lida
+NOTIFY_LOCK_SQL = "select pg_advisory_xact_lock(hashtextextended(%s, 0))"
+
+# Atualiza a notificação não lida mais recente da mesma chave dentro da
+# janela ou, se não houver, insere uma nova. Roda depois do lock: no READ
+# COMMITTED o snapshot deste statement já vê a linha de quem liberou o lock
+NOTIFY_SQL = """
+    with merged as (
+        update notification set count = count + 1, message = %(message)s, updated_at = %(now)s
+         where id = (
+            select id from notification
+             where user_id = %(user)s
+               and notification_type = %(type)s
+               and reference_id is not distinct from %(ref)s
+               and is_read = false
+               and updated_at >= %(since)s
+             order by updated_at desc
+             limit 1
+             for update
+         )
+        returning id
+    ), inserted as (
+        insert into notification
+            (user_id, notification_type, reference_id, message, is_read, created_at, count, updated_at)
+        select %(user)s, %(type)s, %(ref)s, %(message)s, false, %(now)s, 1, %(now)s
+         where not exists (select 1 from merged)
+        returning id
+    )
+    select id, false from merged
+    union all
+    select id, true from inserted
+"""
+
+
+def notify(user_id, notification_type, message, reference_id=None):
+    """
+    Registra uma notificação juntando repetições: outra não lida do mesmo
+    tipo e referência atualizada há menos de NOTIFICATION_COALESCE_WINDOW
+    segundos é reaproveitada (count + 1, mensagem e updated_at novos).
+    Devolve (id, criada?).
+    """
+    now = timezone.now()
+    window = settings.NOTIFICATION_COALESCE_WINDOW
+    params = {
+        "user": user_id,
+        "type": notification_type,
+        "ref": str(reference_id) if reference_id else None,
+        "message": message,
+        "now": now,
+        # Janela <= 0 desliga a junção: nenhuma linha passa no filtro
+        "since": now - timedelta(seconds=window) if window > 0 else now + timedelta(days=1),
+    }
+    with transaction.atomic():
+        with connection.cursor() as cur:
+            cur.execute(NOTIFY_LOCK_SQL, [f"notification:{user_id}:{notification_type}:{params['ref']}"])
+            cur.execute(NOTIFY_SQL, params)
+            notification_id, created = cur.fetchone()
+        if created:
+            apply_unread_delta(user_id, 1)
+    return notification_id, created
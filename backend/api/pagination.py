@@ -0,0 +1,272 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .proximity import NearbyRow, nearby_items
+
+
+def encode_cursor(values, reverse=False):
+    """
+    Serializa a posição (valores das colunas de ordenação do último item)
+    num token opaco para a query string.
+    """
+    payload = {"v": [_to_json(v) for v in values]}
+    if reverse:
+        payload["r"] = 1
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token, size):
+    """
+    Faz o caminho inverso de encode_cursor.
+    Retorna (valores, reverse) ou levanta NotFound se o token for inválido.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = payload["v"]
+        reverse = bool(payload.get("r"))
+    except (TypeError, ValueError, KeyError, binascii.Error):
+        raise NotFound("Cursor inválido.")
+    if not isinstance(values, list) or len(values) != size:
+        raise NotFound("Cursor inválido.")
+    return values, reverse
+
+
+def _to_json(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    return value
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    Monta o filtro "depois de (v1, v2, ...)" para a ordenação informada,
+    expandindo a comparação de tuplas em
+    (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ...
+    respeitando a direção de cada campo.
+    """
+    condition = None
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        descending = field.startswith("-") != reverse
+        lookup = "lt" if descending else "gt"
+        step = equal & Q(**{f"{name}__{lookup}": value})
+        condition = step if condition is None else condition | step
+        equal &= Q(**{name: value})
+    return condition
+
+
+def apply_cursor(queryset, ordering, token, reverse=None):
+    """
+    Filtra `queryset` para as linhas depois da posição codificada em
+    `token`. Com reverse=None vale a direção gravada no próprio cursor.
+    Retorna (queryset, reverse); cursor inválido vira NotFound.
+    """
+    values, cursor_reverse = decode_cursor(token, len(ordering))
+    if reverse is None:
+        reverse = cursor_reverse
+    try:
+        return queryset.filter(keyset_filter(ordering, values, reverse)), reverse
+    except (ValidationError, TypeError, ValueError):
+        raise NotFound("Cursor inválido.")
+
+
+def reverse_ordering(ordering):
+    return tuple(f[1:] if f.startswith("-") else f"-{f}" for f in ordering)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) sobre uma ordenação total.
+
+    Cada página é buscada com um filtro sobre os valores do último item
+    da página anterior, então a página N custa o mesmo que a primeira e
+    nenhum COUNT(*) é executado. A ordenação deve terminar em um campo
+    único (normalmente o id) para ser determinística.
+    """
+
+    ordering = ("-created_at", "-id")
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    page_size_setting = "ITEM_FEED_PAGE_SIZE"
+    max_page_size_setting = "ITEM_FEED_MAX_PAGE_SIZE"
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def get_page_size(self, request):
+        default = getattr(settings, self.page_size_setting, 20)
+        maximum = getattr(settings, self.max_page_size_setting, 100)
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return min(default, maximum)
+        if size <= 0:
+            return min(default, maximum)
+        return min(size, maximum)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        return self._set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Versão para views async: a página é lida pelo ORM assíncrono."""
+        queryset = self._page_queryset(queryset, request, view)
+        return self._set_page([row async for row in queryset])
+
+    def _page_queryset(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = tuple(self.get_ordering(request, queryset, view))
+        self.ordering_fields = ordering
+
+        token = request.query_params.get(self.cursor_query_param)
+        self.has_cursor = bool(token)
+        self.reverse = False
+        if token:
+            queryset, self.reverse = apply_cursor(queryset, ordering, token)
+
+        if self.reverse:
+            queryset = queryset.order_by(*reverse_ordering(ordering))
+        else:
+            queryset = queryset.order_by(*ordering)
+        return queryset[: self.page_size + 1]
+
+    def _set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+
+        if self.reverse:
+            rows.reverse()
+            # Voltando: sempre há página seguinte (de onde viemos)
+            self.has_next = bool(rows)
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            # Avançando com cursor: assume que há página anterior
+            self.has_previous = self.has_cursor and bool(rows)
+
+        self.page = rows
+        return rows
+
+    def _position(self, obj):
+        return [getattr(obj, f.lstrip("-")) for f in self.ordering_fields]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        token = encode_cursor(self._position(self.page[-1]))
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        token = encode_cursor(self._position(self.page[0]), reverse=True)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class ItemCursorPagination(KeysetPagination):
+    """Feed público de itens, do mais recente para o mais antigo."""
+
+    ordering = ("-created_at", "-id")
+
+
+class ItemSearchPagination(KeysetPagination):
+    """Resultados da busca textual, do mais relevante para o menos."""
+
+    ordering = ("-rank", "-created_at", "-id")
+
+
+class NotificationCursorPagination(KeysetPagination):
+    """Caixa de notificações do usuário, da última atividade para a mais antiga."""
+
+    ordering = ("-updated_at", "-id")
+    page_size_setting = "NOTIFICATION_PAGE_SIZE"
+    max_page_size_setting = "NOTIFICATION_MAX_PAGE_SIZE"
+
+
+class NearbyItemsPagination(KeysetPagination):
+    """
+    Itens próximos, do mais perto para o mais longe. A página vem de
+    nearby_items (SQL com LATERAL por cidade) e não de um ORDER BY sobre
+    o queryset, que só é usado para carregar os itens da página. Só
+    avança: não há link para a página anterior.
+    """
+
+    ordering = ("distance", "city_id", "-created_at", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering_fields = self.ordering
+        self.has_previous = False
+
+        after = None
+        token = request.query_params.get(self.cursor_query_param)
+        if token:
+            values, reverse = decode_cursor(token, len(self.ordering))
+            try:
+                after = NearbyRow(
+                    float(values[0]), UUID(values[1]), parse_datetime(values[2]), UUID(values[3])
+                )
+            except (TypeError, ValueError):
+                raise NotFound("Cursor inválido.")
+            if reverse or after.created_at is None:
+                raise NotFound("Cursor inválido.")
+
+        lat, lng, radius_km = view.get_origin()
+        rows = nearby_items(lat, lng, radius_km, self.page_size + 1, after)
+        self.has_next = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+
+        by_id = {item.id: item for item in queryset.filter(id__in=[row.item_id for row in rows])}
+        self.page = []
+        for row in rows:
+            item = by_id.get(row.item_id)
+            if item is not None:
+                # Mesmo valor calculado no SQL: o cursor compara exatamente
+                item.distance = row.distance
+                self.page.append(item)
+        return self.page
+
+    def get_paginated_response(self, data):
+        for entry, item in zip(data, self.page):
+            entry["distance_km"] = round(item.distance, 2)
+        return super().get_paginated_response(data)
@@ -0,0 +1,99 @@
+import math
+from collections import namedtuple
+
+from django.db import connection
+
+EARTH_RADIUS_KM = 6371.0088
+
+NearbyRow = namedtuple("NearbyRow", ["distance", "city_id", "created_at", "item_id"])
+
+# Distância do item = distância até o centro da cidade dele. Só as cidades
+# dentro da caixa delimitadora (índice city_lat_lng_idx) entram na conta, e
+# cada uma contribui no máximo `limit` itens pelo índice parcial
+# item_active_city_idx (city, -created_at, -id): o custo depende do número
+# de cidades no raio, não do número de itens delas
+NEARBY_SQL = """
+    with near as (
+        select c.id,
+               2 * %(earth_radius)s * asin(least(1, sqrt(
+                   power(sin(radians(c.latitude - %(lat)s) / 2), 2)
+                   + cos(radians(%(lat)s)) * cos(radians(c.latitude))
+                     * power(sin(radians(c.longitude - %(lng)s) / 2), 2)
+               ))) as distance
+          from city c
+         where c.latitude between %(lat_min)s and %(lat_max)s
+           and c.longitude between %(lng_min)s and %(lng_max)s
+    )
+    select n.distance, n.id, i.created_at, i.id
+      from near n
+     cross join lateral (
+        select it.id, it.created_at
+          from item it
+         where it.city_id = n.id
+           and it.listing_state = 'active'
+           and (%(after_city)s::uuid is null or n.id <> %(after_city)s::uuid
+                or (it.created_at, it.id) < (%(after_created)s, %(after_id)s::uuid))
+         order by it.created_at desc, it.id desc
+         limit %(limit)s
+     ) i
+     where n.distance <= %(radius)s
+       and (%(after_city)s::uuid is null or n.id = %(after_city)s::uuid
+            or (n.distance, n.id) > (%(after_distance)s, %(after_city)s::uuid))
+     order by n.distance, n.id, i.created_at desc, i.id desc
+     limit %(limit)s
+"""
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distância em km pela fórmula de haversine (mesma conta do SQL)."""
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    a = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    Menor caixa (lat_min, lat_max, lng_min, lng_max) que contém o círculo.
+    Perto dos polos ou cruzando o antimeridiano a longitude fica livre.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    lat_min = lat - math.degrees(angle)
+    lat_max = lat + math.degrees(angle)
+    if lat_min <= -90 or lat_max >= 90:
+        return max(lat_min, -90.0), min(lat_max, 90.0), -180.0, 180.0
+    delta = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(lat)))))
+    lng_min, lng_max = lng - delta, lng + delta
+    if lng_min < -180 or lng_max > 180:
+        lng_min, lng_max = -180.0, 180.0
+    return lat_min, lat_max, lng_min, lng_max
+
+
+def nearby_items(lat, lng, radius_km, limit, after=None):
+    """
+    Itens ativos a até `radius_km` de (lat, lng), do mais perto para o mais
+    longe; na mesma cidade, do mais recente para o mais antigo. `after` é
+    o NearbyRow do último item da página anterior.
+    """
+    lat_min, lat_max, lng_min, lng_max = bounding_box(lat, lng, radius_km)
+    params = {
+        "earth_radius": EARTH_RADIUS_KM,
+        "lat": lat,
+        "lng": lng,
+        "radius": radius_km,
+        "lat_min": lat_min,
+        "lat_max": lat_max,
+        "lng_min": lng_min,
+        "lng_max": lng_max,
+        "limit": limit,
+        "after_distance": after.distance if after else None,
+        "after_city": str(after.city_id) if after else None,
+        "after_created": after.created_at if after else None,
+        "after_id": str(after.item_id) if after else None,
+    }
+    with connection.cursor() as cur:
+        cur.execute(NEARBY_SQL, params)
+        return [NearbyRow(*row) for row in cur.fetchall()]
@@ -1,14 +1,14 @@
 from django.contrib.auth.models import User
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
 from .models import Category, City, Item, ItemPhoto, Notification, UserProfile
 
 import logging
-from .supabase_admin import (
-    get_or_create_supabase_user,
-    SupabaseAdminError,
-)
+from .authentication import invalidate_cached_user
+from .notifications import notify
+from .supabase_outbox import enqueue_supabase_sync
 
 
 logger = logging.getLogger(__name__)
@@ -24,25 +24,29 @@ class CategorySerializer(serializers.ModelSerializer):
 class CitySerializer(serializers.ModelSerializer):
     class Meta:
         model = City
-        fields = ['id', 'name', 'state']
+        fields = ['id', 'name', 'state', 'latitude', 'longitude']
 
 
 class ItemPhotoSerializer(serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
+    variants = serializers.SerializerMethodField()
     
     class Meta:
         model = ItemPhoto
-        fields = ['id', 'image', 'url', 'position', 'created_at']
-        read_only_fields = ['id', 'url', 'created_at']
+        fields = ['id', 'image', 'url', 'variants', 'position', 'created_at']
+        read_only_fields = ['id', 'url', 'variants', 'created_at']
     
     def get_url(self, obj):
         return obj.get_url()
 
+    def get_variants(self, obj):
+        return obj.get_variant_urls()
+
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'notification_type', 'reference_id', 'message', 'is_read', 'created_at']
+        fields = ['id', 'notification_type', 'reference_id', 'message', 'is_read', 'count', 'created_at', 'updated_at']
 
 class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -61,35 +65,14 @@ class UserCreateSerializer(serializers.ModelSerializer):
             "email": {"required": True},
         }
     def create(self, validated_data):
-        email = validated_data.get("email")
-        password = validated_data.get("password")
-
-
-        validated_data["username"] = email
-
-        supabase_user_id = None
-
-        # Tenta criar / reaproveitar o usuário no Supabase Auth
-        if email and password:
-            try:
-                supabase_user_id = get_or_create_supabase_user(email, password)
-            except SupabaseAdminError as e:
-                # Se der problema no Supabase, loga e segue sem vincular
-                logger.warning(
-                    "Falha ao sincronizar usuário '%s' com Supabase Auth: %s",
-                    email,
-                    e,
-                )
-
-        # Cria o usuário no Django 
-        user = User.objects.create_user(**validated_data)
-
-        # Cria o profile já com o supabase_user_id 
-        profile_kwargs = {}
-        if supabase_user_id:
-            profile_kwargs["supabase_user_id"] = supabase_user_id
-
-        UserProfile.objects.create(user=user, **profile_kwargs)
+        validated_data["username"] = validated_data.get("email")
+
+        # O vínculo com o Supabase Auth é criado depois, pelo worker do
+        # outbox; o cadastro não espera nenhuma chamada HTTP
+        with transaction.atomic():
+            user = User.objects.create_user(**validated_data)
+            UserProfile.objects.create(user=user)
+            enqueue_supabase_sync(user)
         return user
 
 
@@ -112,21 +95,26 @@ class UserSerializer(serializers.ModelSerializer):
         if password:
             instance.set_password(password)
 
-        user = super().update(instance, validated_data) 
-        if profile_data:
-            profile_instance = user.userprofile 
-            
-            for attr, value in profile_data.items():
-                setattr(profile_instance, attr, value)
-            
-            profile_instance.save()
-        
-            if profile_instance.notifications_enabled:
-                Notification.objects.create(
-                    user=user,
-                    notification_type='profile',
-                    message='Seu perfil e dados básicos foram atualizados!'
-                )
+        with transaction.atomic():
+            user = super().update(instance, validated_data)
+            if profile_data:
+                profile_instance = user.userprofile
+
+                for attr, value in profile_data.items():
+                    setattr(profile_instance, attr, value)
+
+                profile_instance.save()
+
+                if profile_instance.notifications_enabled:
+                    # Gravada depois do commit, fora da transação do perfil;
+                    # edições seguidas viram uma notificação só (count). O
+                    # perfil já foi salvo: uma falha aqui só é registrada no log
+                    transaction.on_commit(lambda: notify(
+                        user.pk, 'profile', 'Seu perfil e dados básicos foram atualizados!'
+                    ), robust=True)
+        # Senha, e-mail ou status mudaram: o usuário em cache do
+        # CachedJWTAuthentication não pode mais ser usado
+        invalidate_cached_user(user.pk)
         return user
     
 class ItemSerializer(serializers.ModelSerializer):
@@ -135,6 +123,7 @@ class ItemSerializer(serializers.ModelSerializer):
     city_id = serializers.UUIDField(write_only=True, required=False, allow_null=True)
     photos = serializers.SerializerMethodField()
     images = serializers.SerializerMethodField()  # Para compatibilidade com o frontend
+    thumbnails = serializers.SerializerMethodField()  # Miniaturas para os cards do feed
     type = serializers.CharField(write_only=True, required=False, default='Trade')  # Sell, Trade, ou Donation
     uploaded_photos = serializers.ListField(
         child=serializers.ImageField(),
@@ -146,15 +135,37 @@ class ItemSerializer(serializers.ModelSerializer):
         model = Item
         fields = ['id', 'title', 'description', 'category', 'category_name', 
                  'city', 'city_id', 'status', 'listing_state', 'created_at', 
-                 'updated_at', 'photos', 'images', 'type', 'uploaded_photos']
+                 'updated_at', 'photos', 'images', 'thumbnails', 'type', 'uploaded_photos']
         read_only_fields = ['user', 'id', 'created_at', 'updated_at', 'city']
 
+    def _ordered_photos(self, obj):
+        # Calculado uma vez por item e reaproveitado nos campos de foto
+        photos = getattr(obj, '_ordered_photo_list', None)
+        if photos is None:
+            # 'ordered_photos' vem do Prefetch feito nas views de item
+            photos = getattr(obj, 'ordered_photos', None)
+            if photos is None:
+                photos = obj.photos.all().order_by('position')
+            photos = list(photos)
+            obj._ordered_photo_list = photos
+        return photos
+
+    def _photo_urls(self, obj):
+        urls = getattr(obj, '_photo_urls', None)
+        if urls is None:
+            urls = [photo.get_url() for photo in self._ordered_photos(obj)]
+            obj._photo_urls = urls
+        return urls
+
     def get_photos(self, obj):
-        return [photo.get_url() for photo in obj.photos.all().order_by('position')]
+        return self._photo_urls(obj)
         
     def get_images(self, obj):
         # Para manter compatibilidade com o frontend que espera 'images'
-        return self.get_photos(obj)
+        return self._photo_urls(obj)
+
+    def get_thumbnails(self, obj):
+        return [photo.get_thumbnail_url() for photo in self._ordered_photos(obj)]
 
     def create(self, validated_data):
         # Remover campos que não pertencem ao modelo Item
@@ -187,3 +198,30 @@ class ItemSerializer(serializers.ModelSerializer):
 
 
 
+
+
+class ItemBatchEntrySerializer(serializers.Serializer):
+    """
+    Um item do lote (ItemBatchView): sem `id` cria, com `id` atualiza só os
+    campos enviados. Fotos entram por `upload_ids` (uploads avulsos concluídos).
+    Categoria, cidade e uploads são conferidos em lote em api.item_batch.
+    """
+    id = serializers.UUIDField(required=False)
+    title = serializers.CharField(required=False)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    category = serializers.UUIDField(required=False)
+    city_id = serializers.UUIDField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Item.STATUS_CHOICES, required=False)
+    listing_state = serializers.ChoiceField(choices=Item.LISTING_STATE_CHOICES, required=False)
+    upload_ids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, max_length=Item.MAX_PHOTOS
+    )
+
+    def validate(self, attrs):
+        if "id" not in attrs:
+            missing = [f for f in ("title", "category", "status") if f not in attrs]
+            if missing:
+                raise serializers.ValidationError(
+                    {f: "Campo obrigatório para criar um item." for f in missing}
+                )
+        return attrs
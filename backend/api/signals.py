@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .blob_storage import acquire_blob, release_blob
+from .catalog_cache import invalidate_snapshot
+from .city_search import invalidate_city_autocomplete
+from .facets import apply_facet_delta, rebuild_item_facets
+from .image_variants import delete_variants, schedule_variants
+from .models import Category, City, Item, ItemPhoto, Notification
+from .notifications import apply_unread_delta
+
+
+@receiver(post_save, sender=Item)
+def update_facets_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_key = instance.facet_key
+    if created:
+        apply_facet_delta(new_key, 1)
+    else:
+        old_key = getattr(instance, "_loaded_facet_key", None)
+        if old_key is not None and old_key != new_key:
+            apply_facet_delta(old_key, -1)
+            apply_facet_delta(new_key, 1)
+    instance._loaded_facet_key = new_key
+
+
+@receiver(post_delete, sender=Item)
+def update_facets_on_delete(sender, instance, **kwargs):
+    key = getattr(instance, "_loaded_facet_key", None) or instance.facet_key
+    apply_facet_delta(key, -1)
+
+
+@receiver(post_delete, sender=City)
+def rebuild_facets_on_city_delete(sender, instance, **kwargs):
+    # Os itens da cidade passam a city=NULL via UPDATE em massa (SET_NULL),
+    # que não dispara signals; cidades raramente são removidas
+    rebuild_item_facets()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories(sender, **kwargs):
+    # Depois do commit: antes dele, um GET concorrente remontaria o cache
+    # com os dados antigos, que ficariam lá até o timeout
+    transaction.on_commit(lambda: invalidate_snapshot("categories"))
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def invalidate_cities(sender, **kwargs):
+    transaction.on_commit(lambda: invalidate_snapshot("cities"))
+    transaction.on_commit(invalidate_city_autocomplete)
+
+
+@receiver(post_save, sender=ItemPhoto)
+def generate_photo_variants(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.image:
+        schedule_variants(instance.pk)
+
+
+@receiver(pre_save, sender=ItemPhoto)
+def store_photo_by_content(sender, instance, raw=False, **kwargs):
+    image = instance.image
+    if raw or not image or image._committed or instance.blob_id:
+        return
+    # Troca o caminho por items/blobs/<hash>; o FileField não grava de novo
+    blob = acquire_blob(image.file, image.name, image.storage)
+    image.name = blob.name
+    image._committed = True
+    instance.blob = blob
+
+
+@receiver(post_delete, sender=ItemPhoto)
+def release_photo_files(sender, instance, **kwargs):
+    if instance.blob_id:
+        release_blob(
+            instance.blob_id,
+            instance.image.storage,
+            extra_files=(instance.variants or {}).values(),
+        )
+    else:
+        # Como no blob: nada sai do disco antes do commit
+        transaction.on_commit(lambda: delete_variants(instance))
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        if not instance.is_read:
+            apply_unread_delta(instance.user_id, 1)
+    else:
+        was_read = getattr(instance, "_loaded_is_read", None)
+        if was_read is not None and was_read != instance.is_read:
+            apply_unread_delta(instance.user_id, -1 if instance.is_read else 1)
+    instance._loaded_is_read = instance.is_read
+
+
+@receiver(post_delete, sender=Notification)
+def update_unread_on_delete(sender, instance, **kwargs):
+    if not getattr(instance, "_loaded_is_read", instance.is_read):
+        apply_unread_delta(instance.user_id, -1)
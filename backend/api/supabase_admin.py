@@ -1,20 +1,248 @@
 import json
 import logging
 import os
+import threading
+import time
 from typing import Optional
 
 import requests
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
+# (conexão, leitura) em segundos
+SUPABASE_TIMEOUT = (
+    float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "3")),
+    float(os.getenv("SUPABASE_READ_TIMEOUT", "10")),
+)
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+# Cache e-mail -> id de usuário (só resultados positivos)
+SUPABASE_LOOKUP_CACHE_TTL = float(os.getenv("SUPABASE_LOOKUP_CACHE_TTL", "300"))
+SUPABASE_LOOKUP_CACHE_SIZE = int(os.getenv("SUPABASE_LOOKUP_CACHE_SIZE", "10000"))
+# Circuit breaker: abre depois de N falhas seguidas e fica aberto por X segundos
+SUPABASE_BREAKER_THRESHOLD = int(os.getenv("SUPABASE_BREAKER_THRESHOLD", "5"))
+SUPABASE_BREAKER_RESET = float(os.getenv("SUPABASE_BREAKER_RESET", "30"))
+
 
 class SupabaseAdminError(Exception):
     pass
 
 
+class SupabaseUnavailable(SupabaseAdminError):
+    """Circuito aberto: a Admin API falhou demais e a chamada nem foi feita."""
+
+
+class CircuitBreaker:
+    """
+    Fechado: chamadas passam. Depois de `threshold` falhas seguidas abre e
+    recusa tudo na hora por `reset_timeout` segundos; então deixa passar
+    uma chamada de teste (meio aberto), que fecha ou reabre o circuito.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self._state()
+            if state == "open" or (state == "half_open" and self._trial_running):
+                raise SupabaseUnavailable(
+                    "Admin API do Supabase indisponível (circuito aberto)."
+                )
+            if state == "half_open":
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            trial_failed = self._trial_running
+            self._trial_running = False
+            if trial_failed or (self.opened_at is None and self.failures >= self.threshold):
+                if self.opened_at is None:
+                    logger.error("Circuito da Admin API do Supabase aberto após %s falhas", self.failures)
+                self.opened_at = time.monotonic()
+                self.times_opened += 1
+
+
+class LookupCache:
+    """Cache TTL em memória, e-mail -> id do usuário no Supabase Auth."""
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, email):
+        key = email.lower()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._data[key]
+                return None
+            return entry[0]
+
+    def set(self, email, user_id):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if len(self._data) >= self.max_size:
+                # Descarta a entrada mais antiga (dict mantém a ordem de inserção)
+                self._data.pop(next(iter(self._data)))
+            self._data[email.lower()] = (user_id, time.monotonic() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class Metrics:
+    """Contadores de chamadas à Admin API: quantidade, erros e latência."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.calls = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rejected = 0
+
+    def observe(self, operation, elapsed, ok):
+        with self._lock:
+            entry = self.calls.setdefault(
+                operation, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+            )
+            elapsed_ms = elapsed * 1000
+            entry["count"] += 1
+            entry["errors"] += 0 if ok else 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+
+    def incr(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            calls = {
+                op: {**entry, "avg_ms": entry["total_ms"] / entry["count"]}
+                for op, entry in self.calls.items()
+            }
+            return {
+                "calls": calls,
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "rejected_by_breaker": self.rejected,
+            }
+
+
+breaker = CircuitBreaker(SUPABASE_BREAKER_THRESHOLD, SUPABASE_BREAKER_RESET)
+lookup_cache = LookupCache(SUPABASE_LOOKUP_CACHE_TTL, SUPABASE_LOOKUP_CACHE_SIZE)
+metrics = Metrics()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Sessão HTTP compartilhada (keep-alive) com pool de conexões limitado."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=SUPABASE_POOL_SIZE, pool_block=True
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def reset_state():
+    """Zera sessão, cache, circuito e métricas (usado nos testes)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+    lookup_cache.clear()
+    metrics.reset()
+    breaker.record_success()
+    breaker.times_opened = 0
+
+
+def admin_api_status():
+    """Métricas das chamadas e estado atual do circuit breaker."""
+    return {
+        **metrics.snapshot(),
+        "breaker": {
+            "state": breaker.state,
+            "consecutive_failures": breaker.failures,
+            "times_opened": breaker.times_opened,
+        },
+    }
+
+
+def _request(operation, method, url, **kwargs):
+    """
+    Faz a chamada pela sessão compartilhada passando pelo circuit breaker.
+    Erros de rede e respostas 5xx contam como falha; 4xx não.
+    """
+    try:
+        breaker.before_call()
+    except SupabaseUnavailable:
+        metrics.incr("rejected")
+        raise
+
+    started = time.perf_counter()
+    try:
+        resp = get_session().request(method, url, timeout=SUPABASE_TIMEOUT, **kwargs)
+    except requests.RequestException as e:
+        metrics.observe(operation, time.perf_counter() - started, ok=False)
+        breaker.record_failure()
+        raise SupabaseAdminError(f"Falha de conexão com a Admin API do Supabase: {e}") from e
+
+    ok = resp.status_code < 500
+    metrics.observe(operation, time.perf_counter() - started, ok=ok)
+    if ok:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+    return resp
+
+
 def _get_headers():
     if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
         raise SupabaseAdminError(
@@ -44,13 +272,19 @@ def get_supabase_user_by_email(email: str) -> Optional[str]:
     Tenta achar um usuário existente no Supabase Auth pelo e-mail.
     Retorna o id (UUID) ou None.
     """
+    cached = lookup_cache.get(email)
+    if cached:
+        metrics.incr("cache_hits")
+        return cached
+    metrics.incr("cache_misses")
+
     headers = _get_headers()
     url = f"{SUPABASE_URL}/auth/v1/admin/users"
 
     # A sintaxe ?email=eq.algo@algo.com é a que o Supabase usa na Admin API
     params = {"email": f"eq.{email}"}
 
-    resp = requests.get(url, headers=headers, params=params, timeout=10)
+    resp = _request("get_user_by_email", "GET", url, headers=headers, params=params)
     if resp.status_code != 200:
         logger.warning(
             "Falha ao buscar usuário Supabase por email (%s): %s %s",
@@ -69,13 +303,15 @@ def get_supabase_user_by_email(email: str) -> Optional[str]:
     # Alguns formatos possíveis:
     # 1) Lista de usuários: [ {...}, {...} ]
     # 2) Objeto: {"users": [ {...}, ... ]}
+    uid = None
     if isinstance(data, list) and data:
-        return _extract_user_id_from_response(data[0])
+        uid = _extract_user_id_from_response(data[0])
+    elif isinstance(data, dict) and "users" in data and data["users"]:
+        uid = _extract_user_id_from_response(data["users"][0])
 
-    if isinstance(data, dict) and "users" in data and data["users"]:
-        return _extract_user_id_from_response(data["users"][0])
-
-    return None
+    if uid:
+        lookup_cache.set(email, uid)
+    return uid
 
 
 def create_supabase_user(email: str, password: str) -> str:
@@ -93,7 +329,7 @@ def create_supabase_user(email: str, password: str) -> str:
         "email_confirm": True,
     }
 
-    resp = requests.post(url, headers=headers, json=payload, timeout=10)
+    resp = _request("create_user", "POST", url, headers=headers, json=payload)
 
     if resp.status_code not in (200, 201):
         raise SupabaseAdminError(
@@ -113,6 +349,7 @@ def create_supabase_user(email: str, password: str) -> str:
             f"Não foi possível extrair o ID de usuário Supabase da resposta: {data}"
         )
 
+    lookup_cache.set(email, uid)
     return uid
 
 
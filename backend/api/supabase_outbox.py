@@ -0,0 +1,99 @@
+import logging
+import random
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import SupabaseSyncJob, UserProfile
+from .supabase_admin import SupabaseAdminError, breaker, get_or_create_supabase_user
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_supabase_sync(user):
+    """
+    Enfileira a criação do usuário no Supabase Auth. Deve ser chamada na
+    mesma transação que cria o usuário: se o cadastro falhar, o job some junto.
+    """
+    return SupabaseSyncJob.objects.create(user=user, email=user.email)
+
+
+def backoff_delay(attempts):
+    """Espera exponencial (base * 2^(n-1)), limitada ao teto e com jitter."""
+    base = settings.SUPABASE_SYNC_BACKOFF_BASE
+    delay = min(base * (2 ** max(attempts - 1, 0)), settings.SUPABASE_SYNC_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_jobs(limit, now=None):
+    """
+    Reserva até `limit` jobs vencidos. A reserva empurra next_attempt_at
+    para frente (lease): se o worker morrer no meio, o job volta sozinho
+    para a fila. skip_locked deixa vários workers rodarem em paralelo.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            SupabaseSyncJob.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:limit]
+        )
+        if jobs:
+            lease_until = now + timedelta(seconds=settings.SUPABASE_SYNC_LEASE)
+            SupabaseSyncJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                next_attempt_at=lease_until, updated_at=now
+            )
+    return jobs
+
+
+def run_job(job):
+    """
+    Executa um job reservado. A senha do cadastro não é guardada no outbox;
+    o usuário do Supabase é criado com uma senha aleatória (o login continua
+    sendo feito pelo Django) ou reaproveitado se o e-mail já existir.
+    """
+    job.attempts += 1
+    try:
+        supabase_user_id = get_or_create_supabase_user(job.email, secrets.token_urlsafe(32))
+        with transaction.atomic():
+            UserProfile.objects.update_or_create(
+                user_id=job.user_id, defaults={"supabase_user_id": supabase_user_id}
+            )
+    except (SupabaseAdminError, IntegrityError, OSError) as e:
+        # requests.RequestException herda de OSError (timeout, conexão recusada)
+        job.last_error = str(e)[:2000]
+        if job.attempts >= settings.SUPABASE_SYNC_MAX_ATTEMPTS:
+            job.status = "failed"
+            logger.error(
+                "Desistindo de sincronizar '%s' com o Supabase após %s tentativas: %s",
+                job.email, job.attempts, e,
+            )
+        else:
+            job.next_attempt_at = timezone.now() + backoff_delay(job.attempts)
+            logger.warning(
+                "Falha ao sincronizar '%s' com o Supabase (tentativa %s): %s",
+                job.email, job.attempts, e,
+            )
+    else:
+        job.status = "done"
+        job.last_error = ""
+    job.save(update_fields=["status", "attempts", "next_attempt_at", "last_error", "updated_at"])
+    return job.status == "done"
+
+
+def process_due_jobs(limit=20):
+    """Processa um lote de jobs vencidos; devolve (concluídos, falhas)."""
+    done = failed = 0
+    # Com o circuito aberto as chamadas falhariam na hora e gastariam
+    # tentativas dos jobs; espera o circuito liberar
+    if breaker.state == "open":
+        return done, failed
+    for job in claim_jobs(limit):
+        if run_job(job):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
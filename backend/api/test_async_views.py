@@ -0,0 +1,112 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import async_views
+from api.authentication import clear_user_cache
+from api.models import Category, City, Item, ItemPhoto
+
+
+class AsyncReadViewTests(TestCase):
+    """As views async respondem o mesmo JSON das views do DRF"""
+
+    def setUp(self):
+        cache.clear()
+        clear_user_cache()
+        self.user = User.objects.create_user(username="async@example.com", password="testpass123")
+        self.other = User.objects.create_user(username="outro@example.com", password="testpass123")
+        self.category = Category.objects.create(name="Jardim", slug="jardim")
+        self.city = City.objects.create(name="Olinda", state="PE", latitude=-8.01, longitude=-34.85)
+        for i in range(5):
+            item = Item.objects.create(
+                user=self.user, title=f"Vaso {i}", category=self.category,
+                city=self.city, status="used",
+            )
+            ItemPhoto.objects.create(item=item, url=f"https://cdn.example.com/{i}.jpg", position=1)
+        self.item = item
+        self.foreign = Item.objects.create(user=self.other, title="Alheio", category=self.category, status="new")
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.factory = AsyncRequestFactory()
+        self.sync_client = APIClient()
+
+    def call(self, view, path, data=None, view_kwargs=None, headers=None):
+        # Roda a view no event loop; as queries voltam para esta thread
+        request = self.factory.get(path, data, headers=headers)
+        return async_to_sync(view.as_view())(request, **(view_kwargs or {}))
+
+    def sync_json(self, path, data=None, **extra):
+        response = self.sync_client.get(path, data, **extra)
+        return response.status_code, json.loads(response.content)
+
+    def test_items_page_and_cursor(self):
+        url = reverse("get-items")
+        with self.assertNumQueries(2):
+            response = self.call(async_views.ReadItemsView, url, {"page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.content)
+        self.assertEqual(
+            (200, body), self.sync_json(url, {"page_size": 2})
+        )
+        self.assertEqual([item["title"] for item in body["results"]], ["Alheio", "Vaso 4"])
+        self.assertEqual(body["results"][1]["photos"], ["https://cdn.example.com/4.jpg"])
+
+        cursor = body["next"].split("cursor=")[1].split("&")[0]
+        response = self.call(async_views.ReadItemsView, url, {"page_size": 2, "cursor": cursor})
+        self.assertEqual(
+            [item["title"] for item in json.loads(response.content)["results"]], ["Vaso 3", "Vaso 2"]
+        )
+
+    def test_items_errors_match_drf(self):
+        url = reverse("get-items")
+        for params in ({"city": "nao-e-uuid"}, {"cursor": "lixo"}):
+            response = self.call(async_views.ReadItemsView, url, params)
+            expected = self.sync_json(url, params)
+            self.assertEqual((response.status_code, json.loads(response.content)), expected)
+
+    def test_item_detail(self):
+        auth = {"Authorization": f"Bearer {self.token}"}
+        url = reverse("item-detail", args=[self.item.id])
+        response = self.call(
+            async_views.ReadItemView, url, view_kwargs={"pk": self.item.id}, headers=auth
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (200, json.loads(response.content)), self.sync_json(url, HTTP_AUTHORIZATION=auth["Authorization"])
+        )
+
+        # Item de outro usuário, sem token e com token inválido
+        response = self.call(
+            async_views.ReadItemView, url, view_kwargs={"pk": self.foreign.id}, headers=auth
+        )
+        self.assertEqual(response.status_code, 404)
+        response = self.call(async_views.ReadItemView, url, view_kwargs={"pk": self.item.id})
+        self.assertEqual(
+            (response.status_code, json.loads(response.content)), self.sync_json(url)
+        )
+        response = self.call(
+            async_views.ReadItemView, url, view_kwargs={"pk": self.item.id},
+            headers={"Authorization": "Bearer invalido"},
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response.headers)
+
+    def test_catalog_snapshot_and_conditional_get(self):
+        for view, name in (
+            (async_views.ListCategoriesView, "list-categories"),
+            (async_views.ListCitiesView, "list-cities"),
+        ):
+            url = reverse(name)
+            response = self.call(view, url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                (200, json.loads(response.content)), self.sync_json(url)
+            )
+            with self.assertNumQueries(0):
+                response = self.call(view, url, headers={"If-None-Match": response.headers["ETag"]})
+            self.assertEqual(response.status_code, 304)
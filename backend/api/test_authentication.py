@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import authentication
+from api.authentication import clear_user_cache, invalidate_cached_user
+from api.models import UserProfile
+
+
+@override_settings(AUTH_USER_CACHE_TTL=60)
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        clear_user_cache()
+        self.addCleanup(clear_user_cache)
+        self.user = User.objects.create_user(
+            username="auth@example.com", email="auth@example.com", password="testpass123"
+        )
+        UserProfile.objects.create(user=self.user)
+        self.token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.url = reverse("user-profile")
+
+    def test_second_request_skips_user_lookup(self):
+        """Só a primeira requisição busca o User no banco"""
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        # Apenas a consulta do perfil feita pela view
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_expired_entry_is_reloaded(self):
+        self.client.get(self.url)
+        with mock.patch("api.authentication.time.monotonic", return_value=10**9):
+            with self.assertNumQueries(2):
+                self.client.get(self.url)
+
+    @override_settings(AUTH_USER_CACHE_TTL=0)
+    def test_cache_can_be_disabled(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_deactivated_user_is_rejected_after_invalidation(self):
+        self.client.get(self.url)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        invalidate_cached_user(self.user.pk)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates(self):
+        """UserSerializer.update descarta o usuário em cache"""
+        self.client.get(self.url)
+        response = self.client.patch(reverse("user-update"), {"password": "nova-senha-456"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(authentication._users, {})
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+    def test_write_does_not_save_stale_cached_user(self):
+        """Escritas buscam o User no banco: a senha trocada fora deste processo não volta"""
+        self.client.get(self.url)
+        # Outro worker (ou o admin) troca a senha; o cache deste processo não sabe
+        changed = User.objects.get(pk=self.user.pk)
+        changed.set_password("trocada-fora-789")
+        changed.save()
+
+        response = self.client.patch(reverse("user-update"), {"profile": {"Bio": "Nova bio"}}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("trocada-fora-789"))
+        self.assertFalse(self.user.check_password("testpass123"))
+
+    def test_request_user_is_a_copy(self):
+        """Alterações em request.user não vazam para outras requisições"""
+        auth = authentication.CachedJWTAuthentication()
+        first = auth.get_user(self.token)
+        first.first_name = "Alterado"
+        self.assertNotEqual(auth.get_user(self.token).first_name, "Alterado")
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.blob_storage import storage_report
+from api.tests_support import image_upload
+from api.models import Category, ImageBlob, Item, ItemPhoto
+
+
+def upload(color=(0, 128, 0)):
+    return image_upload("foto.png", color=color, size=(40, 30), format="PNG")
+
+
+class BlobStorageTests(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_VARIANTS_ASYNC=False)
+        self.override.enable()
+        self.user = User.objects.create_user(username="blobs@example.com", password="testpass123")
+        category = Category.objects.create(name="Plantas", slug="plantas")
+        self.item = Item.objects.create(user=self.user, title="Samambaia", category=category, status="used")
+        self.relisted = Item.objects.create(user=self.user, title="Samambaia (de novo)", category=category, status="used")
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def blob_files(self):
+        found = []
+        for root, _dirs, files in os.walk(os.path.join(self.media_root, "items", "blobs")):
+            found += [f for f in files if "variants" not in root]
+        return found
+
+    def test_duplicate_upload_reuses_blob(self):
+        """O mesmo conteúdo é gravado uma vez e referenciado duas"""
+        first = ItemPhoto.objects.create(item=self.item, image=upload(), position=1)
+        second = ItemPhoto.objects.create(item=self.relisted, image=upload(), position=1)
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(ImageBlob.objects.get().ref_count, 2)
+        self.assertEqual(len(self.blob_files()), 1)
+
+        report = storage_report()
+        self.assertEqual(report["saved_bytes"], report["stored_bytes"])
+
+    def test_blob_removed_with_last_reference(self):
+        """delete_item_photo só apaga o arquivo quando sai a última referência"""
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        first = ItemPhoto.objects.create(item=self.item, image=upload(), position=1)
+        second = ItemPhoto.objects.create(item=self.relisted, image=upload(), position=1)
+
+        response = self.client.delete(reverse('delete-item-photo', args=[first.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+        self.assertTrue(second.image.storage.exists(second.image.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('delete-item-photo', args=[second.id]))
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertEqual(self.blob_files(), [])
+
+    def test_rollback_keeps_blob_file(self):
+        """Se a transação que removeu a última referência é desfeita, o arquivo fica"""
+        photo = ItemPhoto.objects.create(item=self.item, image=upload(), position=1)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                photo.delete()
+                self.assertFalse(ImageBlob.objects.exists())
+                raise RuntimeError("falha depois do delete")
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+        self.assertTrue(photo.image.storage.exists(photo.image.name))
+        self.assertEqual(len(self.blob_files()), 1)
+
+    def test_file_kept_when_blob_is_recreated_before_cleanup(self):
+        """Um upload do mesmo conteúdo entre o commit e a limpeza fica com o arquivo"""
+        photo = ItemPhoto.objects.create(item=self.item, image=upload(), position=1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            photo.delete()
+        again = ItemPhoto.objects.create(item=self.relisted, image=upload(), position=1)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(again.image.storage.exists(again.image.name))
+
+    def test_different_content_gets_its_own_blob(self):
+        """Conteúdos diferentes não são confundidos"""
+        ItemPhoto.objects.create(item=self.item, image=upload(), position=1)
+        ItemPhoto.objects.create(item=self.item, image=upload((255, 0, 0)), position=2)
+        self.assertEqual(ImageBlob.objects.count(), 2)
+        self.assertEqual(storage_report()["saved_bytes"], 0)
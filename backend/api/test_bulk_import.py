@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchQuery
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from api.models import Category, City, Item, ItemFacetCount
+
+
+class ImportCatalogCommandTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.owner = User.objects.create_user(
+            username="parceiro", email="parceiro@example.com", password="testpass123"
+        )
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp, name)
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(content)
+        return path
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command("import_catalog", *args, stdout=out)
+        return out.getvalue()
+
+    def test_categories_merge_on_slug(self):
+        Category.objects.create(name="Eletrônicos", slug="eletronicos")
+        path = self.write("categorias.csv", (
+            "name,slug,extra\n"
+            "Eletrônicos e Informática,eletronicos,x\n"
+            "Livros,livros,y\n"
+            "Livros e Revistas,livros,z\n"
+            ",sem-nome,\n"
+        ))
+        out = self.run_import("categories", path, "--batch-size", "2")
+        self.assertEqual(
+            dict(Category.objects.values_list("slug", "name")),
+            {"eletronicos": "Eletrônicos e Informática", "livros": "Livros e Revistas"},
+        )
+        # Dois lotes de 2: progresso por lote com linhas/s
+        self.assertEqual(out.count("linhas/s"), 2)
+        self.assertIn("4 lidas", out)
+        # Os workers só veem a importação quando o cache deles expira
+        self.assertIn("CATALOG_CACHE_TIMEOUT", out)
+
+    def test_categories_same_name_in_batch_keeps_last_line(self):
+        """Dois slugs com o mesmo nome no lote: vale a última linha, a outra é descartada"""
+        path = self.write("categorias.csv", (
+            "name,slug\n"
+            "Jogos,jogos\n"
+            "Jogos,games\n"
+            "Música,musica\n"
+        ))
+        out = self.run_import("categories", path)
+        self.assertEqual(
+            dict(Category.objects.values_list("slug", "name")),
+            {"games": "Jogos", "musica": "Música"},
+        )
+        self.assertIn("3 lidas, 2 gravadas, 1 descartadas", out)
+
+    def test_cities_deduplicate_by_name_and_state(self):
+        City.objects.create(name="Natal", state="RN")
+        path = self.write("cidades.jsonl", "\n".join(json.dumps(r) for r in [
+            {"name": " natal ", "state": "rn"},
+            {"name": "Recife", "state": "PE"},
+            {"name": "Recife", "state": "pe"},
+            {"name": "Recife"},
+        ]))
+        self.run_import("cities", path)
+        self.assertEqual(
+            set(City.objects.values_list("name", "state")),
+            {("Natal", "RN"), ("Recife", None), ("Recife", "PE")},
+        )
+
+    def test_cities_import_coordinates(self):
+        City.objects.create(name="Natal", state="RN")
+        path = self.write("coordenadas.csv", (
+            "name,state,latitude,longitude\n"
+            "Natal,RN,-5.7945,-35.211\n"
+            "Caicó,RN,-6.4597,-37.0975\n"
+            "Macau,RN,abc,-36.6\n"
+        ))
+        self.run_import("cities", path)
+        self.assertEqual(
+            set(City.objects.values_list("name", "latitude", "longitude")),
+            {("Natal", -5.7945, -35.211), ("Caicó", -6.4597, -37.0975), ("Macau", None, None)},
+        )
+
+    def test_items_resolve_references_and_rebuild_facets(self):
+        category = Category.objects.create(name="Brinquedos", slug="brinquedos")
+        city = City.objects.create(name="Olinda", state="PE")
+        existing = Item.objects.create(
+            user=self.owner, title="Antigo", category=category, status="new"
+        )
+        path = self.write("itens.jsonl", "\n".join(json.dumps(r) for r in [
+            {"title": "Bola", "category": "brinquedos", "city": "olinda", "state": "PE", "status": "used"},
+            {"title": "Pião", "category": "brinquedos", "status": "NEW", "listing_state": "inactive"},
+            {"id": str(existing.id), "title": "Antigo (editado)", "category": "brinquedos", "status": "used"},
+            {"title": "Sem categoria", "category": "nao-existe", "status": "used"},
+            {"title": "Status ruim", "category": "brinquedos", "status": "quebrado"},
+        ]))
+        out = self.run_import("items", path, "--owner", "parceiro@example.com")
+        self.assertIn("3 gravadas, 2 descartadas", out)
+
+        bola = Item.objects.get(title="Bola")
+        self.assertEqual((bola.user, bola.city, bola.listing_state), (self.owner, city, "active"))
+        self.assertEqual(Item.objects.get(title="Pião").listing_state, "inactive")
+        existing.refresh_from_db()
+        self.assertEqual((existing.title, existing.status), ("Antigo (editado)", "used"))
+        # Busca textual funciona nos importados (coluna gerada)
+        self.assertTrue(Item.objects.filter(search_vector=SearchQuery("bola", config="portuguese")).exists())
+        self.assertEqual(
+            ItemFacetCount.objects.get(category=category, city=None, status="used").count, 1
+        )
+
+    def test_items_of_other_owner_are_not_overwritten(self):
+        category = Category.objects.create(name="Jogos", slug="jogos")
+        other = User.objects.create_user(username="outro", password="testpass123")
+        theirs = Item.objects.create(user=other, title="Deles", category=category, status="new")
+        path = self.write("itens.csv", (
+            "id,title,category,status,owner\n"
+            f"{theirs.id},Meu agora,jogos,used,parceiro\n"
+        ))
+        out = self.run_import("items", path)
+        self.assertIn("0 gravadas, 1 descartadas", out)
+        theirs.refresh_from_db()
+        self.assertEqual(theirs.title, "Deles")
+
+    def test_invalid_jsonl_line(self):
+        path = self.write("ruim.jsonl", '{"name": "A", "slug": "a"}\nnão é json\n')
+        with self.assertRaises(CommandError):
+            self.run_import("categories", path)
@@ -0,0 +1,125 @@
+import fcntl
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.chunked_upload import partial_path
+from api.tests_support import image_bytes
+from api.models import Category, Item, ItemPhoto, PhotoUpload
+
+
+class ChunkedUploadTests(APITestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=self.tmp + "/media",
+            CHUNKED_UPLOAD_DIR=self.tmp + "/chunks",
+            IMAGE_VARIANTS_ASYNC=False,
+        )
+        self.override.enable()
+        self.user = User.objects.create_user(username="chunks@example.com", password="testpass123")
+        category = Category.objects.create(name="Arte", slug="arte")
+        self.item = Item.objects.create(user=self.user, title="Quadro", category=category, status="used")
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.data = image_bytes()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def initiate(self):
+        url = reverse('initiate-photo-upload', args=[self.item.id])
+        response = self.client.post(
+            url, {'filename': 'quadro.jpg', 'size': len(self.data)}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def put_chunk(self, upload_id, start, chunk, total=None):
+        end = start + len(chunk) - 1
+        total = len(self.data) if total is None else total
+        return self.client.put(
+            reverse('photo-upload-chunk', args=[upload_id]),
+            data=chunk,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{total}',
+        )
+
+    def test_upload_resume_and_complete(self):
+        """Pedaço fora de ordem é recusado; o cliente retoma pelo offset"""
+        upload_id = self.initiate()
+        half = len(self.data) // 2
+
+        response = self.put_chunk(upload_id, 0, self.data[:half])
+        self.assertEqual(response.data['offset'], half)
+
+        # Reenvio do mesmo pedaço após uma "queda" de conexão
+        response = self.put_chunk(upload_id, 0, self.data[:half])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+        state = self.client.get(reverse('photo-upload-chunk', args=[upload_id]))
+        self.assertEqual(state.data['offset'], half)
+
+        response = self.put_chunk(upload_id, half, self.data[half:])
+        self.assertEqual(response.data['offset'], len(self.data))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('complete-photo-upload', args=[upload_id]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        photo = ItemPhoto.objects.get(item=self.item)
+        self.assertEqual(str(photo.id), response.data['photo_id'])
+        with photo.image.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_content_range_total_must_match_size(self):
+        """Total do Content-Range diferente do tamanho iniciado retorna 400"""
+        upload_id = self.initiate()
+        response = self.put_chunk(upload_id, 0, self.data[:10], total=len(self.data) + 1)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['offset'], 0)
+
+        # Total desconhecido ("*") é aceito
+        response = self.put_chunk(upload_id, 0, self.data[:10], total='*')
+        self.assertEqual(response.data['offset'], 10)
+
+    def test_put_while_another_is_writing(self):
+        """Um PUT em andamento não bloqueia o GET; um segundo PUT recebe 409"""
+        upload_id = self.initiate()
+        self.put_chunk(upload_id, 0, self.data[:10])
+        upload = PhotoUpload.objects.get(pk=upload_id)
+        with open(partial_path(upload), "ab") as writing:
+            fcntl.flock(writing, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            response = self.put_chunk(upload_id, 10, self.data[10:])
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+            self.assertEqual(response.data['offset'], 10)
+            state = self.client.get(reverse('photo-upload-chunk', args=[upload_id]))
+            self.assertEqual(state.data['offset'], 10)
+
+        response = self.put_chunk(upload_id, 10, self.data[10:])
+        self.assertEqual(response.data['offset'], len(self.data))
+
+    def test_complete_requires_all_bytes(self):
+        """Concluir com bytes faltando retorna 400"""
+        upload_id = self.initiate()
+        self.put_chunk(upload_id, 0, self.data[:10])
+        response = self.client.post(reverse('complete-photo-upload', args=[upload_id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_photo_limit_enforced_on_complete(self):
+        """O limite de fotos por item vale também para uploads em partes"""
+        upload_id = self.initiate()
+        self.put_chunk(upload_id, 0, self.data)
+        for position in range(1, Item.MAX_PHOTOS + 1):
+            ItemPhoto.objects.create(item=self.item, url=f"https://x/{position}.jpg", position=position)
+
+        response = self.client.post(reverse('complete-photo-upload', args=[upload_id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.item.photos.count(), Item.MAX_PHOTOS)
@@ -0,0 +1,73 @@
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api.tests_support import image_upload
+from api.image_variants import generate_variants
+from api.models import Category, Item, ItemPhoto
+from api.serializers import ItemPhotoSerializer, ItemSerializer
+
+
+def make_jpeg(size=(1600, 1200)):
+    exif = Image.Exif()
+    exif[0x010F] = "Camera Teste"  # Make
+    return image_upload(color=(200, 30, 30), size=size, exif=exif)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_VARIANTS_ASYNC=False)
+        self.override.enable()
+        user = User.objects.create_user(username="variants@example.com", password="testpass123")
+        category = Category.objects.create(name="Fotos", slug="fotos")
+        self.item = Item.objects.create(user=user, title="Câmera", category=category, status="used")
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_variants_generated_after_commit(self):
+        """As variantes são geradas depois do commit e gravadas na foto"""
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = ItemPhoto.objects.create(item=self.item, image=make_jpeg(), position=1)
+
+        photo.refresh_from_db()
+        self.assertEqual(set(photo.variants), {"thumb", "thumb_webp", "medium_webp"})
+
+        with default_storage.open(photo.variants["thumb"]) as f:
+            thumb = Image.open(f)
+            self.assertEqual(thumb.size, (320, 320))
+            self.assertEqual(len(thumb.getexif()), 0)
+        with default_storage.open(photo.variants["medium_webp"]) as f:
+            medium = Image.open(f)
+            self.assertEqual(medium.format, "WEBP")
+            self.assertEqual(medium.size, (1024, 768))
+
+    def test_serializers_expose_variant_urls(self):
+        """ItemPhotoSerializer expõe as URLs e o feed usa a miniatura"""
+        photo = ItemPhoto.objects.create(item=self.item, image=make_jpeg(), position=1)
+        data = ItemSerializer(instance=self.item).data
+        self.assertEqual(data['thumbnails'], data['photos'])
+
+        generate_variants(photo.pk)
+        photo.refresh_from_db()
+        variants = ItemPhotoSerializer(instance=photo).data['variants']
+        self.assertTrue(variants['thumb_webp'].endswith('_thumb_webp.webp'))
+
+        data = ItemSerializer(instance=Item.objects.get(pk=self.item.pk)).data
+        self.assertEqual(data['thumbnails'], [variants['thumb_webp']])
+
+    def test_delete_removes_variant_files(self):
+        """Remover a foto apaga as variantes do storage"""
+        photo = ItemPhoto.objects.create(item=self.item, image=make_jpeg(), position=1)
+        variants = generate_variants(photo.pk)
+        photo.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            photo.delete()
+        for name in variants.values():
+            self.assertFalse(default_storage.exists(name))
@@ -0,0 +1,170 @@
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.tests_support import image_bytes
+from api.models import Category, City, ImageBlob, Item, ItemFacetCount, ItemPhoto, PhotoUpload
+
+
+class ItemBatchTests(APITestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.override = override_settings(
+            MEDIA_ROOT=self.tmp + "/media",
+            CHUNKED_UPLOAD_DIR=self.tmp + "/chunks",
+            IMAGE_VARIANTS_ASYNC=False,
+        )
+        self.override.enable()
+        self.user = User.objects.create_user(username="lote@example.com", password="testpass123")
+        self.category = Category.objects.create(name="Livros", slug="livros")
+        self.city = City.objects.create(name="Natal", state="RN")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        )
+        self.url = reverse('items-batch')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def detached_upload(self, color=(200, 30, 30)):
+        """Upload avulso completo pelo fluxo em partes"""
+        data = image_bytes(color)
+        response = self.client.post(
+            reverse('initiate-detached-photo-upload'),
+            {'filename': 'capa.jpg', 'size': len(data)}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(response.data['item_id'])
+        upload_id = response.data['id']
+        self.client.put(
+            reverse('photo-upload-chunk', args=[upload_id]), data=data,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes 0-{len(data) - 1}/{len(data)}',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('complete-photo-upload', args=[upload_id]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(response.data['photo_id'])
+        return upload_id
+
+    def entry(self, i, **extra):
+        return {
+            'title': f'Livro {i}', 'category': str(self.category.id),
+            'city_id': str(self.city.id), 'status': 'used', **extra,
+        }
+
+    def test_creates_many_items_with_fixed_queries(self):
+        """O número de queries não cresce com o tamanho do lote"""
+        def run(count):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(
+                    self.url, {'items': [self.entry(i) for i in range(count)]}, format='json'
+                )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(ctx.captured_queries)
+
+        small = run(3)
+        large = run(30)
+        self.assertEqual(small, large)
+        self.assertEqual(Item.objects.filter(user=self.user).count(), 33)
+        facet = ItemFacetCount.objects.get(category=self.category, city=self.city, status='used')
+        self.assertEqual(facet.count, 33)
+
+    def test_facet_counters_in_one_statement_across_cities(self):
+        """Lote espalhado por várias cidades e categorias: um só upsert de facetas"""
+        cities = [City.objects.create(name=f"Cidade {i}", state="RN") for i in range(8)]
+        categories = [self.category, Category.objects.create(name="Discos", slug="discos")]
+        entries = [
+            self.entry(i, city_id=str(cities[i % 8].id), category=str(categories[i % 2].id),
+                       status=('new', 'used')[i % 3 % 2])
+            for i in range(48)
+        ]
+        # Usuário (escritas não usam o cache), savepoint, categorias, cidades,
+        # INSERT dos itens, facetas, release e a leitura da resposta (itens e fotos)
+        with self.assertNumQueries(9):
+            response = self.client.post(self.url, {'items': entries}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        counts = {
+            (row.category_id, row.city_id, row.status): row.count
+            for row in ItemFacetCount.objects.filter(city__in=cities)
+        }
+        self.assertEqual(len(counts), 16)
+        self.assertEqual(sum(counts.values()), 48)
+
+    def test_update_and_photos_by_upload_id(self):
+        existing = Item.objects.create(
+            user=self.user, title="Antigo", category=self.category, status="new"
+        )
+        first, second = self.detached_upload(), self.detached_upload((30, 30, 200))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {'items': [
+                self.entry(0, upload_ids=[first]),
+                {'id': str(existing.id), 'status': 'used', 'upload_ids': [second]},
+            ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        created, updated = response.data['results']
+        self.assertEqual(created['title'], 'Livro 0')
+        self.assertEqual(len(created['photos']), 1)
+        self.assertEqual(updated['id'], str(existing.id))
+        self.assertEqual(updated['status'], 'used')
+        self.assertEqual(updated['title'], 'Antigo')
+
+        existing.refresh_from_db()
+        self.assertGreater(existing.updated_at, existing.created_at)
+        # Facetas do item atualizado trocaram de chave
+        self.assertFalse(
+            ItemFacetCount.objects.filter(category=self.category, status='new', count__gt=0).exists()
+        )
+        photo = ItemPhoto.objects.get(item=existing)
+        self.assertTrue(photo.variants)
+        upload = PhotoUpload.objects.get(pk=second)
+        self.assertEqual((upload.item_id, upload.photo_id, upload.blob_id), (existing.id, photo.id, None))
+        self.assertEqual(ImageBlob.objects.get(pk=photo.blob_id).ref_count, 1)
+
+    def test_invalid_entries_are_reported_and_nothing_is_written(self):
+        upload_id = self.detached_upload()
+        other = User.objects.create_user(username="outro@example.com", password="testpass123")
+        foreign = Item.objects.create(user=other, title="Alheio", category=self.category, status="new")
+        response = self.client.post(self.url, {'items': [
+            self.entry(0, upload_ids=[upload_id]),
+            {'title': 'Sem categoria', 'status': 'used'},
+            self.entry(2, category='00000000-0000-0000-0000-000000000000'),
+            {'id': str(foreign.id), 'title': 'Meu agora'},
+            self.entry(4, upload_ids=[upload_id]),
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = {e['index']: e['errors'] for e in response.data['errors']}
+        self.assertEqual(set(errors), {1, 2, 3, 4})
+        self.assertIn('category', errors[1])
+        self.assertIn('category', errors[2])
+        self.assertIn('id', errors[3])
+        self.assertIn('upload_ids', errors[4])
+
+        self.assertFalse(Item.objects.filter(user=self.user).exists())
+        self.assertIsNotNone(PhotoUpload.objects.get(pk=upload_id).blob_id)
+
+    def test_photo_limit(self):
+        uploads = [self.detached_upload((i * 30, 0, 0)) for i in range(Item.MAX_PHOTOS)]
+        existing = Item.objects.create(user=self.user, title="Cheio", category=self.category, status="new")
+        ItemPhoto.objects.create(item=existing, url="https://example.com/a.jpg")
+        response = self.client.post(self.url, {'items': [
+            {'id': str(existing.id), 'upload_ids': uploads},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('upload_ids', response.data['errors'][0]['errors'])
+
+    @override_settings(ITEM_BATCH_MAX_SIZE=2)
+    def test_batch_size_limit(self):
+        response = self.client.post(
+            self.url, {'items': [self.entry(i) for i in range(3)]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import supabase_admin
+from api.fake_supabase import FakeSupabaseAdmin
+from api.supabase_admin import (
+    CircuitBreaker,
+    SupabaseAdminError,
+    SupabaseUnavailable,
+    admin_api_status,
+    get_or_create_supabase_user,
+    get_supabase_user_by_email,
+)
+
+
+class SupabaseAdminClientTests(SimpleTestCase):
+    def setUp(self):
+        self.fake = FakeSupabaseAdmin().start()
+        self.addCleanup(self.fake.stop)
+
+    def test_lookup_is_cached(self):
+        uid = get_or_create_supabase_user("carla@example.com", "x")
+        self.assertEqual(get_supabase_user_by_email("carla@example.com"), uid)
+        self.assertEqual(get_supabase_user_by_email("CARLA@example.com"), uid)
+        # Só o POST de criação chegou na API; as buscas vieram do cache
+        self.assertEqual(self.fake.requests, [("GET", "/auth/v1/admin/users"), ("POST", "/auth/v1/admin/users")])
+        status = admin_api_status()
+        self.assertEqual(status["cache_hits"], 2)
+        self.assertEqual(status["calls"]["create_user"]["count"], 1)
+
+    def test_missing_user_is_not_cached(self):
+        self.assertIsNone(get_supabase_user_by_email("dani@example.com"))
+        self.fake.users["dani@example.com"] = "8f1c2d7a-0000-4000-8000-000000000001"
+        self.assertEqual(
+            get_supabase_user_by_email("dani@example.com"), "8f1c2d7a-0000-4000-8000-000000000001"
+        )
+
+    def test_connections_are_reused(self):
+        for i in range(3):
+            get_supabase_user_by_email(f"user{i}@example.com")
+        self.assertEqual(len(self.fake.requests), 3)
+        self.assertEqual(len(self.fake.peers), 1)
+
+    @mock.patch.object(supabase_admin, "breaker", CircuitBreaker(threshold=2, reset_timeout=60))
+    def test_breaker_fails_fast_after_repeated_errors(self):
+        self.fake.fail_next = 2
+        for _ in range(2):
+            with self.assertRaises(SupabaseAdminError):
+                supabase_admin.create_supabase_user("eva@example.com", "x")
+        self.assertEqual(supabase_admin.breaker.state, "open")
+
+        with self.assertRaises(SupabaseUnavailable):
+            supabase_admin.create_supabase_user("eva@example.com", "x")
+        # A terceira chamada nem saiu do processo
+        self.assertEqual(len(self.fake.requests), 2)
+        self.assertEqual(admin_api_status()["rejected_by_breaker"], 1)
+
+    def test_breaker_half_open_trial(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=60)
+        with mock.patch("api.supabase_admin.time.monotonic", return_value=1000):
+            breaker.record_failure()
+            self.assertEqual(breaker.state, "open")
+        with mock.patch("api.supabase_admin.time.monotonic", return_value=1061):
+            self.assertEqual(breaker.state, "half_open")
+            breaker.before_call()
+            # Só uma chamada de teste por vez
+            with self.assertRaises(SupabaseUnavailable):
+                breaker.before_call()
+            breaker.record_failure()
+            self.assertEqual(breaker.state, "open")
+        with mock.patch("api.supabase_admin.time.monotonic", return_value=1200):
+            breaker.before_call()
+            breaker.record_success()
+            self.assertEqual(breaker.state, "closed")
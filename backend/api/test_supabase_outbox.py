@@ -0,0 +1,108 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from api.fake_supabase import FakeSupabaseAdmin
+from api.models import SupabaseSyncJob, UserProfile
+from api.supabase_outbox import claim_jobs, process_due_jobs
+
+
+class RegistrationOutboxTests(APITestCase):
+    def test_register_enqueues_job_without_calling_supabase(self):
+        with mock.patch("api.supabase_admin.get_session") as session:
+            response = self.client.post(reverse("register"), {
+                "first_name": "Ana",
+                "last_name": "Souza",
+                "email": "ana@example.com",
+                "password": "senha-forte-123",
+            })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        session.assert_not_called()
+
+        user = User.objects.get(email="ana@example.com")
+        self.assertIsNone(user.userprofile.supabase_user_id)
+        job = SupabaseSyncJob.objects.get(user=user)
+        self.assertEqual(job.status, "pending")
+        # A senha do cadastro nunca vai para o outbox
+        self.assertNotIn("senha-forte-123", str(job.__dict__))
+
+
+@override_settings(SUPABASE_SYNC_MAX_ATTEMPTS=3, SUPABASE_SYNC_BACKOFF_BASE=10)
+class OutboxWorkerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="bia@example.com", email="bia@example.com", password="testpass123"
+        )
+        UserProfile.objects.create(user=self.user)
+        self.job = SupabaseSyncJob.objects.create(user=self.user, email=self.user.email)
+
+    def make_due(self):
+        SupabaseSyncJob.objects.filter(pk=self.job.pk).update(next_attempt_at=timezone.now())
+
+    def test_worker_creates_user_and_links_profile(self):
+        with FakeSupabaseAdmin() as fake:
+            call_command("process_supabase_outbox", "--once", stdout=mock.MagicMock())
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "done")
+        self.assertEqual(self.job.attempts, 1)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(str(profile.supabase_user_id), fake.users["bia@example.com"])
+
+    def test_existing_supabase_user_is_reused(self):
+        with FakeSupabaseAdmin() as fake:
+            fake.users["bia@example.com"] = "0b8e3a52-4d6e-4f0a-9a51-0d6f2b0d4c11"
+            process_due_jobs()
+
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(str(profile.supabase_user_id), "0b8e3a52-4d6e-4f0a-9a51-0d6f2b0d4c11")
+        self.assertNotIn(("POST", "/auth/v1/admin/users"), fake.requests)
+
+    def test_failure_is_retried_with_backoff(self):
+        with FakeSupabaseAdmin() as fake:
+            # Busca por e-mail e criação falham na primeira rodada
+            fake.fail_next = 2
+            before = timezone.now()
+            self.assertEqual(process_due_jobs(), (0, 1))
+
+            self.job.refresh_from_db()
+            self.assertEqual(self.job.status, "pending")
+            self.assertEqual(self.job.attempts, 1)
+            self.assertIn("503", self.job.last_error)
+            self.assertGreaterEqual(self.job.next_attempt_at, before + timedelta(seconds=8))
+
+            # Ainda não venceu: o worker não pega de novo
+            self.assertEqual(process_due_jobs(), (0, 0))
+
+            self.make_due()
+            self.assertEqual(process_due_jobs(), (1, 0))
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "done")
+        self.assertEqual(self.job.attempts, 2)
+        self.assertIsNotNone(UserProfile.objects.get(user=self.user).supabase_user_id)
+
+    def test_job_fails_after_max_attempts(self):
+        with FakeSupabaseAdmin() as fake:
+            fake.fail_next = 100
+            for _ in range(3):
+                self.make_due()
+                process_due_jobs()
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "failed")
+        self.assertEqual(self.job.attempts, 3)
+        self.make_due()
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_claim_leases_job(self):
+        self.assertEqual(len(claim_jobs(10)), 1)
+        # Reservado: outro worker não pega o mesmo job até o lease vencer
+        self.assertEqual(claim_jobs(10), [])
@@ -1,10 +1,17 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth.models import User
-from api.models import Category, City, Item, UserProfile
+from api.models import Category, City, Item, ItemPhoto, Notification, NotificationCounter, UserProfile
 from rest_framework_simplejwt.tokens import RefreshToken
+from api.notifications import notify
 
 
 class ViewTests(APITestCase):
@@ -41,7 +48,7 @@ class ViewTests(APITestCase):
         url = reverse('get-items')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIsInstance(response.data, list)
+        self.assertIsInstance(response.data['results'], list)
 
     def test_user_profile_access(self):
         """Testa acesso ao perfil do usuário"""
@@ -94,4 +101,649 @@ class PermissionTests(APITestCase):
         
         for url in public_urls:
             response = self.client.get(url)
-            self.assertEqual(response.status_code, status.HTTP_200_OK)
\ No newline at end of file
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class ItemFeedPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="feed_test@example.com",
+            email="feed_test@example.com",
+            password="testpass123"
+        )
+        self.category = Category.objects.create(name="Games", slug="games")
+        self.items = [
+            Item.objects.create(
+                user=self.user,
+                title=f"Item {i}",
+                category=self.category,
+                status="used"
+            )
+            for i in range(5)
+        ]
+
+    def test_pages_follow_created_at_desc(self):
+        """Percorre o feed com next e volta com previous"""
+        url = reverse('get-items')
+        first = self.client.get(url, {'page_size': 2})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIsNone(first.data['previous'])
+        self.assertEqual(
+            [i['title'] for i in first.data['results']], ['Item 4', 'Item 3']
+        )
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual(
+            [i['title'] for i in second.data['results']], ['Item 2', 'Item 1']
+        )
+
+        third = self.client.get(second.data['next'])
+        self.assertEqual([i['title'] for i in third.data['results']], ['Item 0'])
+        self.assertIsNone(third.data['next'])
+
+        back = self.client.get(third.data['previous'])
+        self.assertEqual(
+            [i['title'] for i in back.data['results']], ['Item 2', 'Item 1']
+        )
+
+    def test_ties_on_created_at_are_broken_by_id(self):
+        """Itens com o mesmo created_at não se repetem nem somem entre páginas"""
+        Item.objects.update(created_at=self.items[0].created_at)
+        url = reverse('get-items')
+        seen = []
+        response = self.client.get(url, {'page_size': 2})
+        while True:
+            seen += [i['id'] for i in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_page_size_is_capped(self):
+        """page_size acima do limite configurado é truncado"""
+        url = reverse('get-items')
+        with self.settings(ITEM_FEED_MAX_PAGE_SIZE=3):
+            response = self.client.get(url, {'page_size': 50})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_no_count_query(self):
+        """A paginação não executa COUNT(*)"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        url = reverse('get-items')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url, {'page_size': 2})
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in ctx.captured_queries))
+
+    def test_invalid_cursor(self):
+        """Cursor adulterado retorna 404"""
+        url = reverse('get-items')
+        response = self.client.get(url, {'cursor': 'nao-e-um-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ItemQueryBudgetTests(APITestCase):
+    """Número de queries das views de item não cresce com o tamanho da página"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="budget_test@example.com",
+            email="budget_test@example.com",
+            password="testpass123"
+        )
+        self.category = Category.objects.create(name="Casa", slug="casa")
+        self.city = City.objects.create(name="Recife", state="PE")
+        for i in range(10):
+            item = Item.objects.create(
+                user=self.user,
+                title=f"Item {i}",
+                category=self.category,
+                city=self.city,
+                status="new"
+            )
+            for position in (2, 1):
+                ItemPhoto.objects.create(
+                    item=item, url=f"https://cdn.example.com/{i}-{position}.jpg",
+                    position=position
+                )
+        self.item = item
+        refresh = RefreshToken.for_user(self.user)
+        self.access_token = str(refresh.access_token)
+
+    def test_list_query_budget(self):
+        """Lista: 1 query de itens (com joins) + 1 de fotos"""
+        url = reverse('get-items')
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 10)
+        first = response.data['results'][0]
+        self.assertEqual(first['photos'], [
+            "https://cdn.example.com/9-1.jpg",
+            "https://cdn.example.com/9-2.jpg",
+        ])
+        self.assertEqual(first['images'], first['photos'])
+        self.assertEqual(first['category_name'], 'Casa')
+        self.assertEqual(first['city']['name'], 'Recife')
+
+    def test_detail_query_budget(self):
+        """Detalhe: 1 query do usuário (JWT) + 1 do item + 1 de fotos"""
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        url = reverse('item-detail', args=[self.item.id])
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['photos']), 2)
+
+
+class ItemSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="search_test@example.com",
+            email="search_test@example.com",
+            password="testpass123"
+        )
+        self.books = Category.objects.create(name="Livros", slug="livros")
+        self.sports = Category.objects.create(name="Esportes", slug="esportes")
+        self.city = City.objects.create(name="Salvador", state="BA")
+
+        def make(title, description, category, **extra):
+            return Item.objects.create(
+                user=self.user, title=title, description=description,
+                category=category, status=extra.pop("status", "used"), **extra
+            )
+
+        self.title_hit = make("Bicicleta aro 29", "Pouco usada", self.sports, city=self.city)
+        self.body_hit = make("Capacete", "Ideal para quem anda de bicicleta", self.sports)
+        self.other = make("Livro de receitas", "Culinária baiana", self.books, status="new")
+
+    def search(self, **params):
+        return self.client.get(reverse('search-items'), params)
+
+    def test_requires_query(self):
+        """Sem 'q' a busca retorna 400"""
+        self.assertEqual(self.search().status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ranks_title_matches_first(self):
+        """Termo no título pesa mais do que na descrição (com stemming)"""
+        response = self.search(q="bicicletas")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [r['id'] for r in response.data['results']]
+        self.assertEqual(ids, [str(self.title_hit.id), str(self.body_hit.id)])
+
+    def test_filters_combine_with_search(self):
+        """Filtros de cidade, categoria e status restringem os resultados"""
+        response = self.search(q="bicicleta", city=str(self.city.id))
+        self.assertEqual([r['id'] for r in response.data['results']], [str(self.title_hit.id)])
+
+        response = self.search(q="bicicleta", category="livros")
+        self.assertEqual(response.data['results'], [])
+
+        response = self.search(q="receitas", status="new", listing_state="active")
+        self.assertEqual([r['id'] for r in response.data['results']], [str(self.other.id)])
+
+    def test_invalid_filter(self):
+        """Valor fora das opções de status retorna 400"""
+        response = self.search(q="bicicleta", status="quebrado")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_paginates_by_rank(self):
+        """A segunda página continua de onde a primeira parou"""
+        first = self.search(q="bicicleta", page_size=1)
+        second = self.client.get(first.data['next'])
+        self.assertEqual(first.data['results'][0]['id'], str(self.title_hit.id))
+        self.assertEqual([r['id'] for r in second.data['results']], [str(self.body_hit.id)])
+        self.assertIsNone(second.data['next'])
+
+
+class ItemFilterAndFacetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="facet_test@example.com",
+            email="facet_test@example.com",
+            password="testpass123"
+        )
+        self.books = Category.objects.create(name="Livros", slug="livros")
+        self.toys = Category.objects.create(name="Brinquedos", slug="brinquedos")
+        self.poa = City.objects.create(name="Porto Alegre", state="RS")
+        self.book = Item.objects.create(
+            user=self.user, title="Dom Casmurro", category=self.books,
+            city=self.poa, status="used"
+        )
+        self.toy = Item.objects.create(
+            user=self.user, title="Pião", category=self.toys, status="new"
+        )
+        Item.objects.create(
+            user=self.user, title="Memórias Póstumas", category=self.books,
+            city=self.poa, status="new", listing_state="inactive"
+        )
+
+    def facets(self, **params):
+        response = self.client.get(reverse('item-facets'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def counts(self, data, dimension, key='value'):
+        return {entry[key]: entry['count'] for entry in data[dimension]}
+
+    def test_feed_filters(self):
+        """O feed aceita os mesmos filtros da busca"""
+        url = reverse('get-items')
+        response = self.client.get(url, {'category': 'livros', 'listing_state': 'active'})
+        self.assertEqual([r['id'] for r in response.data['results']], [str(self.book.id)])
+
+        response = self.client.get(url, {'city': 'nao-e-uuid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_facets_for_current_filter(self):
+        """Contagens respeitam os filtros aplicados"""
+        data = self.facets()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(self.counts(data, 'category', 'slug'), {'livros': 2, 'brinquedos': 1})
+        self.assertEqual(self.counts(data, 'city', 'name'), {'Porto Alegre': 2, None: 1})
+
+        data = self.facets(listing_state='active')
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(self.counts(data, 'status'), {'used': 1, 'new': 1})
+
+    def test_facets_follow_item_writes(self):
+        """Criar, alterar e remover itens atualiza os contadores sem recalcular"""
+        self.toy.category = self.books
+        self.toy.save()
+        self.book.delete()
+        Item.objects.create(
+            user=self.user, title="Quincas Borba", category=self.books, status="used"
+        )
+
+        data = self.facets()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(self.counts(data, 'category', 'slug'), {'livros': 3})
+        self.assertEqual(self.counts(data, 'status'), {'new': 2, 'used': 1})
+
+    def test_facets_survive_city_delete(self):
+        """Ao remover uma cidade os itens passam para 'sem cidade'"""
+        self.poa.delete()
+        data = self.facets()
+        self.assertEqual(self.counts(data, 'city', 'name'), {None: 3})
+
+    def test_facets_do_not_group_item_table(self):
+        """As facetas não consultam a tabela de itens"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.facets(category='livros')
+        self.assertFalse(any('FROM "item"' in q['sql'] for q in ctx.captured_queries))
+
+
+class CatalogConditionalGetTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="etag_test@example.com",
+            email="etag_test@example.com",
+            password="testpass123"
+        )
+        Category.objects.create(name="Música", slug="musica")
+        City.objects.create(name="Natal", state="RN")
+
+    def test_categories_not_modified(self):
+        """Repetir a requisição com o ETag devolve 304 sem consultar o banco"""
+        url = reverse('list-categories')
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', first.headers)
+        self.assertIn('Last-Modified', first.headers)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_create_category_invalidates(self):
+        """CreateCategoryView invalida o cache e o ETag muda"""
+        url = reverse('list-categories')
+        etag = self.client.get(url).headers['ETag']
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post(
+                reverse('create-category'), {'name': 'Jogos', 'slug': 'jogos'}, format='json'
+            )
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual({c['slug'] for c in response.data}, {'musica', 'jogos'})
+
+    def test_city_write_invalidates(self):
+        """Qualquer escrita em City invalida a lista de cidades, depois do commit"""
+        url = reverse('list-cities')
+        etag = self.client.get(url).headers['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            City.objects.create(name="Mossoró", state="RN")
+            # Ainda sem commit: o cache continua servindo a versão anterior
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+
+class CityAutocompleteTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        for name, state in [
+            ("São Paulo", "SP"), ("São José dos Campos", "SP"), ("São José", "SC"),
+            ("Santos", "SP"), ("Campinas", "SP"), ("Mogi das Cruzes", "SP"),
+            ("Feira de Santana", "BA"),
+        ]:
+            City.objects.create(name=name, state=state)
+        self.url = reverse('city-autocomplete')
+
+    def names(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [city['name'] for city in response.data]
+
+    def test_prefix_ignores_accents_and_case(self):
+        self.assertEqual(
+            self.names(q='sao jo'), ['São José', 'São José dos Campos']
+        )
+        self.assertEqual(self.names(q='SÃO PAU'), ['São Paulo'])
+
+    def test_word_prefix_comes_after_name_prefix(self):
+        self.assertEqual(self.names(q='santa')[0], 'Feira de Santana')
+        names = self.names(q='san')
+        self.assertEqual(names[0], 'Santos')
+        self.assertIn('Feira de Santana', names)
+
+    def test_state_filter_and_limit(self):
+        self.assertEqual(self.names(q='sao jose', state='sc'), ['São José'])
+        self.assertEqual(self.names(q='São José, SC'), ['São José'])
+        self.assertEqual(self.names(q='São José/SP'), ['São José dos Campos'])
+        self.assertEqual(len(self.names(q='s', limit=2)), 2)
+        response = self.client.get(self.url, {'q': 's', 'limit': 500})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.names(q='  '), [])
+
+    def test_hot_prefix_is_cached_until_city_changes(self):
+        self.names(q='ca')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(q='Ca'), ['Campinas', 'São José dos Campos'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            City.objects.create(name="Caicó", state="RN")
+        self.assertEqual(self.names(q='ca'), ['Caicó', 'Campinas', 'São José dos Campos'])
+
+    def test_fuzzy_match(self):
+        self.assertEqual(self.names(q='campinsa')[0], 'Campinas')
+
+
+class NearbyItemsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="perto@example.com", password="testpass123")
+        self.category = Category.objects.create(name="Esportes", slug="esportes")
+        self.natal = City.objects.create(name="Natal", state="RN", latitude=-5.7945, longitude=-35.211)
+        self.parnamirim = City.objects.create(
+            name="Parnamirim", state="RN", latitude=-5.9157, longitude=-35.2627
+        )
+        self.joao_pessoa = City.objects.create(
+            name="João Pessoa", state="PB", latitude=-7.1195, longitude=-34.845
+        )
+        self.mossoro = City.objects.create(name="Mossoró", state="RN", latitude=-5.1878, longitude=-37.3442)
+        self.sem_coordenadas = City.objects.create(name="Ceará-Mirim", state="RN")
+        self.items = {}
+        for title, city, listing_state in [
+            ("Bola", self.natal, "active"),
+            ("Rede", self.natal, "active"),
+            ("Skate", self.parnamirim, "active"),
+            ("Patins", self.joao_pessoa, "active"),
+            ("Raquete", self.mossoro, "active"),
+            ("Luva", self.sem_coordenadas, "active"),
+            ("Bicicleta", self.parnamirim, "inactive"),
+        ]:
+            self.items[title] = Item.objects.create(
+                user=self.user, title=title, category=self.category, city=city,
+                status="used", listing_state=listing_state,
+            )
+        self.url = reverse('nearby-items')
+
+    def test_orders_active_items_by_distance(self):
+        from api.proximity import haversine_km
+
+        response = self.client.get(self.url, {'lat': -5.7945, 'lng': -35.211, 'radius_km': 200})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [item['title'] for item in response.data['results']]
+        # Mesma cidade: do mais recente para o mais antigo
+        self.assertEqual(titles, ['Rede', 'Bola', 'Skate', 'Patins'])
+        distances = [item['distance_km'] for item in response.data['results']]
+        self.assertEqual(distances[:2], [0, 0])
+        self.assertAlmostEqual(
+            distances[2], haversine_km(-5.7945, -35.211, -5.9157, -35.2627), places=1
+        )
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_walks_every_item_once(self):
+        params = {'city': str(self.natal.id), 'radius_km': 300, 'page_size': 2}
+        expected = [
+            item['id'] for item in self.client.get(self.url, {**params, 'page_size': 50}).data['results']
+        ]
+        self.assertEqual(len(expected), 5)
+
+        seen, url = [], self.url
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIsNone(response.data['previous'])
+            seen += [item['id'] for item in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, expected)
+
+    def test_invalid_parameters(self):
+        for params in [
+            {},
+            {'lat': 'x', 'lng': '1'},
+            {'lat': 100, 'lng': 0},
+            {'lat': 0, 'lng': 0, 'radius_km': 0},
+            {'lat': 0, 'lng': 0, 'radius_km': 100000},
+            {'city': str(self.sem_coordenadas.id)},
+            {'city': 'nao-e-uuid'},
+        ]:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+        response = self.client.get(self.url, {'lat': 0, 'lng': 0, 'cursor': 'lixo'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class NotificationInboxTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="avisos@example.com", email="avisos@example.com", password="testpass123"
+        )
+        self.other = User.objects.create_user(username="outro@example.com", password="testpass123")
+        self.notifications = [
+            Notification.objects.create(user=self.user, notification_type="system", message=f"aviso {i}")
+            for i in range(5)
+        ]
+        Notification.objects.create(user=self.other, notification_type="system", message="de outro")
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        )
+
+    def unread_count(self):
+        response = self.client.get(reverse('unread-notification-count'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['unread_count']
+
+    def test_list_is_cursor_paginated(self):
+        """Lista só as do usuário, mais recentes primeiro, por cursor"""
+        url = reverse('list-notifications')
+        first = self.client.get(url, {'page_size': 3})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [n['id'] for n in first.data['results']],
+            [n.id for n in reversed(self.notifications)][:3],
+        )
+        second = self.client.get(first.data['next'])
+        self.assertEqual(
+            [n['id'] for n in second.data['results']],
+            [n.id for n in reversed(self.notifications)][3:],
+        )
+        self.assertIsNone(second.data['next'])
+
+    def test_unread_count_reads_counter(self):
+        """O contador acompanha criação, leitura individual e remoção"""
+        self.assertEqual(self.unread_count(), 5)
+        # Usuário já está no cache de autenticação: só a leitura do contador
+        with self.assertNumQueries(1):
+            self.client.get(reverse('unread-notification-count'))
+
+        notification = Notification.objects.get(pk=self.notifications[0].pk)
+        notification.is_read = True
+        notification.save()
+        self.assertEqual(self.unread_count(), 4)
+        Notification.objects.get(pk=self.notifications[1].pk).delete()
+        self.assertEqual(self.unread_count(), 3)
+
+    def test_bulk_mark_read(self):
+        """Marca várias de uma vez e devolve o novo total"""
+        url = reverse('mark-notifications-read')
+        ids = [n.id for n in self.notifications[:2]]
+        response = self.client.post(url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'marked': 2, 'unread_count': 3})
+
+        # Repetir não desconta de novo
+        response = self.client.post(url, {'ids': ids}, format='json')
+        self.assertEqual(response.data, {'marked': 0, 'unread_count': 3})
+
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.data, {'marked': 3, 'unread_count': 0})
+        unread = self.client.get(reverse('list-notifications'), {'unread': 'true'})
+        self.assertEqual(unread.data['results'], [])
+        # As do outro usuário não mudam
+        self.assertFalse(Notification.objects.get(user=self.other).is_read)
+
+    def test_mark_read_rejects_bad_ids(self):
+        response = self.client.post(reverse('mark-notifications-read'), {'ids': ['x']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deleting_user_removes_counter(self):
+        """Remover o usuário não recria o contador nos deletes em cascata"""
+        self.user.delete()
+        self.assertFalse(Notification.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(NotificationCounter.objects.filter(user_id=self.user.pk).exists())
+
+
+class NotificationCoalesceTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="perfil@example.com", email="perfil@example.com", password="testpass123"
+        )
+        UserProfile.objects.create(user=self.user, notifications_enabled=True)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        )
+
+    def update_profile(self, bio):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.patch(
+                reverse('user-update'), {'profile': {'Bio': bio}}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return callbacks
+
+    def test_burst_of_updates_becomes_one_notification(self):
+        """Edições seguidas do perfil geram uma linha com count"""
+        callbacks = self.update_profile("primeira")
+        # A notificação só é gravada depois do commit
+        self.assertEqual(len(callbacks), 1)
+        for bio in ("segunda", "terceira"):
+            self.update_profile(bio)
+
+        notification = Notification.objects.get(user=self.user)
+        self.assertEqual(notification.count, 3)
+        self.assertGreater(notification.updated_at, notification.created_at)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 1)
+
+    def test_notify_failure_does_not_fail_update(self):
+        """Erro ao gravar a notificação depois do commit não vira 500"""
+        with mock.patch("api.serializers.notify", side_effect=RuntimeError("falhou")), \
+                self.assertLogs(level="ERROR"):
+            self.update_profile("sem notificação")
+        self.assertEqual(UserProfile.objects.get(user=self.user).Bio, "sem notificação")
+        self.assertFalse(Notification.objects.filter(user=self.user).exists())
+
+    def test_outside_window_creates_new_row(self):
+        self.update_profile("primeira")
+        Notification.objects.filter(user=self.user).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        self.update_profile("segunda")
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 2)
+
+    def test_read_notification_is_not_reused(self):
+        self.update_profile("primeira")
+        self.client.post(reverse('mark-notifications-read'), {}, format='json')
+        self.update_profile("segunda")
+        self.assertEqual(
+            list(Notification.objects.filter(user=self.user).order_by('id').values_list('is_read', 'count')),
+            [(True, 1), (False, 1)],
+        )
+
+    @override_settings(NOTIFICATION_COALESCE_WINDOW=0)
+    def test_window_zero_disables_coalescing(self):
+        self.update_profile("primeira")
+        self.update_profile("segunda")
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 2)
+
+    def test_inbox_shows_latest_activity_first(self):
+        """A notificação juntada sobe para o topo da caixa de entrada"""
+        self.update_profile("primeira")
+        Notification.objects.create(user=self.user, notification_type="system", message="aviso")
+        self.update_profile("segunda")
+        response = self.client.get(reverse('list-notifications'))
+        self.assertEqual(
+            [(n['notification_type'], n['count']) for n in response.data['results']],
+            [('profile', 2), ('system', 1)],
+        )
+
+
+class NotificationConcurrencyTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="concorrente@example.com", password="testpass123")
+
+    def test_concurrent_notify_same_key_becomes_one_row(self):
+        """Duas chamadas simultâneas sem linha existente: a segunda espera e junta"""
+        results = []
+
+        def second_call():
+            try:
+                results.append(notify(self.user.pk, "profile", "segunda"))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            first = notify(self.user.pk, "profile", "primeira")
+            worker = threading.Thread(target=second_call)
+            worker.start()
+            worker.join(0.5)
+            # Segura o lock da chave até o commit
+            self.assertTrue(worker.is_alive())
+        worker.join(5)
+
+        self.assertEqual(results, [(first[0], False)])
+        notification = Notification.objects.get(user=self.user)
+        self.assertEqual((notification.count, notification.message), (2, "segunda"))
+        self.assertEqual(NotificationCounter.objects.get(user=self.user).unread, 1)
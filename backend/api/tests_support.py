@@ -0,0 +1,19 @@
+# Auxiliares compartilhados pelos test_*.py do app; nada aqui roda em produção
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+
+def image_bytes(color=(10, 120, 200), size=(64, 48), format="JPEG", exif=None):
+    """Imagem lisa gerada em memória, para testes de upload e variantes."""
+    buffer = BytesIO()
+    options = {"exif": exif.tobytes()} if exif is not None else {}
+    Image.new("RGB", size, color).save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+def image_upload(name="foto.jpg", **kwargs):
+    """image_bytes embrulhada num arquivo de upload, como vem do multipart."""
+    format = kwargs.get("format", "JPEG")
+    return SimpleUploadedFile(name, image_bytes(**kwargs), content_type=f"image/{format.lower()}")
@@ -0,0 +1,45 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .models import UserProfile
+
+# Claim com o UserProfile.supabase_user_id (string ou null) nos tokens
+SUPABASE_CLAIM = "supabase_user_id"
+
+
+def supabase_claim_for(user_id):
+    value = (
+        UserProfile.objects.filter(user_id=user_id)
+        .values_list("supabase_user_id", flat=True)
+        .first()
+    )
+    return str(value) if value else None
+
+
+class SupabaseRefreshToken(RefreshToken):
+    """
+    Refresh token que leva o supabase_user_id; o access token derivado dele
+    copia o claim, então o chat não precisa consultar o perfil a cada chamada.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[SUPABASE_CLAIM] = supabase_claim_for(user.pk)
+        return token
+
+
+class SupabaseTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = SupabaseRefreshToken
+
+
+class SupabaseTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        # Relê o vínculo no refresh: o supabase_user_id pode ter sido
+        # preenchido (outbox) ou trocado depois do login
+        access = AccessToken(data["access"])
+        access[SUPABASE_CLAIM] = supabase_claim_for(access[api_settings.USER_ID_CLAIM])
+        data["access"] = str(access)
+        return data
@@ -1,27 +1,44 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
 from .views import (
     CreateCategoryView,
-    ListCategoriesView,
-    ListCitiesView,
     UserProfileUpdateView,
     UserProfileView,
+    complete_photo_upload,
     delete_item_photo,
+    initiate_photo_upload,
+    photo_upload_chunk,
     upload_item_photos,
 )
 
+# Leituras públicas: views async sob ASGI, as do DRF no resto
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
+
 urlpatterns = [
     path("users/profile/", UserProfileView.as_view(), name="user-profile"),
     path("users/profile/update/", UserProfileUpdateView.as_view(), name="user-update"),
-    path("items/", views.ReadItemsView.as_view(), name="get-items"),
+    path("notifications/", views.ListNotificationsView.as_view(), name="list-notifications"),
+    path("notifications/unread-count/", views.UnreadNotificationCountView.as_view(), name="unread-notification-count"),
+    path("notifications/read/", views.MarkNotificationsReadView.as_view(), name="mark-notifications-read"),
+    path("items/", read_views.ReadItemsView.as_view(), name="get-items"),
+    path("items/facets/", views.ItemFacetsView.as_view(), name="item-facets"),
+    path("items/search/", views.SearchItemsView.as_view(), name="search-items"),
+    path("items/nearby/", views.NearbyItemsView.as_view(), name="nearby-items"),
     path("items/create/", views.CreateItemView.as_view(), name="items-create"),
-    path("items/<uuid:pk>/", views.ReadItemView.as_view(), name="item-detail"),
+    path("items/batch/", views.ItemBatchView.as_view(), name="items-batch"),
+    path("items/<uuid:pk>/", read_views.ReadItemView.as_view(), name="item-detail"),
     path("items/update/<uuid:pk>/", views.UpdateItemView.as_view(), name="update-item"),
     path("items/delete/<uuid:pk>/", views.DeleteItemView.as_view(), name="delete-item"),
     path("items/<uuid:item_id>/photos/", upload_item_photos, name="upload-item-photos"),
     path("items/photos/<uuid:photo_id>/", delete_item_photo, name="delete-item-photo"),
-    path("categories/", ListCategoriesView.as_view(), name="list-categories"),
+    path("items/<uuid:item_id>/photos/uploads/", initiate_photo_upload, name="initiate-photo-upload"),
+    path("items/photos/uploads/", initiate_photo_upload, name="initiate-detached-photo-upload"),
+    path("items/photos/uploads/<uuid:upload_id>/", photo_upload_chunk, name="photo-upload-chunk"),
+    path("items/photos/uploads/<uuid:upload_id>/complete/", complete_photo_upload, name="complete-photo-upload"),
+    path("categories/", read_views.ListCategoriesView.as_view(), name="list-categories"),
     path("categories/create/", CreateCategoryView.as_view(), name="create-category"),
-    path("cities/", ListCitiesView.as_view(), name="list-cities"),
+    path("cities/", read_views.ListCitiesView.as_view(), name="list-cities"),
+    path("cities/autocomplete/", views.CityAutocompleteView.as_view(), name="city-autocomplete"),
 ]
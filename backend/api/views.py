@@ -1,21 +1,113 @@
+import os
+import uuid
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F, FloatField, Prefetch
+from django.db.models.functions import Cast
+from PIL import Image, UnidentifiedImageError
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from .models import Category, City, Item, ItemPhoto, UserProfile
+from .blob_storage import acquire_blob
+from .catalog_cache import conditional_response, get_snapshot
+from .city_search import parse_query, search_cities
+from .chunked_upload import (
+    ChunkConflict,
+    ChunkError,
+    discard_partial,
+    parse_content_range,
+    partial_path,
+    write_chunk,
+)
+from .facets import item_facets
+from .item_batch import apply_item_batch
+from .models import (
+    Category,
+    City,
+    Item,
+    ItemFacetCount,
+    ItemPhoto,
+    Notification,
+    PhotoUpload,
+    UserProfile,
+)
+from .notifications import mark_notifications_read, unread_count
+from .pagination import (
+    ItemCursorPagination,
+    ItemSearchPagination,
+    NearbyItemsPagination,
+    NotificationCursorPagination,
+)
 from .serializers import (
     CategorySerializer,
     CitySerializer,
     ItemPhotoSerializer,
     ItemSerializer,
+    NotificationSerializer,
     UserCreateSerializer,
     UserProfileSerializer,
     UserSerializer,
 )
 
 
+def with_item_relations(queryset):
+    """
+    Carrega categoria, cidade e fotos (já ordenadas por posição) junto com
+    os itens, em um número fixo de queries independente do tamanho da página.
+    """
+    return queryset.select_related("category", "city").prefetch_related(
+        Prefetch(
+            "photos",
+            queryset=ItemPhoto.objects.order_by("position"),
+            to_attr="ordered_photos",
+        )
+    )
+
+
+def filter_items(queryset, params):
+    """
+    Aplica os filtros do catálogo vindos da query string:
+    category (id ou slug), city (id), status e listing_state.
+    """
+    errors = {}
+
+    category = params.get("category")
+    if category:
+        try:
+            queryset = queryset.filter(category_id=uuid.UUID(category))
+        except ValueError:
+            queryset = queryset.filter(category__slug=category)
+
+    city = params.get("city")
+    if city:
+        try:
+            queryset = queryset.filter(city_id=uuid.UUID(city))
+        except ValueError:
+            errors["city"] = "Id de cidade inválido."
+
+    for field, choices in (
+        ("status", Item.STATUS_CHOICES),
+        ("listing_state", Item.LISTING_STATE_CHOICES),
+    ):
+        value = params.get(field)
+        if value:
+            if value not in dict(choices):
+                errors[field] = f"Valor inválido. Opções: {', '.join(dict(choices))}."
+            else:
+                queryset = queryset.filter(**{field: value})
+
+    if errors:
+        raise ValidationError(errors)
+    return queryset
+
+
 class CreateUserView(generics.CreateAPIView):
     name = "Cadastro de Usuário"
     http_method_names = ["post"]
@@ -46,6 +138,35 @@ class CreateItemView(generics.CreateAPIView):
             print(traceback.format_exc())
             raise
     
+class ItemBatchView(generics.GenericAPIView):
+    name = "Batch Items"
+    http_method_names = ["post"]
+    description = (
+        "Creates and updates many items in one transaction. Body: {\"items\": [...]}; "
+        "entries with an id are partial updates, photos are referenced by upload_ids."
+    )
+    serializer_class = ItemSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        entries = request.data.get("items")
+        if not isinstance(entries, list) or not entries:
+            raise ValidationError({"items": "Envie uma lista não vazia de itens."})
+        if len(entries) > settings.ITEM_BATCH_MAX_SIZE:
+            raise ValidationError(
+                {"items": f"No máximo {settings.ITEM_BATCH_MAX_SIZE} itens por requisição."}
+            )
+
+        items, errors = apply_item_batch(request.user, entries)
+        if errors:
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        loaded = with_item_relations(Item.objects.filter(id__in=[item.id for item in items]))
+        by_id = {item.id: item for item in loaded}
+        serializer = self.get_serializer([by_id[item.id] for item in items], many=True)
+        return Response({"results": serializer.data}, status=status.HTTP_201_CREATED)
+
+
 class DeleteItemView(generics.DestroyAPIView):
     name = "Delete Item"
     http_method_names = ["delete"]
@@ -66,7 +187,7 @@ class UpdateItemView(generics.UpdateAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return Item.objects.filter(user=user)
+        return with_item_relations(Item.objects.filter(user=user))
 
 class ReadItemView(generics.RetrieveAPIView):
     name = "Read Item"
@@ -77,7 +198,10 @@ class ReadItemView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return Item.objects.filter(user=user)
+        if not user.is_authenticated:
+            # Anônimo não tem itens: 404 em vez de erro no filtro por usuário
+            return Item.objects.none()
+        return with_item_relations(Item.objects.filter(user=user))
     
 class ReadItemsView(generics.ListAPIView):
     name = "Read Items"
@@ -85,10 +209,95 @@ class ReadItemsView(generics.ListAPIView):
     description = "Endpoint for reading all items."
     serializer_class = ItemSerializer
     permission_classes = [AllowAny]
+    pagination_class = ItemCursorPagination
 
     def get_queryset(self):
-        return Item.objects.all()
+        queryset = filter_items(Item.objects.all(), self.request.query_params)
+        return with_item_relations(queryset)
+
+
+class ItemFacetsView(generics.GenericAPIView):
+    name = "Item Facets"
+    http_method_names = ["get"]
+    description = "Item counts per category, city, status and listing state for the current filter."
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        # Lê os contadores pré-calculados em vez de agrupar a tabela de itens
+        queryset = filter_items(ItemFacetCount.objects.all(), request.query_params)
+        return Response(item_facets(queryset), status=status.HTTP_200_OK)
+
+
+class SearchItemsView(generics.ListAPIView):
+    name = "Search Items"
+    http_method_names = ["get"]
+    description = "Full-text search over item title and description."
+    serializer_class = ItemSerializer
+    permission_classes = [AllowAny]
+    pagination_class = ItemSearchPagination
+
+    def get_queryset(self):
+        text = (self.request.query_params.get("q") or "").strip()
+        if not text:
+            raise ValidationError({"q": "Informe o termo de busca."})
+
+        query = SearchQuery(text, config="portuguese", search_type="websearch")
+        queryset = Item.objects.filter(search_vector=query).annotate(
+            # ts_rank devolve real; em double precision o valor volta
+            # idêntico no cursor e a comparação da próxima página é exata
+            rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+        )
+        queryset = filter_items(queryset, self.request.query_params)
+        return with_item_relations(queryset)
     
+class NearbyItemsView(generics.ListAPIView):
+    name = "Nearby Items"
+    http_method_names = ["get"]
+    description = (
+        "Active items within ?radius_km= of ?lat=&lng= (or of ?city=<id>), nearest first. "
+        "Each result carries distance_km."
+    )
+    serializer_class = ItemSerializer
+    permission_classes = [AllowAny]
+    pagination_class = NearbyItemsPagination
+
+    def get_origin(self):
+        """(latitude, longitude, raio em km) validados a partir da query string."""
+        params = self.request.query_params
+        errors = {}
+
+        try:
+            radius_km = float(params.get("radius_km", settings.NEARBY_DEFAULT_RADIUS_KM))
+        except ValueError:
+            radius_km = None
+        if radius_km is None or not 0 < radius_km <= settings.NEARBY_MAX_RADIUS_KM:
+            errors["radius_km"] = f"Informe um raio entre 0 e {settings.NEARBY_MAX_RADIUS_KM:g} km."
+
+        city_id = params.get("city")
+        if city_id:
+            try:
+                city = City.objects.get(id=uuid.UUID(city_id))
+            except (ValueError, City.DoesNotExist):
+                raise ValidationError({"city": "Cidade não encontrada."})
+            if city.latitude is None or city.longitude is None:
+                raise ValidationError({"city": "Cidade sem coordenadas cadastradas."})
+            lat, lng = city.latitude, city.longitude
+        else:
+            try:
+                lat, lng = float(params["lat"]), float(params["lng"])
+            except (KeyError, ValueError):
+                raise ValidationError({"lat": "Informe lat e lng, ou city."})
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                errors["lat"] = "Coordenadas fora do intervalo."
+
+        if errors:
+            raise ValidationError(errors)
+        return lat, lng, radius_km
+
+    def get_queryset(self):
+        return with_item_relations(Item.objects.all())
+
+
 class UserProfileView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -110,6 +319,51 @@ class UserProfileUpdateView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         return self.request.user
     
+class ListNotificationsView(generics.ListAPIView):
+    name = "List Notifications"
+    http_method_names = ["get"]
+    description = "Current user's notifications, newest first. Use ?unread=true for unread only."
+    serializer_class = NotificationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = NotificationCursorPagination
+
+    def get_queryset(self):
+        queryset = Notification.objects.filter(user=self.request.user)
+        if self.request.query_params.get("unread", "").lower() in ("1", "true"):
+            queryset = queryset.filter(is_read=False)
+        return queryset
+
+
+class UnreadNotificationCountView(generics.GenericAPIView):
+    name = "Unread Notification Count"
+    http_method_names = ["get"]
+    description = "Number of unread notifications of the current user."
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # Lê o contador mantido incrementalmente; nada de COUNT(*)
+        return Response({"unread_count": unread_count(request.user.pk)}, status=status.HTTP_200_OK)
+
+
+class MarkNotificationsReadView(generics.GenericAPIView):
+    name = "Mark Notifications Read"
+    http_method_names = ["post"]
+    description = "Marks the given notification ids (or all, when ids is omitted) as read."
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        ids = request.data.get("ids")
+        if ids is not None:
+            if not isinstance(ids, list):
+                raise ValidationError({"ids": "Informe uma lista de ids."})
+            try:
+                ids = [int(value) for value in ids]
+            except (TypeError, ValueError):
+                raise ValidationError({"ids": "Ids de notificação inválidos."})
+        marked, unread = mark_notifications_read(request.user.pk, ids)
+        return Response({"marked": marked, "unread_count": unread}, status=status.HTTP_200_OK)
+
+
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserCreateSerializer 
     permission_classes = [AllowAny]
@@ -120,6 +374,11 @@ class ListCategoriesView(generics.ListAPIView):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
+
+    def list(self, request, *args, **kwargs):
+        # Servida do cache em memória; invalidada pelos signals de Category
+        snapshot = get_snapshot("categories", self.get_queryset(), self.get_serializer_class())
+        return conditional_response(request, snapshot)
     
 class CreateCategoryView(generics.CreateAPIView):
     """Cria uma nova categoria"""
@@ -142,6 +401,34 @@ class ListCitiesView(generics.ListAPIView):
     serializer_class = CitySerializer
     permission_classes = [AllowAny]
 
+    def list(self, request, *args, **kwargs):
+        # Servida do cache em memória; invalidada pelos signals de City
+        snapshot = get_snapshot("cities", self.get_queryset(), self.get_serializer_class())
+        return conditional_response(request, snapshot)
+
+
+class CityAutocompleteView(generics.GenericAPIView):
+    name = "City Autocomplete"
+    http_method_names = ["get"]
+    description = (
+        "Cities matching ?q= by prefix (accent-insensitive) or approximately. "
+        "Optional ?state= (UF) and ?limit=."
+    )
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            limit = int(params.get("limit", settings.CITY_AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": "Informe um número inteiro."})
+        if not 1 <= limit <= settings.CITY_AUTOCOMPLETE_MAX_LIMIT:
+            raise ValidationError(
+                {"limit": f"Use um valor entre 1 e {settings.CITY_AUTOCOMPLETE_MAX_LIMIT}."}
+            )
+        term, state = parse_query(params.get("q", ""), params.get("state"))
+        return Response(search_cities(term, state, limit), status=status.HTTP_200_OK)
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -163,7 +450,7 @@ def upload_item_photos(request, item_id):
         )
     
     current_count = item.photos.count()
-    max_photos = 6
+    max_photos = Item.MAX_PHOTOS
     
     if current_count >= max_photos:
         return Response(
@@ -206,3 +493,187 @@ def delete_item_photo(request, photo_id):
             {"error": "Foto não encontrada ou você não tem permissão."},
             status=status.HTTP_404_NOT_FOUND
         )
+
+
+def _upload_state(upload):
+    return {
+        "id": str(upload.id),
+        "item_id": str(upload.item_id) if upload.item_id else None,
+        "filename": upload.filename,
+        "size": upload.size,
+        "offset": upload.received,
+        "status": upload.status,
+        "photo_id": str(upload.photo_id) if upload.photo_id else None,
+        "chunk_size": settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+    }
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def initiate_photo_upload(request, item_id=None):
+    """
+    Inicia um upload em partes de uma foto para o item. Sem item_id o
+    upload fica avulso, para ser anexado depois pelo lote de itens.
+    """
+    item = None
+    if item_id is not None:
+        try:
+            item = Item.objects.get(id=item_id, user=request.user)
+        except Item.DoesNotExist:
+            return Response(
+                {"error": "Item não encontrado ou você não tem permissão."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+    filename = os.path.basename(str(request.data.get("filename") or "")).strip()
+    try:
+        size = int(request.data.get("size"))
+    except (TypeError, ValueError):
+        size = 0
+    if not filename or size <= 0:
+        return Response(
+            {"error": "Informe 'filename' e 'size' (em bytes) do arquivo."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        return Response(
+            {"error": f"Arquivo maior que o limite de {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if item is not None and item.photos.count() >= Item.MAX_PHOTOS:
+        return Response(
+            {"error": f"Este item já tem o máximo de {Item.MAX_PHOTOS} fotos."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    upload = PhotoUpload.objects.create(
+        user=request.user,
+        item=item,
+        filename=filename,
+        content_type=str(request.data.get("content_type") or ""),
+        size=size,
+    )
+    return Response(_upload_state(upload), status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def photo_upload_chunk(request, upload_id):
+    """
+    GET: estado do upload (offset a partir do qual retomar).
+    PUT: grava o próximo pedaço; o corpo é lido em streaming.
+    """
+    try:
+        # Sem select_for_update: o corpo vem de um cliente possivelmente
+        # lento e nenhuma transação fica aberta enquanto ele chega
+        upload = PhotoUpload.objects.get(id=upload_id, user=request.user)
+    except PhotoUpload.DoesNotExist:
+        return Response(
+            {"error": "Upload não encontrado."},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    if request.method == "GET":
+        return Response(_upload_state(upload), status=status.HTTP_200_OK)
+
+    if upload.status != "pending":
+        return Response(
+            {"error": "Upload já concluído."},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    try:
+        content_range = request.headers.get("Content-Range")
+        if content_range:
+            start, length = parse_content_range(content_range, upload.size)
+        else:
+            start, length = upload.received, int(request.headers.get("Content-Length") or 0)
+        # Lê direto do stream da requisição; request.data não é usado
+        write_chunk(upload, request, start, length)
+    except ChunkConflict as e:
+        return Response(
+            {"error": str(e), **_upload_state(upload)},
+            status=status.HTTP_409_CONFLICT
+        )
+    except ChunkError as e:
+        return Response(
+            {"error": str(e), **_upload_state(upload)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response(_upload_state(upload), status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_photo_upload(request, upload_id):
+    """Conclui o upload e anexa o arquivo ao item como ItemPhoto"""
+    with transaction.atomic():
+        try:
+            upload = PhotoUpload.objects.select_for_update().get(
+                id=upload_id, user=request.user
+            )
+        except PhotoUpload.DoesNotExist:
+            return Response(
+                {"error": "Upload não encontrado."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if upload.status == "complete":
+            return Response(_upload_state(upload), status=status.HTTP_200_OK)
+        if upload.received != upload.size:
+            return Response(
+                {"error": "Upload incompleto.", **_upload_state(upload)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        path = partial_path(upload)
+        try:
+            with Image.open(path) as image:
+                image.verify()
+        except (OSError, UnidentifiedImageError):
+            return Response(
+                {"error": "O arquivo enviado não é uma imagem válida."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if upload.item_id is None:
+            # Upload avulso: grava o conteúdo como blob e guarda a referência
+            # até o ItemBatchView criar a foto
+            with open(path, "rb") as fh:
+                blob = acquire_blob(
+                    File(fh, name=upload.filename), upload.filename,
+                    ItemPhoto._meta.get_field("image").storage,
+                )
+            upload.blob = blob
+            upload.status = "complete"
+            upload.save(update_fields=["blob", "status", "updated_at"])
+            transaction.on_commit(lambda: discard_partial(upload))
+            return Response(_upload_state(upload), status=status.HTTP_201_CREATED)
+
+        # Trava o item para que uploads concluídos em paralelo respeitem o limite
+        item = Item.objects.select_for_update().get(pk=upload.item_id)
+        current_count = item.photos.count()
+        if current_count >= Item.MAX_PHOTOS:
+            return Response(
+                {"error": f"Este item já tem o máximo de {Item.MAX_PHOTOS} fotos."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with open(path, "rb") as fh:
+            # O storage copia o arquivo em blocos
+            photo = ItemPhoto.objects.create(
+                item=item,
+                image=File(fh, name=upload.filename),
+                position=current_count + 1,
+            )
+
+        upload.photo = photo
+        upload.status = "complete"
+        upload.save(update_fields=["photo", "status", "updated_at"])
+        transaction.on_commit(lambda: discard_partial(upload))
+
+    return Response(
+        {**_upload_state(upload), "photo": ItemPhotoSerializer(photo).data},
+        status=status.HTTP_201_CREATED
+    )
@@ -17,15 +17,51 @@ ALLOWED_HOSTS = ["*"]
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
 }
 
+# Segundos que o User resolvido a partir do JWT fica em memória (0 desliga).
+# O cache é de cada processo: desativar ou trocar a senha de um usuário só
+# invalida o worker que fez a mudança; nos outros o User antigo vale até
+# este prazo acabar. Mantenha curto
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "10"))
+
+# Notificações repetidas (mesmo tipo e referência, ainda não lidas) dentro
+# desta janela em segundos viram uma só; 0 desliga
+NOTIFICATION_COALESCE_WINDOW = int(os.getenv("NOTIFICATION_COALESCE_WINDOW", "600"))
+
+# Paginação por cursor do feed de itens (/items/)
+ITEM_FEED_PAGE_SIZE = int(os.getenv("ITEM_FEED_PAGE_SIZE", "20"))
+ITEM_FEED_MAX_PAGE_SIZE = int(os.getenv("ITEM_FEED_MAX_PAGE_SIZE", "100"))
+
+# Paginação por cursor da caixa de notificações (/notifications/)
+NOTIFICATION_PAGE_SIZE = int(os.getenv("NOTIFICATION_PAGE_SIZE", "20"))
+NOTIFICATION_MAX_PAGE_SIZE = int(os.getenv("NOTIFICATION_MAX_PAGE_SIZE", "100"))
+
+# Tempo máximo (s) que categorias/cidades ficam no cache em memória de cada
+# processo; escritas invalidam na hora o cache do worker que as fez, o TTL
+# cobre os demais workers e o comando import_catalog
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", "300"))
+
+# Autocomplete de cidades (/cities/autocomplete/): limite padrão e máximo de
+# resultados e até quantos caracteres o prefixo buscado fica em cache
+CITY_AUTOCOMPLETE_LIMIT = int(os.getenv("CITY_AUTOCOMPLETE_LIMIT", "10"))
+CITY_AUTOCOMPLETE_MAX_LIMIT = int(os.getenv("CITY_AUTOCOMPLETE_MAX_LIMIT", "50"))
+CITY_AUTOCOMPLETE_CACHE_PREFIX_LENGTH = int(os.getenv("CITY_AUTOCOMPLETE_CACHE_PREFIX_LENGTH", "4"))
+
+# Busca de itens por proximidade (/items/nearby/): raio padrão e máximo em km
+NEARBY_DEFAULT_RADIUS_KM = float(os.getenv("NEARBY_DEFAULT_RADIUS_KM", "50"))
+NEARBY_MAX_RADIUS_KM = float(os.getenv("NEARBY_MAX_RADIUS_KM", "300"))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    # Tokens carregam o supabase_user_id (claim usado pelo chat)
+    "TOKEN_OBTAIN_SERIALIZER": "api.tokens.SupabaseTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "api.tokens.SupabaseTokenRefreshSerializer",
 }
 
 INSTALLED_APPS = [
@@ -35,6 +71,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework_simplejwt",
     "corsheaders",
@@ -55,6 +92,16 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "backend.urls"
 
+# Pub/sub das mensagens do chat enviadas por WebSocket (backend/asgi.py).
+# InMemoryPubSub atende um único processo; com vários workers use
+# "chat.pubsub.PostgresPubSub" (LISTEN/NOTIFY no próprio banco)
+CHAT_PUBSUB_BACKEND = os.getenv("CHAT_PUBSUB_BACKEND", "chat.pubsub.InMemoryPubSub")
+
+# Intervalo (s) para gravar em lote conversations.last_message_at; 0 grava
+# logo após cada mensagem (sem agrupar). Lotes perdidos (processo morto
+# antes do flush) são recuperados pelo comando reconcile_last_message_at
+CHAT_LAST_MESSAGE_FLUSH_INTERVAL = float(os.getenv("CHAT_LAST_MESSAGE_FLUSH_INTERVAL", "0.5"))
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -81,7 +128,10 @@ DATABASES = {
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT"),
         "OPTIONS": {"sslmode": "require"},
-        "CONN_MAX_AGE": 60,
+        # Sob ASGI cada requisição faz o trabalho síncrono do ORM numa thread
+        # própria e conexões persistentes ficariam presas a threads mortas:
+        # use DB_CONN_MAX_AGE=0 (ou um pooler na frente do Postgres)
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
     }
 }
 
@@ -116,6 +166,27 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Miniaturas/WebP das fotos de itens são geradas depois do upload neste pool
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", "2"))
+IMAGE_VARIANTS_ASYNC = os.getenv("IMAGE_VARIANTS_ASYNC", "true").lower() == "true"
+
+# Sob ASGI, serve itens, categorias e cidades pelas views async (api.async_views)
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "false").lower() == "true"
+
+# Máximo de itens por requisição em /items/batch/
+ITEM_BATCH_MAX_SIZE = int(os.getenv("ITEM_BATCH_MAX_SIZE", "500"))
+
+# Upload de fotos em partes: arquivos parciais ficam fora do MEDIA_ROOT
+CHUNKED_UPLOAD_DIR = os.getenv("CHUNKED_UPLOAD_DIR", os.path.join(BASE_DIR, "upload_chunks"))
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv("CHUNKED_UPLOAD_MAX_SIZE", str(20 * 1024 * 1024)))
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.getenv("CHUNKED_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Outbox de criação de usuários no Supabase Auth (manage.py process_supabase_outbox)
+SUPABASE_SYNC_MAX_ATTEMPTS = int(os.getenv("SUPABASE_SYNC_MAX_ATTEMPTS", "8"))
+SUPABASE_SYNC_BACKOFF_BASE = float(os.getenv("SUPABASE_SYNC_BACKOFF_BASE", "5"))
+SUPABASE_SYNC_BACKOFF_MAX = float(os.getenv("SUPABASE_SYNC_BACKOFF_MAX", "3600"))
+SUPABASE_SYNC_LEASE = int(os.getenv("SUPABASE_SYNC_LEASE", "300"))
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
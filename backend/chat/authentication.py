@@ -0,0 +1,11 @@
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+
+
+class SupabaseClaimsAuthentication(JWTStatelessUserAuthentication):
+    """
+    Autenticação do chat: confia no JWT assinado e não busca o User nem o
+    perfil no banco. request.user vira um TokenUser e request.auth traz os
+    claims, inclusive o supabase_user_id (ver api.tokens). Como nada é
+    relido, um usuário desativado continua com acesso ao chat até o access
+    token expirar (ACCESS_TOKEN_LIFETIME).
+    """
@@ -0,0 +1,144 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+# Só avança o carimbo: flushes fora de ordem (ou de outros processos)
+# nunca fazem last_message_at voltar no tempo
+TOUCH_SQL = """
+    update conversations set last_message_at = %s
+     where id = %s and (last_message_at is null or last_message_at < %s)
+"""
+
+FLUSH_SQL = """
+    update conversations c set last_message_at = v.at
+      from (values {values}) as v (id, at)
+     where c.id = v.id
+       and (c.last_message_at is null or c.last_message_at < v.at)
+"""
+
+# Recalcula o carimbo a partir da última mensagem de cada conversa (índice
+# messages (conversation_id, sent_at desc)); também só avança
+RECONCILE_SQL = """
+    update conversations c set last_message_at = m.sent_at
+      from conversations p
+      cross join lateral (
+            select sent_at from messages
+             where conversation_id = p.id
+             order by sent_at desc
+             limit 1
+      ) m
+     where c.id = p.id
+       and (c.last_message_at is null or c.last_message_at < m.sent_at)
+"""
+
+
+class LastMessageCoalescer:
+    """
+    Junta as atualizações de conversations.last_message_at em memória e
+    grava o valor mais recente de cada conversa a cada `interval` segundos,
+    num único UPDATE. O envio de mensagem deixa de travar a linha da
+    conversa; em troca, o carimbo pode atrasar até um intervalo. O que
+    estiver pendente se perde se o processo morrer sem passar pelo atexit;
+    reconcile_last_message_at() (comando reconcile_last_message_at) corrige.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def touch(self, conversation_id, at):
+        key = str(conversation_id)
+        with self._lock:
+            current = self._pending.get(key)
+            if current is None or at > current:
+                self._pending[key] = at
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="chat-last-message-flush", daemon=True
+                )
+                self._thread.start()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        values = ", ".join(["(%s::uuid, %s::timestamptz)"] * len(batch))
+        params = [p for item in batch.items() for p in item]
+        try:
+            with connection.cursor() as cur:
+                cur.execute(FLUSH_SQL.format(values=values), params)
+        except Exception:
+            # Devolve o lote para a próxima tentativa
+            with self._lock:
+                for key, at in batch.items():
+                    current = self._pending.get(key)
+                    if current is None or at > current:
+                        self._pending[key] = at
+            raise
+        return len(batch)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Falha ao gravar last_message_at das conversas")
+            finally:
+                close_old_connections()
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer():
+    global _coalescer
+    with _coalescer_lock:
+        if _coalescer is None:
+            _coalescer = LastMessageCoalescer(settings.CHAT_LAST_MESSAGE_FLUSH_INTERVAL)
+            _coalescer.start()
+            atexit.register(_flush_at_exit)
+        return _coalescer
+
+
+def _flush_at_exit():
+    try:
+        _coalescer.flush()
+    except Exception:
+        logger.exception("Falha ao gravar last_message_at pendentes na saída")
+
+
+def mark_last_message(conversation_id, at):
+    """
+    Registra que a conversa recebeu uma mensagem em `at`. Com
+    CHAT_LAST_MESSAGE_FLUSH_INTERVAL <= 0 grava na hora (UPDATE condicional
+    em autocommit); caso contrário agrupa no coalescer do processo.
+    """
+    if settings.CHAT_LAST_MESSAGE_FLUSH_INTERVAL <= 0:
+        with connection.cursor() as cur:
+            cur.execute(TOUCH_SQL, [at, str(conversation_id), at])
+        return
+    get_coalescer().touch(conversation_id, at)
+
+
+def reconcile_last_message_at():
+    """
+    Acerta last_message_at das conversas que ficaram para trás da última
+    mensagem (lotes perdidos do coalescer). Devolve quantas foram corrigidas.
+    """
+    with connection.cursor() as cur:
+        cur.execute(RECONCILE_SQL)
+        return cur.rowcount
@@ -0,0 +1,92 @@
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from chat.last_message import LastMessageCoalescer
+
+INSERT_SQL = """
+    insert into messages (id, conversation_id, sender_id, body, sent_at)
+    values (%s, %s, %s, %s, %s)
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede mensagens/s numa única conversa movimentada, comparando o "
+        "UPDATE de last_message_at na transação do envio (inline) com a "
+        "gravação agrupada (coalesced). Cria e remove uma conversa temporária."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--messages", type=int, default=200, help="mensagens por thread")
+        parser.add_argument(
+            "--latency-ms", type=float, default=2.0,
+            help="trabalho simulado entre o INSERT e o COMMIT (rede, serialização)",
+        )
+        parser.add_argument("--mode", choices=["inline", "coalesced", "both"], default="both")
+
+    def handle(self, *args, **options):
+        modes = ["inline", "coalesced"] if options["mode"] == "both" else [options["mode"]]
+        for mode in modes:
+            rate = self.run(mode, options)
+            self.stdout.write(f"{mode:>10}: {rate:,.0f} mensagens/s")
+
+    def run(self, mode, options):
+        conv_id = str(uuid.uuid4())
+        user_a, user_b = sorted([str(uuid.uuid4()), str(uuid.uuid4())])
+        with connection.cursor() as cur:
+            cur.execute(
+                "insert into conversations (id, user_a_id, user_b_id, created_at) values (%s, %s, %s, now())",
+                [conv_id, user_a, user_b],
+            )
+
+        coalescer = LastMessageCoalescer(interval=0.5)
+        if mode == "coalesced":
+            coalescer.start()
+        delay = options["latency_ms"] / 1000
+        barrier = threading.Barrier(options["threads"] + 1)
+
+        def worker():
+            barrier.wait()
+            try:
+                for _ in range(options["messages"]):
+                    now = timezone.now()
+                    if mode == "inline":
+                        # Comportamento anterior: a linha da conversa fica
+                        # travada do UPDATE até o COMMIT
+                        with transaction.atomic():
+                            with connection.cursor() as cur:
+                                cur.execute(INSERT_SQL, [str(uuid.uuid4()), conv_id, user_a, "bench", now])
+                                cur.execute(
+                                    "update conversations set last_message_at = %s where id = %s",
+                                    [now, conv_id],
+                                )
+                                time.sleep(delay)
+                    else:
+                        with transaction.atomic():
+                            with connection.cursor() as cur:
+                                cur.execute(INSERT_SQL, [str(uuid.uuid4()), conv_id, user_a, "bench", now])
+                                time.sleep(delay)
+                        coalescer.touch(conv_id, now)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        for t in threads:
+            t.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for t in threads:
+            t.join()
+        coalescer.flush()
+        elapsed = time.perf_counter() - started
+
+        with connection.cursor() as cur:
+            cur.execute("delete from messages where conversation_id = %s", [conv_id])
+            cur.execute("delete from conversations where id = %s", [conv_id])
+        return options["threads"] * options["messages"] / elapsed
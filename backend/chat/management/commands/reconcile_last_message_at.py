@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from chat.last_message import reconcile_last_message_at
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula conversations.last_message_at a partir da última mensagem "
+        "de cada conversa. Rode periodicamente (cron): recupera carimbos que "
+        "o coalescer perdeu quando um processo morreu antes do flush."
+    )
+
+    def handle(self, *args, **options):
+        fixed = reconcile_last_message_at()
+        self.stdout.write(self.style.SUCCESS(f"{fixed} conversas corrigidas"))
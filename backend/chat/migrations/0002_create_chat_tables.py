@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    As tabelas do chat pertencem ao Supabase (modelos managed=False).
+    Em bancos novos (testes, ambiente local) elas são criadas aqui; onde
+    já existem o "if not exists" não altera nada.
+    """
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                create table if not exists conversations (
+                    id uuid primary key,
+                    user_a_id uuid not null,
+                    user_b_id uuid not null,
+                    created_at timestamptz not null default now(),
+                    last_message_at timestamptz
+                );
+                create table if not exists messages (
+                    id uuid primary key,
+                    conversation_id uuid not null references conversations (id) on delete cascade,
+                    sender_id uuid not null,
+                    body text not null,
+                    sent_at timestamptz not null default now(),
+                    read_at timestamptz
+                );
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('chat', '0002_create_chat_tables'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                create index concurrently if not exists messages_conv_sent_at_idx
+                    on messages (conversation_id, sent_at desc, id desc);
+            """,
+            reverse_sql="drop index concurrently if exists messages_conv_sent_at_idx;",
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('chat', '0003_messages_conversation_sent_at_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                create index concurrently if not exists conversations_user_a_last_msg_idx
+                    on conversations (user_a_id, last_message_at desc nulls last, id desc);
+            """,
+            reverse_sql="drop index concurrently if exists conversations_user_a_last_msg_idx;",
+        ),
+        migrations.RunSQL(
+            sql="""
+                create index concurrently if not exists conversations_user_b_last_msg_idx
+                    on conversations (user_b_id, last_message_at desc nulls last, id desc);
+            """,
+            reverse_sql="drop index concurrently if exists conversations_user_b_last_msg_idx;",
+        ),
+    ]
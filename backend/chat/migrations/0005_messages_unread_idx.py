@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('chat', '0004_conversations_inbox_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            # Só as mensagens ainda não lidas entram no índice: marcar como
+            # lida e contar não lidas não percorrem o histórico
+            sql="""
+                create index concurrently if not exists messages_unread_idx
+                    on messages (conversation_id, sender_id, sent_at, id)
+                    where read_at is null;
+            """,
+            reverse_sql="drop index concurrently if exists messages_unread_idx;",
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Uma conversa por par de usuários, independente da ordem (a, b).
+    Se já houver pares duplicados no banco a criação do índice falha;
+    nesse caso junte as conversas duplicadas antes de migrar.
+    """
+    # CREATE INDEX CONCURRENTLY não roda dentro de transação
+    atomic = False
+
+    dependencies = [
+        ('chat', '0005_messages_unread_idx'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                create unique index concurrently if not exists conversations_pair_uniq
+                    on conversations (least(user_a_id, user_b_id), greatest(user_a_id, user_b_id));
+            """,
+            reverse_sql="drop index concurrently if exists conversations_pair_uniq;",
+        ),
+    ]
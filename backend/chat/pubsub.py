@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def user_topic(supabase_user_id):
+    return f"user:{supabase_user_id}"
+
+
+class Subscription:
+    """Fila de eventos de um cliente conectado, presa ao event loop dele."""
+
+    def __init__(self, pubsub, topics):
+        self.pubsub = pubsub
+        self.topics = set(topics)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def deliver(self, event):
+        # publish() costuma rodar na thread da view; a fila é do event loop
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.pubsub.unsubscribe(self)
+
+
+class InMemoryPubSub:
+    """
+    Pub/sub dentro de um único processo: publish() entrega direto para as
+    assinaturas abertas neste processo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def subscribe(self, topics):
+        subscription = Subscription(self, topics)
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscriptions.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscriptions.get(topic)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscriptions[topic]
+
+    def publish(self, topic, event):
+        self._deliver(topic, event)
+
+    def _deliver(self, topic, event):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # Event loop do cliente já foi encerrado
+                self.unsubscribe(subscription)
+
+
+class PostgresPubSub(InMemoryPubSub):
+    """
+    Pub/sub entre processos usando LISTEN/NOTIFY do próprio Postgres.
+    publish() faz pg_notify; cada processo mantém uma conexão dedicada
+    escutando o canal e repassa os eventos às assinaturas locais.
+    """
+
+    channel = "chat_events"
+    # pg_notify aceita payloads de até 8000 bytes
+    max_payload = 7900
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+        # Sinalizado enquanto a conexão dedicada está com LISTEN ativo
+        self.listening = threading.Event()
+        self._closed = threading.Event()
+
+    def publish(self, topic, event):
+        # UTF-8 cru: um emoji ocupa 4 bytes, não os 12 do escape \ud83d\ude00
+        payload = json.dumps({"topic": topic, "event": event}, cls=DjangoJSONEncoder, ensure_ascii=False)
+        if len(payload.encode()) > self.max_payload:
+            # Não deve acontecer: SendMessageView limita o corpo a MAX_MESSAGE_BODY
+            logger.warning("Evento de chat grande demais para NOTIFY; entregue só localmente")
+            self._deliver(topic, json.loads(payload)["event"])
+            return
+        with connection.cursor() as cur:
+            cur.execute("select pg_notify(%s, %s)", [self.channel, payload])
+
+    def subscribe(self, topics):
+        self._ensure_listener()
+        return super().subscribe(topics)
+
+    def close(self):
+        """Encerra a thread de LISTEN (no desligamento do processo e nos testes)."""
+        self._closed.set()
+        with self._lock:
+            listener = self._listener
+        if listener is not None:
+            listener.join(timeout=5)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name="chat-pubsub-listener", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        while not self._closed.is_set():
+            try:
+                self._listen_once()
+            except Exception:
+                logger.exception("Conexão LISTEN do chat caiu; reconectando")
+            self.listening.clear()
+            self._closed.wait(1)
+
+    def _listen_once(self):
+        import psycopg2
+
+        params = connections["default"].get_connection_params()
+        conn = psycopg2.connect(**params)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"listen {self.channel}")
+            self.listening.set()
+            while not self._closed.is_set():
+                if select.select([conn], [], [], 1) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        data = json.loads(notify.payload)
+                        self._deliver(data["topic"], data["event"])
+                    except (ValueError, KeyError):
+                        logger.warning("Payload inválido no canal %s", self.channel)
+        finally:
+            conn.close()
+
+
+_pubsub = None
+_pubsub_lock = threading.Lock()
+
+
+def get_pubsub():
+    """Instância do backend configurado em CHAT_PUBSUB_BACKEND (uma por processo)."""
+    global _pubsub
+    with _pubsub_lock:
+        if _pubsub is None:
+            backend = getattr(settings, "CHAT_PUBSUB_BACKEND", "chat.pubsub.InMemoryPubSub")
+            _pubsub = import_string(backend)()
+        return _pubsub
+
+
+def publish_message(conversation, message):
+    """Publica uma mensagem nova para os dois participantes da conversa."""
+    event = {"type": "message.new", "message": message}
+    event = json.loads(json.dumps(event, cls=DjangoJSONEncoder))
+    pubsub = get_pubsub()
+    for participant in {str(conversation.user_a_id), str(conversation.user_b_id)}:
+        pubsub.publish(user_topic(participant), event)
+
+
+def publish_read(conversation, reader_id, up_to, read_at):
+    """Publica a confirmação de leitura para os dois participantes."""
+    event = {
+        "type": "messages.read",
+        "conversation_id": str(conversation.id),
+        "reader_id": str(reader_id),
+        "up_to": up_to,
+        "read_at": read_at,
+    }
+    event = json.loads(json.dumps(event, cls=DjangoJSONEncoder))
+    pubsub = get_pubsub()
+    for participant in {str(conversation.user_a_id), str(conversation.user_b_id)}:
+        pubsub.publish(user_topic(participant), event)
@@ -1,3 +1,435 @@
-from django.test import TestCase
+import asyncio
+import json
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from api.models import UserProfile
+from api.tokens import SupabaseRefreshToken
+from chat.last_message import LastMessageCoalescer, reconcile_last_message_at
+from chat.pubsub import PostgresPubSub, get_pubsub, user_topic
+from chat.views import MAX_MESSAGE_BODY
+from chat.websocket import chat_websocket
+
+
+def make_user(email):
+    user = User.objects.create_user(username=email, email=email, password="testpass123")
+    UserProfile.objects.create(user=user, supabase_user_id=uuid.uuid4())
+    return user
+
+
+def make_conversation(a, b):
+    conv_id = uuid.uuid4()
+    with connection.cursor() as cur:
+        cur.execute(
+            "insert into conversations (id, user_a_id, user_b_id, created_at) values (%s, %s, %s, now())",
+            [str(conv_id), str(a.userprofile.supabase_user_id), str(b.userprofile.supabase_user_id)],
+        )
+    return conv_id
+
+
+def insert_messages(conv_id, sender, count, start=None):
+    start = start or timezone.now() - timedelta(hours=1)
+    ids = []
+    with connection.cursor() as cur:
+        for i in range(count):
+            msg_id = uuid.uuid4()
+            cur.execute(
+                "insert into messages (id, conversation_id, sender_id, body, sent_at) values (%s, %s, %s, %s, %s)",
+                [str(msg_id), str(conv_id), str(sender.userprofile.supabase_user_id), f"msg {i}",
+                 start + timedelta(seconds=i)],
+            )
+            ids.append(str(msg_id))
+    return ids
+
+
+def auth_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {SupabaseRefreshToken.for_user(user).access_token}")
+    return client
+
+
+@override_settings(CHAT_LAST_MESSAGE_FLUSH_INTERVAL=0)
+class ChatWebSocketTests(TestCase):
+    def setUp(self):
+        self.alice = make_user("alice@example.com")
+        self.bob = make_user("bob@example.com")
+        self.conv_id = make_conversation(self.alice, self.bob)
+
+    def connect(self, token):
+        scope = {"type": "websocket", "path": "/ws/chat/", "query_string": f"token={token}".encode()}
+        return ApplicationCommunicator(chat_websocket, scope)
+
+    def send_message(self, body):
+        with self.captureOnCommitCallbacks(execute=True):
+            return auth_client(self.alice).post(
+                f"/chat/conversations/{self.conv_id}/messages/send/", {"body": body}, format="json"
+            )
+
+    async def test_rejects_invalid_token(self):
+        """Token inválido fecha a conexão sem aceitar"""
+        communicator = self.connect("nao-e-um-jwt")
+        await communicator.send_input({"type": "websocket.connect"})
+        output = await communicator.receive_output(timeout=2)
+        self.assertEqual(output, {"type": "websocket.close", "code": 4401})
+
+    async def test_pushes_committed_message_to_peer(self):
+        """A mensagem enviada por SendMessageView chega ao outro participante"""
+        token = await sync_to_async(lambda: str(SupabaseRefreshToken.for_user(self.bob).access_token))()
+        communicator = self.connect(token)
+        await communicator.send_input({"type": "websocket.connect"})
+        self.assertEqual(await communicator.receive_output(timeout=2), {"type": "websocket.accept"})
+
+        response = await sync_to_async(self.send_message)("Oi, Bob!")
+        self.assertEqual(response.status_code, 201)
+
+        output = await communicator.receive_output(timeout=2)
+        event = json.loads(output["text"])
+        self.assertEqual(event["type"], "message.new")
+        self.assertEqual(event["message"]["body"], "Oi, Bob!")
+        self.assertEqual(event["message"]["conversation_id"], str(self.conv_id))
+
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        await communicator.wait(timeout=2)
+
+
+@override_settings(CHAT_LAST_MESSAGE_FLUSH_INTERVAL=0, CHAT_PUBSUB_BACKEND="chat.pubsub.PostgresPubSub")
+class PostgresPubSubTests(TransactionTestCase):
+    """NOTIFY só sai no commit: precisa de TransactionTestCase, não TestCase"""
+
+    def setUp(self):
+        # Instância nova do backend configurado, encerrada ao fim do teste
+        patcher = mock.patch("chat.pubsub._pubsub", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: get_pubsub().close())
+        self.alice = make_user("alice@example.com")
+        self.bob = make_user("bob@example.com")
+        self.conv_id = make_conversation(self.alice, self.bob)
+
+    async def subscribe(self, topic):
+        pubsub = get_pubsub()
+        self.assertIsInstance(pubsub, PostgresPubSub)
+        subscription = pubsub.subscribe([topic])
+        self.addCleanup(subscription.close)
+        self.assertTrue(await sync_to_async(pubsub.listening.wait)(5))
+        return pubsub, subscription
+
+    async def test_websocket_receives_message_through_listen_notify(self):
+        """SendMessageView faz pg_notify; a conexão LISTEN repassa ao WebSocket"""
+        token = await sync_to_async(lambda: str(SupabaseRefreshToken.for_user(self.bob).access_token))()
+        communicator = ApplicationCommunicator(
+            chat_websocket, {"type": "websocket", "path": "/ws/chat/", "query_string": f"token={token}".encode()}
+        )
+        await communicator.send_input({"type": "websocket.connect"})
+        self.assertEqual(await communicator.receive_output(timeout=2), {"type": "websocket.accept"})
+        self.assertTrue(await sync_to_async(get_pubsub().listening.wait)(5))
+
+        response = await sync_to_async(
+            lambda: auth_client(self.alice).post(
+                f"/chat/conversations/{self.conv_id}/messages/send/", {"body": "Via NOTIFY"}, format="json"
+            )
+        )()
+        self.assertEqual(response.status_code, 201)
+
+        event = json.loads((await communicator.receive_output(timeout=5))["text"])
+        self.assertEqual((event["type"], event["message"]["body"]), ("message.new", "Via NOTIFY"))
+
+        await communicator.send_input({"type": "websocket.disconnect", "code": 1000})
+        await communicator.wait(timeout=2)
+
+    async def test_longest_body_goes_through_notify(self):
+        """O maior corpo aceito, no pior caso de escape, ainda cabe no pg_notify"""
+        topic = user_topic(self.bob.userprofile.supabase_user_id)
+        pubsub, subscription = await self.subscribe(topic)
+        body = ("😀\x01" * MAX_MESSAGE_BODY)[:MAX_MESSAGE_BODY]
+
+        def send(body):
+            with self.assertNoLogs("chat.pubsub", "WARNING"):
+                return auth_client(self.alice).post(
+                    f"/chat/conversations/{self.conv_id}/messages/send/", {"body": body}, format="json"
+                )
+
+        self.assertEqual((await sync_to_async(send)(body + "x")).status_code, 400)
+        self.assertEqual((await sync_to_async(send)(body)).status_code, 201)
+        event = await asyncio.wait_for(subscription.get(), timeout=5)
+        self.assertEqual(event["message"]["body"], body)
+
+    async def test_oversized_event_is_delivered_locally(self):
+        """Payload acima de max_payload não vai para o pg_notify; entrega só local"""
+        topic = user_topic(uuid.uuid4())
+        pubsub, subscription = await self.subscribe(topic)
+        event = {"type": "message.new", "message": {"body": "x" * PostgresPubSub.max_payload}}
+
+        def publish_oversized():
+            with self.assertNumQueries(0), self.assertLogs("chat.pubsub", "WARNING"):
+                pubsub.publish(topic, event)
+
+        await sync_to_async(publish_oversized)()
+        self.assertEqual(await asyncio.wait_for(subscription.get(), timeout=2), event)
+        # Um evento pequeno segue pelo NOTIFY e chega uma vez só
+        await sync_to_async(pubsub.publish)(topic, {"type": "ping"})
+        self.assertEqual(await asyncio.wait_for(subscription.get(), timeout=5), {"type": "ping"})
+        self.assertTrue(subscription.queue.empty())
+
+class SupabaseClaimAuthTests(TestCase):
+    def setUp(self):
+        self.alice = make_user("alice@example.com")
+        self.bob = make_user("bob@example.com")
+        self.conv_id = make_conversation(self.alice, self.bob)
+        self.url = f"/chat/conversations/{self.conv_id}/messages/"
+
+    def test_login_token_carries_supabase_id(self):
+        """O access token do login traz o supabase_user_id"""
+        response = APIClient().post(
+            "/users/login/", {"username": "alice@example.com", "password": "testpass123"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        claims = AccessToken(response.data["access"])
+        self.assertEqual(claims["supabase_user_id"], str(self.alice.userprofile.supabase_user_id))
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        # Conversa + mensagens; nenhuma consulta de autenticação
+        with self.assertNumQueries(2):
+            self.assertEqual(client.get(self.url).status_code, 200)
+
+    def test_refresh_picks_up_new_link(self):
+        """Refresh relê o vínculo criado depois do login"""
+        carol = User.objects.create_user(username="carol@example.com", password="testpass123")
+        UserProfile.objects.create(user=carol)
+        refresh = SupabaseRefreshToken.for_user(carol)
+        self.assertIsNone(refresh["supabase_user_id"])
+
+        supabase_id = uuid.uuid4()
+        UserProfile.objects.filter(user=carol).update(supabase_user_id=supabase_id)
+        response = APIClient().post("/token/refresh/", {"refresh": str(refresh)}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data["access"])["supabase_user_id"], str(supabase_id))
+
+    def test_token_without_claim_falls_back_to_profile(self):
+        """Tokens antigos, sem o claim, continuam funcionando"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.alice).access_token}")
+        with self.assertNumQueries(3):
+            self.assertEqual(client.get(self.url).status_code, 200)
+
+
+class ListMessagesPagingTests(TestCase):
+    def setUp(self):
+        self.alice = make_user("alice@example.com")
+        self.bob = make_user("bob@example.com")
+        self.conv_id = make_conversation(self.alice, self.bob)
+        self.ids = insert_messages(self.conv_id, self.alice, 5)
+        self.client = auth_client(self.bob)
+        self.url = f"/chat/conversations/{self.conv_id}/messages/"
+
+    def test_scroll_back_with_before(self):
+        """'before' percorre o histórico do mais novo para o mais antigo"""
+        first = self.client.get(self.url, {"limit": 2})
+        self.assertEqual([m["id"] for m in first.data["results"]], [self.ids[4], self.ids[3]])
+        self.assertTrue(first.data["has_more"])
+
+        second = self.client.get(self.url, {"limit": 2, "before": first.data["older"]})
+        self.assertEqual([m["id"] for m in second.data["results"]], [self.ids[2], self.ids[1]])
+
+        last = self.client.get(self.url, {"limit": 2, "before": second.data["older"]})
+        self.assertEqual([m["id"] for m in last.data["results"]], [self.ids[0]])
+        self.assertIsNone(last.data["older"])
+
+    def test_after_returns_only_delta(self):
+        """'after' devolve só as mensagens novas desde o último sync"""
+        newer = self.client.get(self.url).data["newer"]
+        empty = self.client.get(self.url, {"after": newer})
+        self.assertEqual(empty.data["results"], [])
+        self.assertEqual(empty.data["newer"], newer)
+
+        new_ids = insert_messages(self.conv_id, self.bob, 2, start=timezone.now())
+        delta = self.client.get(self.url, {"after": newer})
+        self.assertEqual([m["id"] for m in delta.data["results"]], new_ids[::-1])
+
+    def test_invalid_cursor(self):
+        """Cursor adulterado retorna 404"""
+        response = self.client.get(self.url, {"before": "lixo"})
+        self.assertEqual(response.status_code, 404)
+
+
+class InboxTests(TestCase):
+    def setUp(self):
+        self.alice = make_user("alice@example.com")
+        self.bob = make_user("bob@example.com")
+        self.carol = make_user("carol@example.com")
+        self.dave = make_user("dave@example.com")
+        self.with_bob = make_conversation(self.alice, self.bob)
+        self.with_carol = make_conversation(self.carol, self.alice)
+        self.empty = make_conversation(self.alice, self.dave)
+
+        now = timezone.now()
+        insert_messages(self.with_bob, self.bob, 3, start=now - timedelta(hours=2))
+        insert_messages(self.with_carol, self.alice, 1, start=now - timedelta(hours=1))
+        with connection.cursor() as cur:
+            cur.execute("""
+                update conversations c set last_message_at = (
+                    select max(sent_at) from messages m where m.conversation_id = c.id)
+            """)
+        self.client = auth_client(self.alice)
+
+    def test_inbox_order_preview_and_unread(self):
+        """Ordena pela última atividade e traz prévia e não lidas"""
+        # Só a query da inbox: usuário e supabase_user_id vêm do JWT
+        with self.assertNumQueries(1):
+            response = self.client.get("/chat/conversations/")
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual(
+            [r["id"] for r in results],
+            [str(self.with_carol), str(self.with_bob), str(self.empty)],
+        )
+        self.assertEqual(results[0]["peer_supabase_user_id"], str(self.carol.userprofile.supabase_user_id))
+        self.assertEqual(results[0]["unread_count"], 0)
+        self.assertEqual(results[1]["unread_count"], 3)
+        self.assertEqual(results[1]["last_message"]["body"], "msg 2")
+        self.assertIsNone(results[2]["last_message"])
+
+    def test_inbox_cursor(self):
+        """O cursor continua a partir da última conversa, inclusive sem mensagens"""
+        first = self.client.get("/chat/conversations/", {"limit": 2})
+        self.assertEqual(len(first.data["results"]), 2)
+        second = self.client.get("/chat/conversations/", {"limit": 2, "cursor": first.data["next"]})
+        self.assertEqual([r["id"] for r in second.data["results"]], [str(self.empty)])
+        self.assertIsNone(second.data["next"])
+
+
+class MarkReadTests(TestCase):
+    def setUp(self):
+        self.alice = make_user("alice@example.com")
+        self.bob = make_user("bob@example.com")
+        self.conv_id = make_conversation(self.alice, self.bob)
+        self.from_bob = insert_messages(self.conv_id, self.bob, 4)
+        self.client = auth_client(self.alice)
+        self.url = f"/chat/conversations/{self.conv_id}/messages/read/"
+
+    def unread_ids(self):
+        with connection.cursor() as cur:
+            cur.execute("select id from messages where read_at is null order by sent_at")
+            return [str(r[0]) for r in cur.fetchall()]
+
+    def test_mark_read_up_to(self):
+        """Marca tudo até a mensagem informada em um único UPDATE"""
+        # conversa + statement de leitura (+ savepoint); nada de autenticação
+        with self.assertNumQueries(4):
+            response = self.client.post(self.url, {"up_to": self.from_bob[1]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["marked"], 2)
+        self.assertEqual(response.data["unread_count"], 2)
+        self.assertEqual(self.unread_ids(), self.from_bob[2:])
+
+    def test_own_messages_are_not_marked(self):
+        """Mensagens enviadas pelo próprio leitor não mudam"""
+        own = insert_messages(self.conv_id, self.alice, 1, start=timezone.now())
+        response = self.client.post(self.url, {}, format="json")
+        self.assertEqual(response.data["marked"], 4)
+        self.assertEqual(response.data["unread_count"], 0)
+        self.assertEqual(self.unread_ids(), own)
+
+    def test_unknown_message(self):
+        """up_to de outra conversa retorna 404"""
+        response = self.client.post(self.url, {"up_to": str(uuid.uuid4())}, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(self.unread_ids()), 4)
+
+
+class CreateConversationTests(TestCase):
+    def setUp(self):
+        self.alice = make_user("alice@example.com")
+        self.bob = make_user("bob@example.com")
+        self.url = "/chat/conversations/create/"
+
+    def create(self, user, peer, client=None):
+        return (client or auth_client(user)).post(
+            self.url, {"peer_supabase_user_id": str(peer.userprofile.supabase_user_id)}, format="json"
+        )
+
+    def test_same_pair_returns_same_conversation(self):
+        """O par (a, b) e o par (b, a) resolvem para a mesma conversa"""
+        first = self.create(self.alice, self.bob)
+        self.assertEqual(first.status_code, 201)
+        client = auth_client(self.bob)
+        # Só o INSERT ... ON CONFLICT ... RETURNING
+        with self.assertNumQueries(1):
+            second = self.create(self.bob, self.alice, client)
+        self.assertEqual(first.data["id"], second.data["id"])
+        with connection.cursor() as cur:
+            cur.execute("select count(*) from conversations")
+            self.assertEqual(cur.fetchone()[0], 1)
+
+    def test_database_rejects_duplicate_pair(self):
+        """A unicidade vale no banco mesmo para inserts fora da view"""
+        from django.db import IntegrityError, transaction
+
+        make_conversation(self.alice, self.bob)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            make_conversation(self.bob, self.alice)
+
+
+class LastMessageAtTests(TestCase):
+    def setUp(self):
+        self.alice = make_user("alice@example.com")
+        self.bob = make_user("bob@example.com")
+        self.conv_id = make_conversation(self.alice, self.bob)
+
+    def last_message_at(self):
+        with connection.cursor() as cur:
+            cur.execute("select last_message_at from conversations where id = %s", [str(self.conv_id)])
+            return cur.fetchone()[0]
+
+    @override_settings(CHAT_LAST_MESSAGE_FLUSH_INTERVAL=0)
+    def test_send_updates_after_commit(self):
+        """Sem agrupamento o carimbo é gravado logo após a mensagem"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = auth_client(self.alice).post(
+                f"/chat/conversations/{self.conv_id}/messages/send/", {"body": "oi"}, format="json"
+            )
+        self.assertEqual(self.last_message_at(), response.data["sent_at"])
+
+    def test_coalescer_writes_latest_once(self):
+        """Vários envios viram um único UPDATE com o carimbo mais recente"""
+        coalescer = LastMessageCoalescer(interval=60)
+        now = timezone.now()
+        for seconds in (3, 1, 2):
+            coalescer.touch(self.conv_id, now + timedelta(seconds=seconds))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(coalescer.flush(), 1)
+        self.assertEqual(self.last_message_at(), now + timedelta(seconds=3))
+
+        # Um flush atrasado (outro processo) não volta o carimbo
+        coalescer.touch(self.conv_id, now)
+        coalescer.flush()
+        self.assertEqual(self.last_message_at(), now + timedelta(seconds=3))
+
+    def test_reconcile_recovers_lost_touch(self):
+        """Carimbo que nunca chegou ao banco é recuperado das mensagens"""
+        start = timezone.now() - timedelta(minutes=5)
+        insert_messages(self.conv_id, self.alice, 3, start=start)
+        # Coalescer morreu com o valor pendente: o carimbo nunca foi gravado
+        LastMessageCoalescer(interval=60).touch(self.conv_id, start)
+        self.assertIsNone(self.last_message_at())
+
+        out = StringIO()
+        call_command("reconcile_last_message_at", stdout=out)
+        self.assertIn("1 conversas corrigidas", out.getvalue())
+        self.assertEqual(self.last_message_at(), start + timedelta(seconds=2))
+        # Nada a corrigir na segunda passada
+        self.assertEqual(reconcile_last_message_at(), 0)
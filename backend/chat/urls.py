@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import CreateConversationView, SendMessageView, ListMessagesView
+from .views import CreateConversationView, InboxView, MarkReadView, SendMessageView, ListMessagesView
 
 urlpatterns = [
+    path("conversations/", InboxView.as_view()),
     path("conversations/create/", CreateConversationView.as_view()),
     path("conversations/<uuid:conversation_id>/messages/send/", SendMessageView.as_view()),
     path("conversations/<uuid:conversation_id>/messages/", ListMessagesView.as_view()),
+    path("conversations/<uuid:conversation_id>/messages/read/", MarkReadView.as_view()),
 ]
@@ -1,59 +1,87 @@
 import uuid
 from django.db import connection, transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError, NotFound, PermissionDenied
+from api.models import UserProfile
+from api.pagination import apply_cursor, decode_cursor, encode_cursor, reverse_ordering
+from api.tokens import SUPABASE_CLAIM
+from .authentication import SupabaseClaimsAuthentication
+from .last_message import mark_last_message
 from .models import Conversation, Message
+from .pubsub import publish_message, publish_read
 
 def my_supa_uuid(request):
-    up = getattr(request.user, "userprofile", None)
-    if not up or not up.supabase_user_id:
+    # Tokens emitidos no login/refresh já trazem o id; tokens antigos (sem
+    # o claim) ou sem vínculo ainda caem numa consulta ao perfil
+    claim = request.auth.get(SUPABASE_CLAIM) if request.auth is not None else None
+    if claim:
+        return uuid.UUID(claim)
+    supabase_user_id = (
+        UserProfile.objects.filter(user_id=request.user.id)
+        .values_list("supabase_user_id", flat=True)
+        .first()
+    )
+    if not supabase_user_id:
         raise ValidationError("Vincule seu supabase_user_id no perfil antes de usar o chat.")
-    return up.supabase_user_id
+    return supabase_user_id
+
+MESSAGE_ORDERING = ("-sent_at", "-id")
+MAX_MESSAGES_PAGE = 200
+MAX_INBOX_PAGE = 100
+PREVIEW_LENGTH = 140
+# Com o corpo limitado, o evento message.new sempre cabe no pg_notify
+# (até 6 bytes por caractere no JSON: cabe com folga em max_payload)
+MAX_MESSAGE_BODY = 1000
+
+def _message_cursor(message):
+    return encode_cursor([message.sent_at, message.id])
 
 def is_participant(conv, me):
     return str(conv.user_a_id) == str(me) or str(conv.user_b_id) == str(me)
 
+# Cria ou devolve a conversa do par num único statement. O índice único
+# conversations_pair_uniq faz o INSERT concorrente esperar e cair no
+# ON CONFLICT; o "update" sem efeito serve só para o RETURNING trazer a
+# linha já existente
+CREATE_CONVERSATION_SQL = """
+    insert into conversations (id, user_a_id, user_b_id, created_at, last_message_at)
+    values (%s, %s, %s, now(), null)
+    on conflict ((least(user_a_id, user_b_id)), (greatest(user_a_id, user_b_id)))
+    do update set user_a_id = conversations.user_a_id
+    returning id, user_a_id, user_b_id
+"""
+
 class CreateConversationView(APIView):
+    authentication_classes = [SupabaseClaimsAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
-    @transaction.atomic
     def post(self, request):
         me = my_supa_uuid(request)
         peer = request.data.get("peer_supabase_user_id")
         if not peer:
             raise ValidationError({"peer_supabase_user_id": "Obrigatório"})
+        try:
+            peer = uuid.UUID(str(peer))
+        except ValueError:
+            raise ValidationError({"peer_supabase_user_id": "UUID inválido."})
         if str(me) == str(peer):
             raise ValidationError("Conversa 1:1 requer usuários distintos.")
 
-        # Tenta achar conversa existente (independe da ordem)
-        existing = list(Conversation.objects.raw("""
-            select * from conversations
-             where (user_a_id = %s and user_b_id = %s)
-                or (user_a_id = %s and user_b_id = %s)
-             limit 1
-        """, [me, peer, peer, me]))
-
-        if existing:
-            c = existing[0]
-        else:
-            conv_id = str(uuid.uuid4())
-            a, b = sorted([str(me), str(peer)])
-            with connection.cursor() as cur:
-                cur.execute("""
-                    insert into conversations (id, user_a_id, user_b_id, created_at, last_message_at)
-                    values (%s, %s, %s, now(), null)
-                """, [conv_id, a, b])
-            c = Conversation.objects.get(pk=conv_id)
+        a, b = sorted([str(me), str(peer)])
+        with connection.cursor() as cur:
+            cur.execute(CREATE_CONVERSATION_SQL, [str(uuid.uuid4()), a, b])
+            conv_id, user_a, user_b = cur.fetchone()
 
-        return Response({"id": str(c.id), "user_a_id": str(c.user_a_id), "user_b_id": str(c.user_b_id)}, status=201)
+        return Response({"id": str(conv_id), "user_a_id": str(user_a), "user_b_id": str(user_b)}, status=201)
 
 class SendMessageView(APIView):
+    authentication_classes = [SupabaseClaimsAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
-    @transaction.atomic
     def post(self, request, conversation_id):
         me = my_supa_uuid(request)
         try:
@@ -67,24 +95,28 @@ class SendMessageView(APIView):
         body = (request.data.get("body") or "").strip()
         if not body:
             raise ValidationError({"body": "Mensagem vazia."})
+        if len(body) > MAX_MESSAGE_BODY:
+            raise ValidationError({"body": f"Mensagem acima de {MAX_MESSAGE_BODY} caracteres."})
 
         msg_id = str(uuid.uuid4())
         now = timezone.now()
 
+        # Só o INSERT fica no caminho quente; last_message_at é atualizado
+        # fora da transação, sem disputar o lock da linha da conversa
         with connection.cursor() as cur:
             cur.execute("""
                 insert into messages (id, conversation_id, sender_id, body, sent_at)
                 values (%s, %s, %s, %s, %s)
             """, [msg_id, str(conv.id), str(me), body, now])
-            cur.execute("update conversations set last_message_at = %s where id = %s",
-                        [now, str(conv.id)])
 
-        return Response(
-            {"id": msg_id, "conversation_id": str(conv.id), "sender_id": str(me), "body": body, "sent_at": now},
-            status=201
-        )
+        message = {"id": msg_id, "conversation_id": str(conv.id), "sender_id": str(me), "body": body, "sent_at": now}
+        # Entrega em tempo real (WebSocket) só depois que a mensagem for gravada
+        transaction.on_commit(lambda: publish_message(conv, message))
+        transaction.on_commit(lambda: mark_last_message(conv.id, now))
+        return Response(message, status=201)
 
 class ListMessagesView(APIView):
+    authentication_classes = [SupabaseClaimsAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, conversation_id):
@@ -97,8 +129,217 @@ class ListMessagesView(APIView):
         if not is_participant(conv, me):
             raise PermissionDenied("Você não participa desta conversa.")
 
-        rows = Message.objects.filter(conversation_id=conversation_id).order_by("-sent_at")[:200]
-        return Response([{
-            "id": str(r.id), "sender_id": str(r.sender_id),
-            "body": r.body, "sent_at": r.sent_at, "read_at": r.read_at
-        } for r in rows])
+        try:
+            limit = min(max(int(request.query_params.get("limit", 50)), 1), MAX_MESSAGES_PAGE)
+        except ValueError:
+            raise ValidationError({"limit": "Deve ser um número inteiro."})
+        before = request.query_params.get("before")
+        after = request.query_params.get("after")
+        if before and after:
+            raise ValidationError("Use apenas um de 'before' ou 'after'.")
+
+        # Índice messages (conversation_id, sent_at desc, id desc)
+        qs = Message.objects.filter(conversation_id=conversation_id)
+        if after:
+            # Sincronização incremental: só o que chegou depois do cursor
+            qs, _ = apply_cursor(qs, MESSAGE_ORDERING, after, reverse=True)
+            qs = qs.order_by(*reverse_ordering(MESSAGE_ORDERING))
+        else:
+            if before:
+                qs, _ = apply_cursor(qs, MESSAGE_ORDERING, before, reverse=False)
+            qs = qs.order_by(*MESSAGE_ORDERING)
+
+        rows = list(qs[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after:
+            rows.reverse()
+
+        # Resultados sempre do mais novo para o mais antigo
+        newest, oldest = (rows[0], rows[-1]) if rows else (None, None)
+        return Response({
+            "results": [{
+                "id": str(r.id), "sender_id": str(r.sender_id),
+                "body": r.body, "sent_at": r.sent_at, "read_at": r.read_at
+            } for r in rows],
+            "has_more": has_more,
+            # Passe em ?before= para rolar o histórico para trás
+            "older": _message_cursor(oldest) if oldest and (after or has_more) else None,
+            # Passe em ?after= para buscar só as mensagens novas
+            "newer": _message_cursor(newest) if newest else after,
+        })
+
+
+# Marca como lidas, num único UPDATE, as mensagens do outro participante
+# até a mensagem informada (inclusive). A contagem de não lidas restantes
+# sai do mesmo statement: o SELECT final enxerga o snapshot anterior ao
+# UPDATE, então basta subtrair as marcadas agora
+MARK_READ_SQL = """
+    with target as (
+        select sent_at, id from messages
+         where id = %(up_to)s and conversation_id = %(conv)s
+    ),
+    marked as (
+        update messages m set read_at = %(now)s
+         where m.conversation_id = %(conv)s
+           and m.sender_id <> %(me)s
+           and m.read_at is null
+           and ({up_to_filter})
+        returning m.id
+    )
+    select (select count(*) from target),
+           (select count(*) from marked),
+           (select count(*) from messages u
+             where u.conversation_id = %(conv)s
+               and u.sender_id <> %(me)s
+               and u.read_at is null)
+"""
+
+
+class MarkReadView(APIView):
+    authentication_classes = [SupabaseClaimsAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, conversation_id):
+        me = my_supa_uuid(request)
+        try:
+            conv = Conversation.objects.get(pk=conversation_id)
+        except Conversation.DoesNotExist:
+            raise NotFound("Conversa não encontrada.")
+
+        if not is_participant(conv, me):
+            raise PermissionDenied("Você não participa desta conversa.")
+
+        up_to = request.data.get("up_to")
+        if up_to:
+            try:
+                up_to = str(uuid.UUID(str(up_to)))
+            except ValueError:
+                raise ValidationError({"up_to": "Id de mensagem inválido."})
+            up_to_filter = "(m.sent_at, m.id) <= (select sent_at, id from target)"
+        else:
+            up_to_filter = "true"
+
+        now = timezone.now()
+        with transaction.atomic():
+            with connection.cursor() as cur:
+                cur.execute(MARK_READ_SQL.format(up_to_filter=up_to_filter), {
+                    "conv": str(conv.id), "me": str(me), "up_to": up_to, "now": now,
+                })
+                found, marked, unread_before = cur.fetchone()
+            if up_to and not found:
+                raise NotFound("Mensagem não encontrada nesta conversa.")
+            if marked:
+                # Avisa os clientes conectados para atualizarem os contadores
+                transaction.on_commit(lambda: publish_read(conv, me, up_to, now))
+
+        return Response({
+            "conversation_id": str(conv.id),
+            "marked": marked,
+            "unread_count": unread_before - marked,
+            "read_at": now,
+        })
+
+
+# Cada ramo do UNION ALL percorre um dos índices
+# conversations (user_x_id, last_message_at desc nulls last, id desc);
+# as laterais pegam a última mensagem e a contagem de não lidas só das
+# conversas da página
+INBOX_SQL = """
+    with page as (
+        (select * from conversations c
+          where c.user_a_id = %(me)s and {keyset}
+          order by c.last_message_at desc nulls last, c.id desc
+          limit %(limit)s)
+        union all
+        (select * from conversations c
+          where c.user_b_id = %(me)s and {keyset}
+          order by c.last_message_at desc nulls last, c.id desc
+          limit %(limit)s)
+        order by last_message_at desc nulls last, id desc
+        limit %(limit)s
+    )
+    select p.id, p.user_a_id, p.user_b_id, p.last_message_at,
+           lm.id, lm.sender_id, left(lm.body, %(preview)s), lm.sent_at,
+           coalesce(unread.n, 0)
+      from page p
+      left join lateral (
+            select m.id, m.sender_id, m.body, m.sent_at
+              from messages m
+             where m.conversation_id = p.id
+             order by m.sent_at desc, m.id desc
+             limit 1
+      ) lm on true
+      left join lateral (
+            select count(*) as n
+              from messages m
+             where m.conversation_id = p.id
+               and m.read_at is null
+               and m.sender_id <> %(me)s
+      ) unread on true
+     order by p.last_message_at desc nulls last, p.id desc
+"""
+
+# Posição "depois de (last_message_at, id)" com NULLs no fim
+INBOX_KEYSET_AFTER_VALUE = """(
+    c.last_message_at < %(at)s
+    or (c.last_message_at = %(at)s and c.id < %(id)s)
+    or c.last_message_at is null
+)"""
+INBOX_KEYSET_AFTER_NULL = "(c.last_message_at is null and c.id < %(id)s)"
+
+
+class InboxView(APIView):
+    """
+    Conversas do usuário, da atividade mais recente para a mais antiga,
+    com prévia da última mensagem e quantidade de não lidas.
+    """
+    authentication_classes = [SupabaseClaimsAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        me = my_supa_uuid(request)
+        try:
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), MAX_INBOX_PAGE)
+        except ValueError:
+            raise ValidationError({"limit": "Deve ser um número inteiro."})
+
+        params = {"me": str(me), "limit": limit + 1, "preview": PREVIEW_LENGTH}
+        keyset = "true"
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            (at, conv_id), _ = decode_cursor(cursor, 2)
+            try:
+                params["id"] = str(uuid.UUID(conv_id))
+                params["at"] = parse_datetime(at) if at is not None else None
+            except (TypeError, ValueError):
+                raise NotFound("Cursor inválido.")
+            if at is not None and params["at"] is None:
+                raise NotFound("Cursor inválido.")
+            keyset = INBOX_KEYSET_AFTER_VALUE if at is not None else INBOX_KEYSET_AFTER_NULL
+
+        with connection.cursor() as cur:
+            cur.execute(INBOX_SQL.format(keyset=keyset), params)
+            rows = cur.fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        results = []
+        for (conv_id, user_a, user_b, last_at,
+             msg_id, sender_id, preview, sent_at, unread) in rows:
+            results.append({
+                "id": str(conv_id),
+                "peer_supabase_user_id": str(user_b if str(user_a) == str(me) else user_a),
+                "last_message_at": last_at,
+                "last_message": {
+                    "id": str(msg_id), "sender_id": str(sender_id),
+                    "body": preview, "sent_at": sent_at,
+                } if msg_id else None,
+                "unread_count": unread,
+            })
+
+        next_cursor = None
+        if has_more and rows:
+            last = rows[-1]
+            next_cursor = encode_cursor([last[3], last[0]])
+        return Response({"results": results, "next": next_cursor})
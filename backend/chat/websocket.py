@@ -0,0 +1,94 @@
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from api.tokens import SUPABASE_CLAIM
+
+from .pubsub import get_pubsub, user_topic
+
+WEBSOCKET_PATH = "/ws/chat/"
+
+# Códigos de fechamento (faixa 4000-4999 é livre para a aplicação)
+CLOSE_NOT_FOUND = 4404
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NO_PROFILE = 4403
+
+
+def _authenticate(raw_token):
+    """
+    Valida o JWT de acesso (o mesmo do header Authorization) e devolve o
+    supabase_user_id do usuário, ou None se não houver vínculo.
+    """
+    try:
+        auth = JWTAuthentication()
+        token = auth.get_validated_token(raw_token)
+        # Com o claim no token a conexão não consulta o banco
+        if token.get(SUPABASE_CLAIM):
+            return token[SUPABASE_CLAIM], True
+        user = auth.get_user(token)
+    except (InvalidToken, AuthenticationFailed):
+        return None, False
+    profile = getattr(user, "userprofile", None)
+    if not profile or not profile.supabase_user_id:
+        return None, True
+    return profile.supabase_user_id, True
+
+
+async def chat_websocket(scope, receive, send):
+    """
+    Endpoint WebSocket do chat: ws://<host>/ws/chat/?token=<access JWT>.
+
+    Depois de aceito, o cliente recebe como JSON os eventos publicados para
+    o seu supabase_user_id (ex.: {"type": "message.new", "message": {...}})
+    sempre que o SendMessageView confirma uma mensagem numa das conversas
+    de que ele participa.
+    """
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+
+    if scope.get("path") != WEBSOCKET_PATH:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+
+    query = parse_qs(scope.get("query_string", b"").decode())
+    token = (query.get("token") or [""])[0]
+    supabase_user_id, authenticated = (None, False)
+    if token:
+        supabase_user_id, authenticated = await sync_to_async(_authenticate)(token)
+    if not authenticated:
+        await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+        return
+    if not supabase_user_id:
+        await send({"type": "websocket.close", "code": CLOSE_NO_PROFILE})
+        return
+
+    subscription = get_pubsub().subscribe([user_topic(supabase_user_id)])
+    await send({"type": "websocket.accept"})
+
+    async def read_client():
+        # O cliente não precisa mandar nada; só esperamos o disconnect
+        while True:
+            incoming = await receive()
+            if incoming["type"] == "websocket.disconnect":
+                return
+
+    reader = asyncio.ensure_future(read_client())
+    try:
+        while True:
+            next_event = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {reader, next_event}, return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_event in done:
+                await send({"type": "websocket.send", "text": json.dumps(next_event.result())})
+            if reader in done:
+                next_event.cancel()
+                break
+    finally:
+        subscription.close()
+        reader.cancel()